@@ -0,0 +1,224 @@
+# alertas.py
+"""Reglas de alerta declarativas, evaluadas una vez por versión del dataset
+
+Cada regla marca filas del dataset completo: el motor en memoria guarda un
+bitmap por regla (mismo formato que indices.IndiceFiltros) y DuckDB una
+tabla de banderas por NOG. Los filtros activos solo intersectan esas marcas,
+así que agregar reglas casi no cuesta por rerun.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from indices import COLUMNA_MONTO
+
+
+def _literal_sql(valor):
+    if isinstance(valor, str):
+        return "'" + valor.replace("'", "''") + "'"
+    if isinstance(valor, pd.Timestamp):
+        return f"TIMESTAMP '{valor:%Y-%m-%d %H:%M:%S}'"
+    return repr(float(valor)) if isinstance(valor, float) else str(int(valor))
+
+
+def _id(columna):
+    return '"' + columna.replace('"', '""') + '"'
+
+
+# ============================================
+# TIPOS DE REGLA
+# ============================================
+class Regla:
+    """Regla con nombre, etiqueta para la interfaz y mensaje con ``{n}``.
+
+    Las subclases implementan ``mascara(df, hoy)`` (arreglo booleano por
+    fila) y ``sql(hoy)`` (expresión booleana equivalente para DuckDB). Si
+    falta alguna de ``columnas`` la regla no marca nada.
+    """
+
+    columnas = ()
+
+    def __init__(self, nombre, etiqueta, mensaje, nivel='warning'):
+        self.nombre = nombre
+        self.etiqueta = etiqueta
+        self.mensaje = mensaje
+        self.nivel = nivel
+
+    def aplica(self, columnas):
+        return set(self.columnas) <= set(columnas)
+
+
+class Condicion(Regla):
+    """``columna`` con alguno de ``valores``"""
+
+    def __init__(self, nombre, etiqueta, mensaje, columna, valores, **opciones):
+        super().__init__(nombre, etiqueta, mensaje, **opciones)
+        self.columna = columna
+        self.valores = list(valores)
+        self.columnas = (columna,)
+
+    def mascara(self, df, hoy):
+        return df[self.columna].isin(self.valores).to_numpy(dtype=bool)
+
+    def sql(self, hoy):
+        return f"{_id(self.columna)} IN ({', '.join(_literal_sql(v) for v in self.valores)})"
+
+
+class Estancada(Regla):
+    """Estatus abierto y ``columna_fecha`` anterior a hace ``dias`` días"""
+
+    def __init__(self, nombre, etiqueta, mensaje, estatus, columna_fecha, dias, **opciones):
+        super().__init__(nombre, etiqueta, mensaje, **opciones)
+        self.estatus = list(estatus)
+        self.columna_fecha = columna_fecha
+        self.dias = dias
+        self.columnas = ('estatus', columna_fecha)
+
+    def mascara(self, df, hoy):
+        limite = hoy - pd.Timedelta(days=self.dias)
+        return (df['estatus'].isin(self.estatus) & (df[self.columna_fecha] < limite)).to_numpy(dtype=bool)
+
+    def sql(self, hoy):
+        limite = hoy - pd.Timedelta(days=self.dias)
+        estatus = ', '.join(_literal_sql(e) for e in self.estatus)
+        return f"estatus IN ({estatus}) AND {_id(self.columna_fecha)} < {_literal_sql(limite)}"
+
+
+class VentanaCorta(Regla):
+    """Menos de ``dias`` días entre ``desde`` y ``hasta`` (p. ej. publicación y cierre)"""
+
+    def __init__(self, nombre, etiqueta, mensaje, desde, hasta, dias, **opciones):
+        super().__init__(nombre, etiqueta, mensaje, **opciones)
+        self.desde = desde
+        self.hasta = hasta
+        self.dias = dias
+        self.columnas = (desde, hasta)
+
+    def mascara(self, df, hoy):
+        dias = (df[self.hasta] - df[self.desde]).dt.days
+        return ((dias >= 0) & (dias < self.dias)).to_numpy(dtype=bool)
+
+    def sql(self, hoy):
+        return f"date_diff('day', {_id(self.desde)}, {_id(self.hasta)}) BETWEEN 0 AND {self.dias - 1}"
+
+
+class GanadorRepetido(Regla):
+    """Proveedor con al menos ``minimo`` adjudicaciones y ``proporcion`` del total en el mismo ``grupo``"""
+
+    def __init__(self, nombre, etiqueta, mensaje, grupo, minimo, proporcion, **opciones):
+        super().__init__(nombre, etiqueta, mensaje, **opciones)
+        self.grupo = grupo
+        self.minimo = minimo
+        self.proporcion = proporcion
+        self.columnas = (grupo, 'proveedor_ganador')
+
+    def mascara(self, df, hoy):
+        tabla = pd.DataFrame({
+            'g': df[self.grupo].to_numpy(dtype=object),
+            'p': df['proveedor_ganador'].to_numpy(dtype=object),
+        })
+        # Las claves nulas quedan fuera de los grupos (NaN, nunca cumplen)
+        ganadas = tabla.groupby(['g', 'p'])['p'].transform('size')
+        adjudicadas = tabla.groupby('g')['p'].transform('count')
+        return ((ganadas >= self.minimo) & (ganadas >= self.proporcion * adjudicadas)).to_numpy(dtype=bool)
+
+    def sql(self, hoy):
+        g = _id(self.grupo)
+        ganadas = f"count(*) OVER (PARTITION BY {g}, proveedor_ganador)"
+        return (f"{g} IS NOT NULL AND proveedor_ganador IS NOT NULL AND {ganadas} >= {self.minimo} "
+                f"AND {ganadas} >= {self.proporcion!r} * count(proveedor_ganador) OVER (PARTITION BY {g})")
+
+
+class MontoAtipico(Regla):
+    """Monto sobre Q3 + ``factor``·IQR del log10 del monto dentro de su ``grupo``"""
+
+    def __init__(self, nombre, etiqueta, mensaje, grupo, factor, minimo=20, **opciones):
+        super().__init__(nombre, etiqueta, mensaje, **opciones)
+        self.grupo = grupo
+        self.factor = factor
+        self.minimo = minimo
+        self.columnas = (grupo, COLUMNA_MONTO)
+
+    def mascara(self, df, hoy):
+        montos = df[COLUMNA_MONTO].to_numpy(dtype=float)
+        positivos = montos > 0
+        logs = np.full(len(montos), np.nan)
+        logs[positivos] = np.log10(montos[positivos])
+
+        grupos = pd.Series(df[self.grupo].to_numpy(dtype=object))
+        tabla = pd.DataFrame({'g': grupos, 'l': logs}).groupby('g')['l']
+        cuartiles = tabla.quantile([0.25, 0.75]).unstack()
+        # Grupos con pocos montos no tienen un IQR confiable
+        cuartiles = cuartiles[tabla.count() >= self.minimo]
+        q1 = grupos.map(cuartiles[0.25]).to_numpy(dtype=float) if len(cuartiles) else np.nan
+        q3 = grupos.map(cuartiles[0.75]).to_numpy(dtype=float) if len(cuartiles) else np.nan
+        return np.asarray(logs > q3 + self.factor * (q3 - q1), dtype=bool)
+
+    def sql(self, hoy):
+        m = _id(COLUMNA_MONTO)
+        log = f"CASE WHEN {m} > 0 THEN log10({m}) END"
+        ventana = f"OVER (PARTITION BY {_id(self.grupo)})"
+        q1 = f"quantile_cont({log}, 0.25) {ventana}"
+        q3 = f"quantile_cont({log}, 0.75) {ventana}"
+        return f"count({log}) {ventana} >= {self.minimo} AND {log} > {q3} + {self.factor!r} * ({q3} - {q1})"
+
+
+# ============================================
+# REGLAS DEL DASHBOARD
+# ============================================
+REGLAS = [
+    Condicion(
+        'oferta_unica', "Una sola oferta", "🚨 {n} licitaciones con solo una oferta",
+        'numero_ofertas', [1]
+    ),
+    GanadorRepetido(
+        'ganador_repetido', "Proveedor recurrente en la entidad",
+        "🔁 {n} licitaciones ganadas por un proveedor que concentra su entidad",
+        'entidad', minimo=5, proporcion=0.3
+    ),
+    MontoAtipico(
+        'monto_atipico', "Monto atípico para el tipo de proyecto",
+        "💸 {n} licitaciones con monto atípico para su tipo de proyecto",
+        'tipo_proyecto', factor=1.5
+    ),
+    VentanaCorta(
+        'ventana_corta', "Plazo corto entre publicación y cierre",
+        "⏱️ {n} licitaciones con menos de 15 días entre publicación y cierre",
+        'fecha_publicacion', 'fecha_cierre', dias=15
+    ),
+    Estancada(
+        'estancada', "En proceso por más de 90 días", "📋 {n} licitaciones en proceso por más de 90 días",
+        ['Evaluacion', 'En Proceso'], 'fecha_adjudicacion', dias=90, nivel='info'
+    ),
+]
+
+REGLAS_POR_NOMBRE = {r.nombre: r for r in REGLAS}
+
+
+def hoy():
+    """Fecha de referencia de las reglas relativas al día"""
+    return pd.Timestamp.now().normalize()
+
+
+class BitmapsAlertas:
+    """Un bitmap empaquetado por regla, recalculado solo al cambiar la versión o el día"""
+
+    def __init__(self, reglas=REGLAS):
+        self.reglas = list(reglas)
+        self.clave = None
+        self.bitmaps = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, df, version):
+        """{nombre de la regla: bitmap} vigente para ``version``"""
+        fecha = hoy()
+        with self._lock:
+            if self.clave != (version, fecha):
+                vacia = np.zeros(len(df), dtype=bool)
+                self.bitmaps = {
+                    r.nombre: np.packbits(r.mascara(df, fecha) if r.aplica(df.columns) else vacia)
+                    for r in self.reglas
+                }
+                self.clave = (version, fecha)
+            return self.bitmaps
@@ -0,0 +1,184 @@
+# almacen.py
+"""Dataset de licitaciones compartido (solo lectura) entre sesiones"""
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from alertas import BitmapsAlertas
+from busqueda import IndiceBusqueda
+from cubo import CuboLicitaciones
+from datos import (
+    ARCHIVO_CSV, DIRECTORIO_EXTRACTOS, cargar_datos, cargar_extractos, firma_archivo,
+    listar_extractos, snapshot_vigente, upsert
+)
+from indices import IndiceFiltros, OrdenesTabla
+from proveedores import ProveedoresCubo
+from series import SeriesTemporales
+
+
+# Columnas por las que se puede ordenar la tabla de detalle
+COLUMNAS_ORDENABLES = [
+    'nog', 'descripcion', 'region', 'departamento', 'municipio',
+    'tipo_proyecto', 'estatus', 'monto_adjudicado', 'proveedor_ganador',
+    'numero_ofertas', 'fecha_adjudicacion'
+]
+
+
+def firma_rapida(ruta=ARCHIVO_CSV):
+    """Tamaño y mtime del CSV: clave barata para invalidar la caché"""
+    firma = firma_archivo(ruta, calcular_hash=False)
+    return (firma['tamano'], firma['mtime_ns'])
+
+
+def version_dataset(version_base, extractos):
+    """Versión del dataset: CSV base más los extractos aplicados"""
+    if not extractos:
+        return version_base
+    h = hashlib.sha256(version_base.encode('utf-8'))
+    h.update(json.dumps(sorted(extractos.items())).encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+class CerrojoLectura:
+    """Muchas lecturas a la vez o una sola escritura.
+
+    La lectura es reentrante por hilo (un método del motor llama a otros) y
+    un escritor en espera frena las lecturas nuevas para no quedar postergado.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._lectores = 0
+        self._escribiendo = False
+        self._escritores_en_espera = 0
+        self._hilo = threading.local()
+
+    @contextmanager
+    def lectura(self):
+        profundidad = getattr(self._hilo, 'profundidad', 0)
+        if profundidad == 0:
+            with self._condicion:
+                while self._escribiendo or self._escritores_en_espera:
+                    self._condicion.wait()
+                self._lectores += 1
+        self._hilo.profundidad = profundidad + 1
+        try:
+            yield
+        finally:
+            self._hilo.profundidad = profundidad
+            if profundidad == 0:
+                with self._condicion:
+                    self._lectores -= 1
+                    if self._lectores == 0:
+                        self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self):
+        with self._condicion:
+            self._escritores_en_espera += 1
+            while self._escribiendo or self._lectores:
+                self._condicion.wait()
+            self._escritores_en_espera -= 1
+            self._escribiendo = True
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._escribiendo = False
+                self._condicion.notify_all()
+
+
+class AlmacenLicitaciones:
+    """Una sola copia del DataFrame tipado por proceso.
+
+    Todas las sesiones leen el mismo objeto; los filtros trabajan con bitmaps
+    del índice o arreglos de filas y nunca modifican ``df``. Los extractos
+    nuevos se incorporan con ``actualizar``, que re-indexa solo las filas
+    afectadas. Índice, cubo, series y demás se modifican en su lugar, así que
+    toda consulta que los lea va dentro de ``lectura()``.
+    """
+
+    def __init__(self, df, version_base, extractos=None, directorio_extractos=DIRECTORIO_EXTRACTOS):
+        self.df = df
+        self.n = len(df)
+        self.version_base = version_base
+        self.extractos = dict(extractos or {})
+        self.directorio_extractos = directorio_extractos
+        self.version = version_dataset(version_base, self.extractos)
+        self._lock = threading.Lock()  # Un solo actualizar a la vez
+        self._cerrojo = CerrojoLectura()
+
+        self.indice = IndiceFiltros(df)
+        self.cubo = CuboLicitaciones(df, self.indice)
+        # Cada serie (fecha, granularidad) se arma al primer uso sobre las celdas del cubo
+        self.series = SeriesTemporales(df, self.cubo)
+        self.proveedores = ProveedoresCubo(df, self.cubo)
+        self.busqueda = IndiceBusqueda(df)
+        self.ordenes = OrdenesTabla(df, COLUMNAS_ORDENABLES)
+        # Las reglas se evalúan al primer uso y otra vez solo al cambiar la versión
+        self.alertas = BitmapsAlertas()
+
+    @classmethod
+    def desde_csv(cls, ruta=ARCHIVO_CSV, directorio_extractos=DIRECTORIO_EXTRACTOS):
+        df = cargar_datos(ruta)
+        firma = snapshot_vigente(ruta)[1]
+        version = firma.get('sha256') or f"{firma['tamano']}-{firma['mtime_ns']}"
+
+        # Los extractos presentes al arrancar se aplican antes de construir los índices
+        extractos = listar_extractos(directorio_extractos)
+        delta = cargar_extractos(list(extractos), directorio_extractos)
+        if delta is not None:
+            df = upsert(df, delta)[0]
+        return cls(df, version[:12], extractos, directorio_extractos)
+
+    def actualizar(self):
+        """Incorpora extractos nuevos o modificados.
+
+        Solo se parsean los extractos pendientes y solo se re-indexan las
+        filas que cambian. Devuelve el número de filas reemplazadas o
+        agregadas.
+        """
+        with self._lock:
+            disponibles = listar_extractos(self.directorio_extractos)
+            pendientes = [n for n, f in disponibles.items() if self.extractos.get(n) != f]
+            if not pendientes:
+                return 0
+
+            # Parsear y armar el df nuevo no toca nada compartido: las consultas siguen
+            delta = cargar_extractos(pendientes, self.directorio_extractos)
+            cambio = upsert(self.df, delta) if delta is not None else None
+
+            with self._cerrojo.escritura():
+                cambiadas = 0
+                if cambio is not None:
+                    df, reemplazadas, agregadas = cambio
+                    filas = np.concatenate([reemplazadas, agregadas])
+                    # El cubo resta la versión vieja de las filas antes del cambio
+                    self.cubo.retirar(self.df, reemplazadas)
+                    self.series.retirar(self.df, reemplazadas)
+                    self.proveedores.retirar(self.df, reemplazadas)
+                    self.df = df
+                    self.n = len(df)
+                    self.indice.actualizar(df, filas)
+                    self.cubo.agregar(df, filas)
+                    self.series.agregar(df, filas)
+                    self.proveedores.agregar(df, filas)
+                    self.busqueda.actualizar(df, filas)
+                    self.ordenes.actualizar(df, filas)
+                    cambiadas = len(filas)
+
+                self.extractos.update({n: disponibles[n] for n in pendientes})
+                self.version = version_dataset(self.version_base, self.extractos)
+            return cambiadas
+
+    def lectura(self):
+        """Contexto en el que índice, cubo y demás no cambian (ver CerrojoLectura)"""
+        return self._cerrojo.lectura()
+
+    def vista(self, filas, columnas=None):
+        """DataFrame con las filas (y columnas) pedidas"""
+        df = self.df if columnas is None else self.df[columnas]
+        return df.take(filas)
@@ -0,0 +1,228 @@
+# benchmark.py
+"""Mide cada etapa del dashboard sin navegador (tiempo y memoria pico)
+
+Uso:
+    python benchmark.py --tamanos 10k 1m --motor pandas duckdb
+    python benchmark.py --csv proyectos_guatecompras.csv --sin-memoria
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from consultas import Consulta, crear_motor
+from exportar import DIRECTORIO_CACHE, firma_exportacion
+from generar_datos import generar
+from indices import DIMENSIONES
+from mapas import COLUMNAS_MAPA, agregar_coordenadas, datos_calor, datos_marcadores
+from proveedores import DIMENSIONES_CONCENTRACION
+from series import GRANULARIDADES
+
+
+TAMANOS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+DIRECTORIO = 'benchmarks'
+ARCHIVO_RESULTADOS = os.path.join(DIRECTORIO, 'resultados.jsonl')
+COLUMNAS_TABLA = ['nog', 'descripcion', 'departamento', 'tipo_proyecto', 'estatus', 'monto_adjudicado']
+
+
+# ============================================
+# MEDICIÓN
+# ============================================
+class Medidor:
+    """Tiempo de pared y memoria pico (tracemalloc) de cada etapa"""
+
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nombre):
+        gc.collect()
+        if self.memoria:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        yield
+        segundos = time.perf_counter() - inicio
+        resultado = {'etapa': nombre, 'segundos': round(segundos, 4)}
+        if self.memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            resultado['pico_mb'] = round((pico - base) / 2**20, 1)
+            resultado['retenido_mb'] = round((actual - base) / 2**20, 1)
+        self.etapas.append(resultado)
+
+
+def _borrar(*rutas):
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def medir(ruta_csv, nombre_motor, memoria=True):
+    """Recorre las etapas del dashboard sobre ``ruta_csv``; devuelve la lista de etapas"""
+    medidor = Medidor(memoria)
+    if memoria:
+        tracemalloc.start()
+    base = os.path.splitext(ruta_csv)[0]
+    sin_extractos = os.path.join(os.path.dirname(ruta_csv) or '.', 'extractos_benchmark')
+
+    # Carga en frío (sin snapshots) y con el snapshot ya escrito
+    _borrar(base + '.feather', base + '.parquet', base + '.parquet.json')
+    with medidor.etapa('cargar_frio'):
+        motor = crear_motor(nombre_motor, ruta_csv, sin_extractos)
+    del motor
+    with medidor.etapa('cargar_snapshot'):
+        motor = crear_motor(nombre_motor, ruta_csv, sin_extractos)
+
+    # Cadena de filtros del sidebar con todo seleccionado
+    with medidor.etapa('filtros'):
+        consulta = Consulta()
+        for dim in DIMENSIONES:
+            consulta = consulta.filtrar(dim, motor.opciones(dim, consulta))
+        motor.rango_monto(consulta)
+        consulta = consulta.con_rango_monto()
+
+    # Selección parcial: la mitad de los departamentos
+    with medidor.etapa('filtros_parciales'):
+        deptos = motor.opciones('departamento', consulta)
+        parcial = consulta.filtrar('departamento', deptos[::2])
+        for dim in ['tipo_proyecto', 'estatus']:
+            parcial = parcial.filtrar(dim, motor.opciones(dim, parcial))
+        minimo, maximo = motor.rango_monto(parcial)
+        acotada = parcial.con_rango_monto(minimo, minimo + (maximo - minimo) / 2)
+        motor.contar(acotada)
+
+    for nombre, c in [('agregaciones', consulta), ('agregaciones_por_filas', acotada)]:
+        with medidor.etapa(nombre):
+            motor.resumen(c)
+            for dim in DIMENSIONES:
+                motor.agrupar(dim, c)
+            motor.top_proveedores(c, 10)
+            for dim in DIMENSIONES_CONCENTRACION:
+                motor.concentracion(c, dim)
+            motor.bins_ofertas(c)
+            for granularidad in GRANULARIDADES:
+                motor.serie_temporal(c, 'fecha_adjudicacion', granularidad)
+
+    # La primera llamada evalúa las reglas; la segunda solo intersecta
+    with medidor.etapa('alertas'):
+        motor.contar_alertas(consulta)
+        motor.contar_alertas(acotada)
+
+    with medidor.etapa('datos_mapas'):
+        coords = agregar_coordenadas(motor.datos(parcial, COLUMNAS_MAPA))
+        datos_marcadores(coords)
+        datos_calor(coords)
+    del coords
+
+    with medidor.etapa('busqueda_texto'):
+        motor.contar(consulta.con_busqueda('agua potable'))
+    with medidor.etapa('busqueda_nog'):
+        motor.contar(consulta.con_busqueda('1000'))
+
+    with medidor.etapa('tabla_pagina'):
+        fuente = motor.fuente(consulta)
+        fuente.pagina(COLUMNAS_TABLA, 'monto_adjudicado', False, 0, 50)
+        fuente.pagina(COLUMNAS_TABLA, 'monto_adjudicado', False, fuente.total - 50, fuente.total)
+
+    for extension in ['csv', 'parquet']:
+        # Se borra la copia en caché para medir la exportación completa
+        firma = firma_exportacion(motor.version, parcial.firma(), extension)
+        _borrar(os.path.join(DIRECTORIO_CACHE, f"{firma}.{extension}"))
+        with medidor.etapa(f"exportar_{extension}"):
+            motor.exportar(parcial, extension).close()
+
+    if memoria:
+        tracemalloc.stop()
+    return medidor.etapas
+
+
+def _medir_en_proceso(argumentos):
+    """Cada combinación corre en un proceso nuevo: la memoria no se mezcla"""
+    ruta_csv, nombre_motor, memoria = argumentos
+    etapas = medir(ruta_csv, nombre_motor, memoria)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return etapas, round(rss_mb, 1)
+
+
+# ============================================
+# REPORTE
+# ============================================
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(titulo, etapas, rss_mb):
+    print(f"\n{titulo}")
+    print(f"{'etapa':<26}{'segundos':>10}{'pico MB':>10}")
+    for e in etapas:
+        pico = f"{e['pico_mb']:>10.1f}" if 'pico_mb' in e else f"{'-':>10}"
+        print(f"{e['etapa']:<26}{e['segundos']:>10.3f}{pico}")
+    print(f"{'RSS máximo del proceso':<26}{'':>10}{rss_mb:>10.1f}")
+
+
+def preparar_dataset(tamano, directorio=DIRECTORIO):
+    """Ruta del CSV sintético de ``tamano`` filas, generándolo si no existe"""
+    filas = TAMANOS[tamano]
+    ruta = os.path.join(directorio, f"licitaciones_{tamano}.csv")
+    if not os.path.exists(ruta):
+        print(f"Generando {filas:,} filas en {ruta}...")
+        generar(filas, ruta)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanos', nargs='+', choices=list(TAMANOS), default=['10k'])
+    parser.add_argument('--csv', help='Medir un CSV existente en lugar de los sintéticos')
+    parser.add_argument('--motor', nargs='+', choices=['pandas', 'duckdb'], default=['pandas'])
+    parser.add_argument('--sin-memoria', action='store_true',
+                        help='Sin tracemalloc (tiempos más fieles, sin pico por etapa)')
+    parser.add_argument('--resultados', default=ARCHIVO_RESULTADOS, help='JSONL donde se agregan las corridas')
+    args = parser.parse_args()
+
+    datasets = [args.csv] if args.csv else [preparar_dataset(t) for t in args.tamanos]
+    contexto = multiprocessing.get_context('spawn')
+    os.makedirs(os.path.dirname(args.resultados) or '.', exist_ok=True)
+
+    for ruta in datasets:
+        for nombre_motor in args.motor:
+            with contexto.Pool(1) as pool:
+                etapas, rss_mb = pool.apply(_medir_en_proceso, ((ruta, nombre_motor, not args.sin_memoria),))
+            imprimir(f"{ruta} · motor {nombre_motor}", etapas, rss_mb)
+
+            registro = {
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'commit': _commit(),
+                'csv': ruta,
+                'bytes_csv': os.path.getsize(ruta),
+                'motor': nombre_motor,
+                'memoria': not args.sin_memoria,
+                'rss_max_mb': rss_mb,
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'etapas': etapas,
+            }
+            with open(args.resultados, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    print(f"\nResultados agregados a {args.resultados}")
+
+
+if __name__ == '__main__':
+    main()
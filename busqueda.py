@@ -0,0 +1,179 @@
+# busqueda.py
+"""Índice de búsqueda por trigramas (texto) y por prefijo (NOG)"""
+import numpy as np
+import pandas as pd
+
+from territorio import plegar_texto
+
+
+COLUMNAS_TEXTO = ['descripcion', 'entidad', 'proveedor_ganador']
+SEPARADOR = '\x00'  # Nunca aparece en una consulta, así que no forma trigramas válidos
+
+
+def plegar(serie):
+    """Versión vectorizada de ``plegar_texto`` (los nulos quedan como '')"""
+    return (serie.astype('string').fillna('')
+            .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+            .str.lower().astype(object))
+
+
+def _codigos_trigramas(codepoints):
+    """Código entero de cada trigrama (3 caracteres ASCII -> 21 bits)"""
+    c = codepoints.astype(np.uint32)
+    return (c[:-2] << 14) | (c[1:-1] << 7) | c[2:]
+
+
+def _unicos_ordenados(claves):
+    """Equivale a np.unique para enteros: ordenar y descartar vecinos iguales.
+
+    np.unique sin argumentos extra usa una tabla hash en numpy 2, mucho más
+    lenta que ordenar con decenas de millones de claves.
+    """
+    claves = np.sort(claves)
+    if len(claves) == 0:
+        return claves
+    return claves[np.concatenate(([True], claves[1:] != claves[:-1]))]
+
+
+def _segmento(filas, textos):
+    """Índice invertido (CSR) de los trigramas de ``textos``, con ids ``filas``"""
+    largos = np.fromiter((len(t) for t in textos), dtype=np.int64, count=len(textos))
+    codepoints = np.frombuffer(SEPARADOR.join(textos).encode('ascii'), dtype=np.uint8)
+    if len(codepoints) < 3:
+        return np.zeros(0, dtype=np.uint32), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    ids = np.repeat(np.asarray(filas, dtype=np.int64), largos + 1)[:len(codepoints)]
+
+    validos = (codepoints[:-2] != 0) & (codepoints[1:-1] != 0) & (codepoints[2:] != 0)
+    trigramas = _codigos_trigramas(codepoints)[validos].astype(np.uint64)
+    # Par (trigrama, fila) único y ordenado en una sola clave de 64 bits
+    pares = _unicos_ordenados((trigramas << np.uint64(32)) | ids[:-2][validos].astype(np.uint64))
+    altos = (pares >> np.uint64(32)).astype(np.uint32)
+    inicio = np.flatnonzero(np.diff(altos, prepend=altos[:1] - 1) != 0) if len(altos) else np.zeros(0, np.int64)
+    claves = altos[inicio]
+    inicio = np.append(inicio, len(pares)).astype(np.int64)
+    documentos = (pares & np.uint64(0xFFFFFFFF)).astype(np.int32)
+    return claves, inicio, documentos
+
+
+class IndiceBusqueda:
+    """Índice invertido de trigramas y NOG ordenados.
+
+    Cada fila se representa por sus columnas de texto plegadas y unidas con un
+    separador. Para cada trigrama se guarda la lista ordenada de filas que lo
+    contienen (formato CSR). Una consulta intersecta las listas de sus
+    trigramas y verifica la subcadena solo sobre los candidatos.
+
+    Las actualizaciones agregan un segmento nuevo con las filas modificadas;
+    ``segmento_de_fila`` indica qué segmento tiene la versión vigente de cada
+    fila. Al pasar de ``MAX_SEGMENTOS`` se reconstruye un único segmento.
+    """
+
+    MAX_SEGMENTOS = 8
+
+    def __init__(self, df, columnas=COLUMNAS_TEXTO):
+        self.n = len(df)
+        self.columnas = [c for c in columnas if c in df.columns]
+        self.textos = self._textos(df)
+        self._reconstruir()
+        self._indexar_nog(df['nog'])
+
+    def _textos(self, df):
+        textos = plegar(df[self.columnas[0]])
+        for col in self.columnas[1:]:
+            textos = textos + SEPARADOR + plegar(df[col])
+        # Copia propia: to_numpy de un str de pandas puede ser de solo lectura y actualizar escribe en él
+        return np.array(textos, dtype=object)
+
+    def _reconstruir(self):
+        self.segmentos = [_segmento(np.arange(self.n), self.textos)]
+        self.segmento_de_fila = np.zeros(self.n, dtype=np.int16)
+
+    def _indexar_nog(self, nogs):
+        texto = nogs.astype('string').fillna('').to_numpy(dtype=str)
+        self.nog_orden = np.argsort(texto, kind='stable')
+        self.nog_ordenados = texto[self.nog_orden]
+
+    def actualizar(self, df, filas):
+        """Re-indexa ``filas`` (reemplazadas o agregadas al final de ``df``)"""
+        filas = np.asarray(filas, dtype=np.int64)
+        n_anterior = self.n
+        self.n = len(df)
+        extra = self.n - n_anterior
+        if extra > 0:
+            self.textos = np.concatenate([self.textos, np.full(extra, '', dtype=object)])
+            self.segmento_de_fila = np.concatenate([self.segmento_de_fila, np.zeros(extra, dtype=np.int16)])
+        self.textos[filas] = self._textos(df.take(filas))
+
+        if len(self.segmentos) >= self.MAX_SEGMENTOS:
+            self._reconstruir()
+        else:
+            self.segmentos.append(_segmento(filas, self.textos[filas]))
+            self.segmento_de_fila[filas] = len(self.segmentos) - 1
+
+        # Los NOG de filas reemplazadas no cambian (el upsert es por NOG)
+        agregadas = filas[filas >= n_anterior]
+        if len(agregadas):
+            texto = df['nog'].take(agregadas).astype('string').fillna('').to_numpy(dtype=str)
+            orden = np.argsort(texto, kind='stable')
+            posiciones = np.searchsorted(self.nog_ordenados, texto[orden], side='right')
+            ordenados = self.nog_ordenados.astype(np.result_type(self.nog_ordenados, texto))
+            self.nog_ordenados = np.insert(ordenados, posiciones, texto[orden])
+            self.nog_orden = np.insert(self.nog_orden, posiciones, agregadas[orden])
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    @staticmethod
+    def _lista(segmento, codigo):
+        claves, inicio, documentos = segmento
+        pos = np.searchsorted(claves, codigo)
+        if pos == len(claves) or claves[pos] != codigo:
+            return np.zeros(0, dtype=np.int32)
+        return documentos[inicio[pos]:inicio[pos + 1]]
+
+    def _candidatos(self, trigramas):
+        resultado = []
+        for s, segmento in enumerate(self.segmentos):
+            listas = sorted((self._lista(segmento, c) for c in trigramas), key=len)
+            candidatos = listas[0]
+            for lista in listas[1:]:
+                if len(candidatos) == 0:
+                    break
+                candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+            # Se descartan las versiones viejas de filas re-indexadas en otro segmento
+            resultado.append(candidatos[self.segmento_de_fila[candidatos] == s])
+        return np.sort(np.concatenate(resultado)) if resultado else np.zeros(0, dtype=np.int64)
+
+    def buscar_texto(self, consulta):
+        """Filas cuyo texto plegado contiene la consulta plegada"""
+        # Un signo suelto (´, ¨) se pliega a espacio: se recorta después de plegar
+        consulta = plegar_texto(consulta).strip()
+        if not consulta:
+            return np.zeros(0, dtype=np.int64)  # Solo tildes o signos: no hay qué buscar
+        if len(consulta) < 3:
+            # Sin trigramas que usar: se recorre el texto ya plegado
+            candidatos = np.arange(self.n)
+        else:
+            codepoints = np.frombuffer(consulta.encode('ascii'), dtype=np.uint8)
+            candidatos = self._candidatos(np.unique(_codigos_trigramas(codepoints)))
+        if len(candidatos) == 0:
+            return np.zeros(0, dtype=np.int64)
+        coinciden = pd.Series(self.textos[candidatos]).str.contains(consulta, regex=False).to_numpy()
+        return np.asarray(candidatos, dtype=np.int64)[coinciden]
+
+    def buscar_nog(self, prefijo):
+        """Filas cuyo NOG empieza con ``prefijo`` (búsqueda binaria)"""
+        if not prefijo:
+            return np.zeros(0, dtype=np.int64)
+        siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+        inicio = np.searchsorted(self.nog_ordenados, prefijo, side='left')
+        fin = np.searchsorted(self.nog_ordenados, siguiente, side='left')
+        return np.sort(self.nog_orden[inicio:fin])
+
+    def buscar(self, consulta):
+        """Filas (ordenadas) que coinciden por texto o por prefijo de NOG"""
+        consulta = consulta.strip()
+        resultado = self.buscar_texto(consulta)
+        if consulta.isdigit():
+            resultado = np.union1d(resultado, self.buscar_nog(consulta))
+        return resultado
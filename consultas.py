@@ -0,0 +1,962 @@
+# consultas.py
+"""Capa de acceso a datos: los filtros y agregados se resuelven en un motor"""
+import functools
+import hashlib
+import importlib.util
+import json
+import operator
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+from alertas import REGLAS, REGLAS_POR_NOMBRE, hoy
+from almacen import AlmacenLicitaciones, version_dataset
+from busqueda import COLUMNAS_TEXTO
+from cubo import agrupar_filas, armar_resumen, resumen_filas
+from datos import (
+    ARCHIVO_CSV, DIRECTORIO_EXTRACTOS, escribir_rechazos, firma_archivo, hash_archivo, listar_extractos
+)
+from esquema import COLUMNAS_RECHAZOS, ESQUEMA_POR_NOMBRE, FIRMA_ESQUEMA, VALORES_NULOS
+from exportar import TAMANO_BLOQUE, abrir_exportacion, bloques
+from indices import COLUMNA_MONTO, contar_bits
+from proveedores import COLUMNA_PROVEEDOR, concentracion_filas, ranking_filas
+from series import armar_serie, periodos, serie_filas
+from territorio import plegar_texto
+
+
+# Variable de entorno que elige el motor: 'pandas' (en memoria, por defecto)
+# o 'duckdb' (consultas sobre Parquet, para datasets que no caben en RAM)
+VARIABLE_MOTOR = 'GUATECOMPRAS_MOTOR'
+MOTORES = ('pandas', 'duckdb')
+
+# Bins del monto (escala log10) en la densidad ofertas × monto
+BINS_MONTO = 40
+
+# Operadores admitidos en Consulta.con(); además existe 'in' (lista de valores)
+OPERADORES = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def motor_configurado():
+    """Nombre del motor pedido en ``GUATECOMPRAS_MOTOR`` ('pandas' si no es válido)"""
+    nombre = os.environ.get(VARIABLE_MOTOR, 'pandas').strip().lower()
+    return nombre if nombre in MOTORES else 'pandas'
+
+
+def duckdb_disponible():
+    return importlib.util.find_spec('duckdb') is not None
+
+
+def crear_motor(nombre='pandas', ruta=ARCHIVO_CSV, directorio_extractos=DIRECTORIO_EXTRACTOS):
+    """Construye el motor ``nombre`` sobre el CSV ``ruta`` y sus extractos"""
+    if nombre == 'duckdb':
+        return MotorDuckDB(ruta, directorio_extractos)
+    return MotorPandas(AlmacenLicitaciones.desde_csv(ruta, directorio_extractos))
+
+
+# ============================================
+# CONSULTA
+# ============================================
+class Consulta:
+    """Combinación de filtros del dashboard, independiente del motor.
+
+    - ``selecciones``: {columna: valores permitidos}
+    - ``rango_monto``: None (sin filtro) o (mín, máx); un extremo None queda
+      abierto y (None, None) exige solo monto informado
+    - ``busqueda``: texto libre o prefijo de NOG
+    - ``condiciones``: tuplas (columna, operador, valor), ver OPERADORES
+    - ``alertas``: nombres de reglas de alertas.REGLAS que deben cumplirse
+
+    Es inmutable: cada método devuelve una consulta nueva.
+    """
+
+    def __init__(self, selecciones=None, rango_monto=None, busqueda='', condiciones=(), alertas=()):
+        self.selecciones = dict(selecciones or {})
+        self.rango_monto = None if rango_monto is None else tuple(rango_monto)
+        self.busqueda = (busqueda or '').strip()
+        self.condiciones = tuple(condiciones)
+        self.alertas = tuple(alertas)
+
+    def _con(self, **cambios):
+        campos = {
+            'selecciones': self.selecciones,
+            'rango_monto': self.rango_monto,
+            'busqueda': self.busqueda,
+            'condiciones': self.condiciones,
+            'alertas': self.alertas,
+        }
+        campos.update(cambios)
+        return Consulta(**campos)
+
+    def filtrar(self, columna, valores):
+        selecciones = dict(self.selecciones)
+        selecciones[columna] = list(valores)
+        return self._con(selecciones=selecciones)
+
+    def con_rango_monto(self, minimo=None, maximo=None):
+        return self._con(rango_monto=(minimo, maximo))
+
+    def con_busqueda(self, texto):
+        return self._con(busqueda=texto)
+
+    def con(self, *condiciones):
+        for _, op, _ in condiciones:
+            if op != 'in' and op not in OPERADORES:
+                raise ValueError(f"Operador no soportado: {op}")
+        return self._con(condiciones=self.condiciones + tuple(condiciones))
+
+    def con_alerta(self, *nombres):
+        for nombre in nombres:
+            if nombre not in REGLAS_POR_NOMBRE:
+                raise ValueError(f"Regla de alerta desconocida: {nombre}")
+        return self._con(alertas=self.alertas + tuple(nombres))
+
+    def firma(self):
+        """Hash canónico de los filtros (el orden de los valores elegidos no importa)"""
+        def canonico(valor):
+            if isinstance(valor, (list, tuple, set, np.ndarray, pd.Index)):
+                return sorted(str(v) for v in valor)
+            return str(valor)
+
+        contenido = json.dumps({
+            'selecciones': {k: canonico(v) for k, v in self.selecciones.items()},
+            # (mín, máx) es ordenado: un extremo abierto no puede intercambiarse con el otro
+            'rango_monto': None if self.rango_monto is None else [
+                None if v is None else float(v) for v in self.rango_monto
+            ],
+            'busqueda': self.busqueda,
+            'condiciones': [[c, op, canonico(v)] for c, op, v in self.condiciones],
+            'alertas': sorted(self.alertas),
+        }, sort_keys=True)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:24]
+
+
+# ============================================
+# FUENTES PARA LA TABLA PAGINADA
+# ============================================
+# Una fuente expone ``total`` y ``pagina(columnas, ordenar_por, ascendente,
+# inicio, fin)``; tablas.tabla_paginada no sabe de qué motor viene.
+class FuenteDataFrame:
+    """Tabla pequeña ya materializada"""
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.total = len(self.df)
+
+    def pagina(self, columnas, ordenar_por, ascendente, inicio, fin):
+        df = self.df
+        if ordenar_por:
+            df = df.sort_values(ordenar_por, ascending=ascendente, kind='stable', na_position='last')
+        return df[columnas].iloc[inicio:fin]
+
+
+class FuenteFilas:
+    """Filas de un DataFrame grande; el orden usa indices.OrdenesTabla si lo hay.
+
+    ``lectura`` protege ``ordenes`` si se actualiza en su lugar (ver
+    AlmacenLicitaciones.lectura).
+    """
+
+    def __init__(self, df, filas, ordenes=None, lectura=nullcontext):
+        self.df = df
+        self.filas = np.asarray(filas)
+        self.ordenes = ordenes
+        self.lectura = lectura
+        self.total = len(self.filas)
+
+    def pagina(self, columnas, ordenar_por, ascendente, inicio, fin):
+        filas = self.filas
+        if ordenar_por:
+            if self.ordenes is not None and ordenar_por in self.ordenes.rangos:
+                with self.lectura():
+                    filas = self.ordenes.ordenar(filas, ordenar_por, ascendente)
+            else:
+                valores = self.df[ordenar_por].take(filas).reset_index(drop=True)
+                orden = valores.sort_values(ascending=ascendente, kind='stable', na_position='last').index
+                filas = filas[orden.to_numpy()]
+        return self.df[columnas].take(filas[inicio:fin])
+
+
+class FuenteSQL:
+    """Página resuelta con ORDER BY / LIMIT / OFFSET en el motor DuckDB"""
+
+    def __init__(self, motor, consulta):
+        self.motor = motor
+        self.consulta = consulta
+        self.total = motor.contar(consulta)
+
+    def pagina(self, columnas, ordenar_por, ascendente, inicio, fin):
+        donde, parametros = self.motor._donde(self.consulta)
+        orden = ''
+        if ordenar_por:
+            sentido = 'ASC' if ascendente else 'DESC'
+            orden = f"{_id(ordenar_por)} {sentido} NULLS LAST, "
+        # El NOG desempata para que las páginas sean estables entre consultas
+        sql = (f"SELECT {', '.join(_id(c) for c in columnas)} FROM {self.motor.TABLA} WHERE {donde} "
+               f"ORDER BY {orden}nog LIMIT ? OFFSET ?")
+        return self.motor._df(sql, parametros + [fin - inicio, inicio])
+
+
+# ============================================
+# DENSIDAD OFERTAS × MONTO
+# ============================================
+def bordes_monto(log_minimo, log_maximo, n_bins=BINS_MONTO):
+    """Bordes de los bins en log10 del monto (un rango vacío se abre un poco)"""
+    if log_maximo <= log_minimo:
+        log_minimo, log_maximo = log_minimo - 0.25, log_maximo + 0.25
+    return np.linspace(log_minimo, log_maximo, n_bins + 1)
+
+
+def tabla_bins(ofertas, bins, cantidad, suma, bordes, minimo=None, maximo=None):
+    """Celdas no vacías: ofertas, bin y rango de monto, cantidad y monto total.
+
+    Los extremos exteriores son el mínimo y máximo exactos, para que filtrar
+    una celda por su rango de monto devuelva todas sus licitaciones.
+    """
+    bins = np.asarray(bins, dtype=np.int64)
+    limites = 10 ** np.asarray(bordes, dtype=float)
+    if len(limites):
+        limites[0], limites[-1] = min(minimo, limites[0]), max(maximo, limites[-1])
+    return pd.DataFrame({
+        'numero_ofertas': np.asarray(ofertas, dtype=np.int64),
+        'bin_monto': bins,
+        'monto_desde': limites[bins] if len(limites) else np.zeros(0),
+        'monto_hasta': limites[bins + 1] if len(limites) else np.zeros(0),
+        'Cantidad': np.asarray(cantidad, dtype=np.int64),
+        COLUMNA_MONTO: np.asarray(suma, dtype=float),
+    }).sort_values(['numero_ofertas', 'bin_monto'], ignore_index=True)
+
+
+def _sin_bins():
+    return tabla_bins([], [], [], [], np.zeros(0))
+
+
+def consulta_celda(consulta, ofertas, bin_monto, desde, hasta, n_bins=BINS_MONTO):
+    """``consulta`` restringida a las licitaciones de una celda de ``tabla_bins``"""
+    # La última celda incluye el monto máximo
+    operador_hasta = '<=' if bin_monto == n_bins - 1 else '<'
+    return consulta.con(('numero_ofertas', '==', ofertas), (COLUMNA_MONTO, '>=', desde),
+                        (COLUMNA_MONTO, operador_hasta, hasta))
+
+
+# ============================================
+# MOTOR EN MEMORIA (PANDAS)
+# ============================================
+def _cumple(serie, op, valor):
+    """Máscara booleana de la condición (los nulos nunca cumplen)"""
+    if op == 'in':
+        return serie.isin(list(valor)).to_numpy()
+    return OPERADORES[op](serie, valor).fillna(False).to_numpy(dtype=bool)
+
+
+def _leyendo(metodo):
+    """Corre el método del motor con el almacén tomado para lectura"""
+    @functools.wraps(metodo)
+    def envuelto(self, *args, **kwargs):
+        with self.almacen.lectura():
+            return metodo(self, *args, **kwargs)
+    return envuelto
+
+
+class MotorPandas:
+    """Motor en memoria sobre AlmacenLicitaciones.
+
+    Las selecciones y el rango de monto se resuelven con el índice de
+    bitmaps; indicadores y gráficos salen del cubo cuando la consulta lo
+    permite. Las filas de cada consulta se guardan en una LRU pequeña, así
+    que los distintos bloques del dashboard no repiten el filtrado. Cada
+    consulta pública lee el almacén bajo ``_leyendo``: un ``actualizar``
+    concurrente espera a que termine y la consulta nunca ve estructuras a
+    medio modificar.
+    """
+
+    nombre = 'pandas'
+    MAX_RESULTADOS = 16
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.almacen.version
+
+    def total(self):
+        return self.almacen.n
+
+    def columnas(self):
+        return list(self.almacen.df.columns)
+
+    def actualizar(self):
+        """Incorpora extractos nuevos; devuelve el número de filas cambiadas"""
+        return self.almacen.actualizar()
+
+    # ----------------------------------------
+    # Resolución de filtros
+    # ----------------------------------------
+    def _solo_indice(self, consulta):
+        return (not consulta.busqueda and not consulta.condiciones
+                and set(consulta.selecciones) <= set(self.almacen.indice.dimensiones))
+
+    def _bitmap(self, consulta):
+        indice = self.almacen.indice
+        bitmap = indice.todas()
+        for dim, valores in consulta.selecciones.items():
+            if dim in indice.dimensiones:
+                bitmap = indice.filtrar(dim, valores, bitmap)
+        if consulta.rango_monto is not None:
+            minimo, maximo = consulta.rango_monto
+            bitmap = indice.filtrar_monto(-np.inf if minimo is None else minimo,
+                                          np.inf if maximo is None else maximo, bitmap)
+        if consulta.alertas:
+            alertas = self._alertas()
+            for nombre in consulta.alertas:
+                bitmap = bitmap & alertas[nombre]
+        return bitmap
+
+    def _alertas(self):
+        return self.almacen.alertas.obtener(self.almacen.df, self.version)
+
+    @_leyendo
+    def filas(self, consulta):
+        """Posiciones (ordenadas) de las filas que cumplen la consulta"""
+        clave = (self.version, consulta.firma())
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                return self._resultados[clave]
+
+        indice = self.almacen.indice
+        filas = indice.filas(self._bitmap(consulta))
+        if consulta.busqueda:
+            # El índice de búsqueda devuelve filas del dataset completo
+            filas = np.intersect1d(filas, self.almacen.busqueda.buscar(consulta.busqueda), assume_unique=True)
+
+        df = self.almacen.df
+        condiciones = [(c, 'in', v) for c, v in consulta.selecciones.items() if c not in indice.dimensiones]
+        for col, op, valor in condiciones + list(consulta.condiciones):
+            if len(filas) == 0:
+                break
+            filas = filas[_cumple(df[col].take(filas), op, valor)]
+
+        with self._lock:
+            self._resultados[clave] = filas
+            while len(self._resultados) > self.MAX_RESULTADOS:
+                self._resultados.popitem(last=False)
+        return filas
+
+    def _celdas(self, consulta):
+        """Máscara de celdas del cubo, o None si la consulta no se responde con él"""
+        cubo = self.almacen.cubo
+        if not self._solo_indice(consulta) or consulta.rango_monto != (None, None) or consulta.alertas:
+            return None
+        if not set(cubo.dimensiones) <= set(consulta.selecciones):
+            return None  # El cubo excluye filas con dimensiones nulas
+        return cubo.seleccionar(consulta.selecciones)
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    @_leyendo
+    def opciones(self, columna, consulta):
+        """Valores presentes de ``columna`` bajo la consulta, ordenados"""
+        indice = self.almacen.indice
+        if columna in indice.dimensiones and self._solo_indice(consulta):
+            return indice.opciones(columna, self._bitmap(consulta))
+        valores = self.almacen.df[columna].take(self.filas(consulta)).to_numpy(dtype=object)
+        valores = pd.unique(valores[pd.notna(valores)])
+        if columna == 'año_adjudicacion':
+            valores = valores.astype(int)  # Como en el índice: la columna es float por los nulos
+        return sorted(valores.tolist())
+
+    @_leyendo
+    def rango_monto(self, consulta):
+        """(mín, máx) del monto bajo la consulta, o None si no hay montos"""
+        if self._solo_indice(consulta):
+            return self.almacen.indice.rango_monto(self._bitmap(consulta))
+        montos = self.almacen.df[COLUMNA_MONTO].to_numpy(dtype=float)[self.filas(consulta)]
+        montos = montos[~np.isnan(montos)]
+        return (float(montos.min()), float(montos.max())) if len(montos) else None
+
+    @_leyendo
+    def contar(self, consulta):
+        if self._solo_indice(consulta):
+            return self.almacen.indice.contar(self._bitmap(consulta))
+        return len(self.filas(consulta))
+
+    @_leyendo
+    def contar_alertas(self, consulta):
+        """{regla: filas de la consulta que la cumplen}; solo se intersectan bitmaps"""
+        alertas = self._alertas()
+        if self._solo_indice(consulta):
+            bitmap = self._bitmap(consulta)
+            return {r.nombre: contar_bits(alertas[r.nombre] & bitmap) for r in REGLAS}
+        filas = self.filas(consulta)
+        n = self.almacen.n
+        return {r.nombre: int(np.unpackbits(alertas[r.nombre], count=n)[filas].sum()) for r in REGLAS}
+
+    @_leyendo
+    def resumen(self, consulta):
+        """Indicadores clave (misma forma que cubo.resumen_filas)"""
+        celdas = self._celdas(consulta)
+        if celdas is not None:
+            return self.almacen.cubo.resumen(celdas, self.almacen.proveedores.distintos(celdas))
+        columnas = [COLUMNA_MONTO, 'proveedor_ganador', 'departamento', 'region']
+        return resumen_filas(self.almacen.vista(self.filas(consulta), columnas))
+
+    @_leyendo
+    def agrupar(self, dim, consulta):
+        """Cantidad y monto por valor de ``dim``, ordenado por ``dim``"""
+        celdas = self._celdas(consulta)
+        if celdas is not None:
+            return self.almacen.cubo.agrupar(dim, celdas)
+        return agrupar_filas(self.almacen.vista(self.filas(consulta), [dim, COLUMNA_MONTO]), dim)
+
+    @_leyendo
+    def agrupar_por(self, columnas, consulta):
+        """Cantidad y monto por combinación de ``columnas`` (sin nulos)"""
+        df = self.almacen.vista(self.filas(consulta), list(columnas) + [COLUMNA_MONTO])
+        return agrupar_filas(df, list(columnas))
+
+    @_leyendo
+    def serie_temporal(self, consulta, columna_fecha, granularidad):
+        """Serie por período de ``columna_fecha`` con media móvil e interanual (ver series.armar_serie)"""
+        celdas = self._celdas(consulta)
+        if celdas is not None:
+            return self.almacen.series.serie(celdas, columna_fecha, granularidad)
+        df = self.almacen.vista(self.filas(consulta), [columna_fecha, COLUMNA_MONTO])
+        return serie_filas(df, columna_fecha, granularidad)
+
+    @_leyendo
+    def top_proveedores(self, consulta, k=10):
+        """Los ``k`` proveedores con mayor monto adjudicado (ver proveedores.ranking)"""
+        celdas = self._celdas(consulta)
+        if celdas is not None:
+            return self.almacen.proveedores.top(celdas, k)
+        return ranking_filas(self.almacen.vista(self.filas(consulta), [COLUMNA_PROVEEDOR, COLUMNA_MONTO]), k)
+
+    @_leyendo
+    def concentracion(self, consulta, dim, k=4):
+        """HHI y participación de los ``k`` mayores proveedores por valor de ``dim``"""
+        celdas = self._celdas(consulta)
+        if celdas is not None:
+            return self.almacen.proveedores.concentracion(celdas, dim, k)
+        df = self.almacen.vista(self.filas(consulta), [dim, COLUMNA_PROVEEDOR, COLUMNA_MONTO])
+        return concentracion_filas(df, dim, k)
+
+    @_leyendo
+    def datos(self, consulta, columnas):
+        """Filas de la consulta con las columnas pedidas"""
+        return self.almacen.vista(self.filas(consulta), columnas)
+
+    @_leyendo
+    def bins_ofertas(self, consulta, n_bins=BINS_MONTO):
+        """Densidad número de ofertas × monto (bins log10), ver tabla_bins"""
+        df = self.almacen.vista(self.filas(consulta), ['numero_ofertas', COLUMNA_MONTO])
+        ofertas = df['numero_ofertas'].to_numpy(dtype=float)
+        montos = df[COLUMNA_MONTO].to_numpy(dtype=float)
+        validas = (ofertas >= 0) & (montos > 0)  # Los NaN no cumplen ninguna
+        if not validas.any():
+            return _sin_bins()
+        ofertas = ofertas[validas].astype(np.int64)
+        montos = montos[validas]
+        log_montos = np.log10(montos)
+        bordes = bordes_monto(log_montos.min(), log_montos.max(), n_bins)
+        bins = np.clip(((log_montos - bordes[0]) / (bordes[1] - bordes[0])).astype(np.int64), 0, n_bins - 1)
+
+        # Ofertas y bin en una sola clave entera: bincount cuenta y suma de una pasada
+        clave = ofertas * n_bins + bins
+        cantidad = np.bincount(clave)
+        suma = np.bincount(clave, weights=montos)
+        presentes = np.flatnonzero(cantidad)
+        return tabla_bins(presentes // n_bins, presentes % n_bins, cantidad[presentes], suma[presentes], bordes,
+                          montos.min(), montos.max())
+
+    @_leyendo
+    def fuente(self, consulta):
+        return FuenteFilas(self.almacen.df, self.filas(consulta), self.almacen.ordenes, self.almacen.lectura)
+
+    def exportar(self, consulta, extension):
+        """Archivo exportado con todas las columnas, abierto para lectura"""
+        # Con el cerrojo solo se toma la foto: el upsert arma un df nuevo y las
+        # posiciones no cambian, así que la escritura no bloquea a actualizar
+        with self.almacen.lectura():
+            df, filas, version = self.almacen.df, self.filas(consulta), self.version
+        return abrir_exportacion(lambda: bloques(df, filas), version, consulta.firma(), extension)
+
+
+# ============================================
+# MOTOR FUERA DE MEMORIA (DUCKDB)
+# ============================================
+def _id(columna):
+    """Identificador SQL entre comillas"""
+    return '"' + columna.replace('"', '""') + '"'
+
+
+def _literal(texto):
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def _parametro(valor):
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class MotorDuckDB:
+    """Motor fuera de memoria: DuckDB sobre un snapshot Parquet.
+
+    El CSV se convierte a Parquet con SQL (sin pasar por pandas) solo cuando
+    cambia; los extractos se leen desde sus CSV a una tabla pequeña y la
+    vista ``licitaciones`` aplica el upsert por NOG. Filtros, agregados,
+    páginas y exportaciones se resuelven como consultas: a Python solo llegan
+    los resultados.
+    """
+
+    nombre = 'duckdb'
+    TABLA = 'licitaciones'
+
+    def __init__(self, ruta=ARCHIVO_CSV, directorio_extractos=DIRECTORIO_EXTRACTOS):
+        import duckdb
+
+        self.ruta = ruta
+        self.directorio_extractos = directorio_extractos
+        self.ruta_parquet = os.path.splitext(ruta)[0] + '.parquet'
+        self._con = duckdb.connect()
+        self._lock = threading.Lock()
+        self.version_base = self._asegurar_parquet()
+        self.extractos = {}
+        self._crear_vista()
+        self.version = version_dataset(self.version_base, self.extractos)
+        self._clave_alertas = None
+
+    # ----------------------------------------
+    # Snapshot Parquet y vista
+    # ----------------------------------------
+    def _columnas_de(self, origen):
+        return self._df(f"DESCRIBE SELECT * FROM {origen}")['column_name'].tolist()
+
+    def _esquema(self, origen):
+        """{columna: (expresión tipada, [(motivo, condición de rechazo)])} según esquema.ESQUEMA"""
+        esquema = {}
+        for col in self._columnas_de(origen):
+            columna = ESQUEMA_POR_NOMBRE.get(col)
+            if columna is None:
+                esquema[col] = (_id(col), [])
+                continue
+            fuera, renombres = (), None
+            if columna.canonicos is not None:
+                distintos = self._df(f"SELECT DISTINCT {_id(col)} AS v FROM {origen} WHERE {_id(col)} IS NOT NULL")
+                distintos = distintos['v'].tolist()
+                fuera, renombres = columna.fuera_de_dominio(distintos), columna.renombres(distintos)
+            esquema[col] = columna.sql(_id(col), fuera, renombres)
+        return esquema
+
+    def _tipado(self, origen):
+        """SELECT con los mismos tipos y las mismas filas que datos.leer_csv"""
+        columnas = self._esquema(origen)
+        expresiones = [f"{tipada} AS {_id(col)}" for col, (tipada, _) in columnas.items()]
+        if 'fecha_adjudicacion' in columnas:
+            expresiones.append(f"year({columnas['fecha_adjudicacion'][0]}) AS \"año_adjudicacion\"")
+        rechazo = ' OR '.join(f"coalesce({condicion}, FALSE)"
+                              for _, problemas in columnas.values() for _, condicion in problemas)
+        return f"SELECT {', '.join(expresiones)} FROM {origen} WHERE NOT ({rechazo or 'FALSE'})"
+
+    def _rechazos(self, origen):
+        """Reporte de rechazos con el formato de esquema.convertir"""
+        columnas = self._esquema(origen)
+        condiciones = [(col, motivo, f"coalesce({condicion}, FALSE)")
+                       for col, (_, problemas) in columnas.items() for motivo, condicion in problemas]
+        if not condiciones:
+            return pd.DataFrame(columns=COLUMNAS_RECHAZOS)
+        # Una sola pasada por el CSV aparta las filas rechazadas (pocas); el
+        # detalle por valor se arma sobre ellas
+        self._ejecutar(f"""
+            CREATE OR REPLACE TABLE rechazadas AS
+            SELECT * FROM (SELECT row_number() OVER () AS fila, * FROM {origen})
+            WHERE {' OR '.join(c for _, _, c in condiciones)}
+        """)
+        nog = 'nog' if 'nog' in columnas else 'NULL'
+        partes = [
+            f"SELECT fila, {nog} AS nog, {_literal(col)} AS columna, {_id(col)} AS valor, {_literal(motivo)} AS motivo "
+            f"FROM rechazadas WHERE {condicion}"
+            for col, motivo, condicion in condiciones
+        ]
+        reporte = self._df(f"{' UNION ALL '.join(partes)} ORDER BY fila, columna")
+        self._ejecutar("DROP TABLE rechazadas")
+        return reporte
+
+    @staticmethod
+    def _leer_csv(rutas, **opciones):
+        """read_csv de DuckDB con todo como texto: los tipos los pone el esquema"""
+        lista = '[' + ', '.join(_literal(r) for r in rutas) + ']'
+        nulos = '[' + ', '.join(_literal(v) for v in VALORES_NULOS) + ']'
+        extra = ''.join(f", {k}=true" for k in opciones)
+        return f"read_csv({lista}, header=true, normalize_names=true, all_varchar=true, nullstr={nulos}{extra})"
+
+    def _asegurar_parquet(self):
+        """Regenera el Parquet si cambió el CSV; devuelve la versión del CSV"""
+        ruta_firma = self.ruta_parquet + '.json'
+        actual = firma_archivo(self.ruta, calcular_hash=False)
+        guardada = None
+        if os.path.exists(self.ruta_parquet) and os.path.exists(ruta_firma):
+            with open(ruta_firma, encoding='utf-8') as f:
+                guardada = json.load(f)
+        if guardada and guardada.get('esquema') != FIRMA_ESQUEMA:
+            guardada = None  # Parquet escrito con otro esquema
+
+        if guardada and (guardada['tamano'], guardada['mtime_ns']) == (actual['tamano'], actual['mtime_ns']):
+            return guardada['sha256'][:12]
+        actual['sha256'] = hash_archivo(self.ruta)
+        if not guardada or guardada.get('sha256') != actual['sha256']:
+            # El CSV se lee una sola vez como texto; dominios, Parquet y
+            # reporte de rechazos salen de esa tabla (DuckDB la baja a disco si no cabe)
+            self._ejecutar(f"CREATE OR REPLACE TABLE crudo AS SELECT * FROM {self._leer_csv([self.ruta])}")
+            temporal = f"{self.ruta_parquet}.{uuid.uuid4().hex}.tmp"
+            self._ejecutar(f"COPY ({self._tipado('crudo')}) TO {_literal(temporal)} (FORMAT parquet)")
+            os.replace(temporal, self.ruta_parquet)
+            leidas = self._fila("SELECT count(*) FROM crudo")[0]
+            escritas = self._fila(f"SELECT count(*) FROM read_parquet({_literal(self.ruta_parquet)})")[0]
+            # Solo si faltan filas hace falta la pasada que arma el reporte
+            escribir_rechazos(self.ruta, self._rechazos('crudo') if escritas < leidas else pd.DataFrame())
+            self._ejecutar("DROP TABLE crudo")
+        with open(ruta_firma, 'w', encoding='utf-8') as f:
+            json.dump(actual, f)
+        return actual['sha256'][:12]
+
+    def _crear_vista(self):
+        """Vista ``licitaciones``: el Parquet con las filas de ``delta`` (extractos) por encima.
+
+        ``delta`` es una tabla persistente con el mismo esquema que el Parquet;
+        ``actualizar`` le aplica solo los extractos pendientes.
+        """
+        base = f"read_parquet({_literal(self.ruta_parquet)})"
+        self._ejecutar(f"CREATE OR REPLACE TABLE delta AS SELECT * FROM {base} LIMIT 0")
+        self._ejecutar(f"""
+            CREATE OR REPLACE VIEW {self.TABLA} AS
+            SELECT * FROM {base} WHERE nog NOT IN (SELECT nog FROM delta)
+            UNION ALL BY NAME
+            SELECT * FROM delta
+        """)
+
+    def _aplicar_extracto(self, nombre):
+        """Upsert de un extracto sobre ``delta``; devuelve los NOG aplicados.
+
+        Igual que datos.cargar_extractos: las filas que no cumplen el esquema
+        quedan en el reporte de rechazos al lado del extracto y no entran; ante
+        NOG repetidos en el archivo gana la última fila.
+        """
+        ruta = os.path.join(self.directorio_extractos, nombre)
+        self._ejecutar(f"CREATE OR REPLACE TABLE crudo AS SELECT * FROM {self._leer_csv([ruta])}")
+        self._ejecutar(f"""
+            CREATE OR REPLACE TABLE nuevo AS
+            SELECT row_number() OVER () AS fila, * FROM ({self._tipado('crudo')})
+        """)
+        leidas = self._fila("SELECT count(*) FROM crudo")[0]
+        validas = self._fila("SELECT count(*) FROM nuevo")[0]
+        escribir_rechazos(ruta, self._rechazos('crudo') if validas < leidas else pd.DataFrame())
+
+        # Columnas fuera del esquema del Parquet se descartan, como en datos.upsert
+        columnas = [c for c in self._columnas_de('nuevo') if c in set(self._columnas_de('delta'))]
+        lista = ', '.join(_id(c) for c in columnas)
+        ultimas = "SELECT * FROM nuevo QUALIFY row_number() OVER (PARTITION BY nog ORDER BY fila DESC) = 1"
+        cursor = self._con.cursor()
+        try:
+            # Una sola transacción: ninguna consulta ve el NOG borrado y todavía sin insertar
+            cursor.execute("BEGIN TRANSACTION")
+            cursor.execute("DELETE FROM delta WHERE nog IN (SELECT nog FROM nuevo)")
+            cursor.execute(f"INSERT INTO delta ({lista}) SELECT {lista} FROM ({ultimas})")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.close()
+        nogs = set(self._df("SELECT nog FROM nuevo")['nog'].tolist())
+        self._ejecutar("DROP TABLE crudo")
+        self._ejecutar("DROP TABLE nuevo")
+        return nogs
+
+    def _asegurar_alertas(self):
+        """Tabla ``alertas`` (una bandera por regla y NOG) vigente para la versión y el día"""
+        fecha = hoy()
+        with self._lock:
+            if self._clave_alertas == (self.version, fecha):
+                return
+            columnas = self._columnas_de(self.TABLA)
+            banderas = ', '.join(
+                f"coalesce({r.sql(fecha) if r.aplica(columnas) else 'FALSE'}, FALSE) AS {_id('alerta_' + r.nombre)}"
+                for r in REGLAS
+            )
+            agregadas = ', '.join(f"bool_or({_id('alerta_' + r.nombre)}) AS {_id('alerta_' + r.nombre)}"
+                                  for r in REGLAS)
+            self._ejecutar(f"""
+                CREATE OR REPLACE TABLE alertas AS
+                SELECT nog, {agregadas} FROM (SELECT nog, {banderas} FROM {self.TABLA})
+                WHERE nog IS NOT NULL GROUP BY nog
+            """)
+            self._clave_alertas = (self.version, fecha)
+
+    def actualizar(self):
+        """Incorpora extractos nuevos o modificados; devuelve las filas reemplazadas o agregadas.
+
+        Como en AlmacenLicitaciones.actualizar, solo se leen los extractos
+        pendientes (en orden de nombre) y el conteo sale de las filas que
+        pasaron el esquema, sin repetir un NOG.
+        """
+        with self._lock:
+            disponibles = listar_extractos(self.directorio_extractos)
+            pendientes = [n for n, f in disponibles.items() if self.extractos.get(n) != f]
+            if not pendientes:
+                return 0
+            aplicados = set()
+            for nombre in pendientes:
+                aplicados |= self._aplicar_extracto(nombre)
+            self.extractos.update({n: disponibles[n] for n in pendientes})
+            self.version = version_dataset(self.version_base, self.extractos)
+            return len(aplicados)
+
+    # ----------------------------------------
+    # Ejecución
+    # ----------------------------------------
+    def _donde(self, consulta):
+        """Cláusula WHERE y parámetros de la consulta"""
+        partes, parametros = ['TRUE'], []
+        for col, valores in consulta.selecciones.items():
+            valores = [_parametro(v) for v in valores]
+            if not valores:
+                partes.append('FALSE')
+                continue
+            partes.append(f"{_id(col)} IN ({', '.join('?' * len(valores))})")
+            parametros += valores
+
+        if consulta.rango_monto is not None:
+            minimo, maximo = consulta.rango_monto
+            partes.append(f"{_id(COLUMNA_MONTO)} IS NOT NULL")
+            if minimo is not None:
+                partes.append(f"{_id(COLUMNA_MONTO)} >= ?")
+                parametros.append(float(minimo))
+            if maximo is not None:
+                partes.append(f"{_id(COLUMNA_MONTO)} <= ?")
+                parametros.append(float(maximo))
+
+        if consulta.busqueda:
+            # Mismo criterio que busqueda.IndiceBusqueda: texto plegado o prefijo de NOG
+            texto = plegar_texto(consulta.busqueda).strip()
+            opciones = []
+            if texto:
+                opciones = [f"contains(strip_accents(lower(coalesce(CAST({_id(c)} AS VARCHAR), ''))), ?)"
+                            for c in COLUMNAS_TEXTO]
+                parametros += [texto] * len(COLUMNAS_TEXTO)
+            if consulta.busqueda.isdigit():
+                opciones.append("starts_with(CAST(nog AS VARCHAR), ?)")
+                parametros.append(consulta.busqueda)
+            partes.append(f"({' OR '.join(opciones)})" if opciones else 'FALSE')
+
+        for col, op, valor in consulta.condiciones:
+            if op == 'in':
+                valores = [_parametro(v) for v in valor]
+                partes.append(f"{_id(col)} IN ({', '.join('?' * len(valores))})" if valores else 'FALSE')
+                parametros += valores
+            else:
+                partes.append(f"{_id(col)} {'=' if op == '==' else op} ?")
+                parametros.append(_parametro(valor))
+
+        if consulta.alertas:
+            self._asegurar_alertas()
+            for nombre in consulta.alertas:
+                partes.append(f"nog IN (SELECT nog FROM alertas WHERE {_id('alerta_' + nombre)})")
+        return ' AND '.join(partes), parametros
+
+    # La conexión la comparten los hilos de todas las sesiones y no admite
+    # uso concurrente: cada sentencia corre en un cursor propio. Por eso las
+    # tablas auxiliares (crudo, nuevo, rechazadas) no son TEMP: un cursor no ve las
+    # tablas temporales de otro.
+    def _ejecutar(self, sql, parametros=()):
+        cursor = self._con.cursor()
+        try:
+            cursor.execute(sql, list(parametros))
+        finally:
+            cursor.close()
+
+    def _df(self, sql, parametros=()):
+        cursor = self._con.cursor()
+        try:
+            return cursor.execute(sql, list(parametros)).df()
+        finally:
+            cursor.close()
+
+    def _fila(self, sql, parametros=()):
+        cursor = self._con.cursor()
+        try:
+            return cursor.execute(sql, list(parametros)).fetchone()
+        finally:
+            cursor.close()
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    def total(self):
+        return self._fila(f"SELECT count(*) FROM {self.TABLA}")[0]
+
+    def columnas(self):
+        return self._columnas_de(self.TABLA)
+
+    def opciones(self, columna, consulta):
+        donde, parametros = self._donde(consulta)
+        df = self._df(f"SELECT DISTINCT {_id(columna)} AS v FROM {self.TABLA} "
+                      f"WHERE {donde} AND {_id(columna)} IS NOT NULL ORDER BY 1", parametros)
+        valores = df['v'].tolist()
+        return [int(v) for v in valores] if columna == 'año_adjudicacion' else valores
+
+    def rango_monto(self, consulta):
+        donde, parametros = self._donde(consulta)
+        m = _id(COLUMNA_MONTO)
+        minimo, maximo = self._fila(f"SELECT min({m}), max({m}) FROM {self.TABLA} WHERE {donde}", parametros)
+        return None if minimo is None else (float(minimo), float(maximo))
+
+    def contar(self, consulta):
+        donde, parametros = self._donde(consulta)
+        return self._fila(f"SELECT count(*) FROM {self.TABLA} WHERE {donde}", parametros)[0]
+
+    def contar_alertas(self, consulta):
+        self._asegurar_alertas()
+        donde, parametros = self._donde(consulta)
+        conteos = ', '.join(f"count(*) FILTER (WHERE {_id('alerta_' + r.nombre)})" for r in REGLAS)
+        fila = self._fila(f"SELECT {conteos} FROM {self.TABLA} JOIN alertas USING (nog) WHERE {donde}",
+                          parametros)
+        return {r.nombre: int(c) for r, c in zip(REGLAS, fila)}
+
+    def resumen(self, consulta):
+        donde, parametros = self._donde(consulta)
+        m = _id(COLUMNA_MONTO)
+        fila = self._fila(f"""
+            SELECT count({m}), coalesce(sum({m}), 0), coalesce(var_pop({m}) * count({m}), 0),
+                   count(DISTINCT proveedor_ganador), count(DISTINCT departamento), count(DISTINCT region)
+            FROM {self.TABLA} WHERE {donde}
+        """, parametros)
+        return armar_resumen(*fila)
+
+    def agrupar(self, dim, consulta):
+        donde, parametros = self._donde(consulta)
+        m = _id(COLUMNA_MONTO)
+        df = self._df(f"""
+            SELECT {_id(dim)}, count(*) AS "Cantidad", coalesce(sum({m}), 0) AS {m}
+            FROM {self.TABLA} WHERE {donde} AND {_id(dim)} IS NOT NULL
+            GROUP BY 1 ORDER BY 1
+        """, parametros)
+        if dim == 'año_adjudicacion':
+            df[dim] = df[dim].astype(int)
+        return df
+
+    def agrupar_por(self, columnas, consulta):
+        donde, parametros = self._donde(consulta)
+        m = _id(COLUMNA_MONTO)
+        ids = ', '.join(_id(c) for c in columnas)
+        no_nulos = ' AND '.join(f"{_id(c)} IS NOT NULL" for c in columnas)
+        return self._df(f"""
+            SELECT {ids}, count(*) AS "Cantidad", coalesce(sum({m}), 0) AS {m}
+            FROM {self.TABLA} WHERE {donde} AND {no_nulos}
+            GROUP BY ALL ORDER BY {ids}
+        """, parametros)
+
+    def serie_temporal(self, consulta, columna_fecha, granularidad):
+        donde, parametros = self._donde(consulta)
+        f, m = _id(columna_fecha), _id(COLUMNA_MONTO)
+        unidad = {'D': 'day', 'W': 'week', 'M': 'month', 'A': 'year'}[granularidad]
+        df = self._df(f"""
+            SELECT date_trunc('{unidad}', {f}) AS periodo, count(*) AS cantidad, coalesce(sum({m}), 0) AS monto
+            FROM {self.TABLA} WHERE {donde} AND {f} IS NOT NULL
+            GROUP BY 1
+        """, parametros)
+        numeros = periodos(df['periodo'].to_numpy(dtype='datetime64[us]'), granularidad)
+        return armar_serie(numeros, df['cantidad'].to_numpy(dtype=np.int64), df['monto'].to_numpy(dtype=float),
+                           granularidad)
+
+    def top_proveedores(self, consulta, k=10):
+        donde, parametros = self._donde(consulta)
+        m = _id(COLUMNA_MONTO)
+        return self._df(f"""
+            SELECT proveedor_ganador, count(*) AS "Cantidad", sum({m}) AS {m},
+                   sum({m}) / nullif(sum(sum({m})) OVER (), 0) AS participacion
+            FROM {self.TABLA} WHERE {donde} AND proveedor_ganador IS NOT NULL AND {m} IS NOT NULL
+            GROUP BY 1 ORDER BY 3 DESC, 1 LIMIT ?
+        """, parametros + [k])
+
+    def concentracion(self, consulta, dim, k=4):
+        donde, parametros = self._donde(consulta)
+        g, m = _id(dim), _id(COLUMNA_MONTO)
+        return self._df(f"""
+            WITH pares AS (
+                SELECT {g} AS g, count(*) AS c, sum({m}) AS s
+                FROM {self.TABLA}
+                WHERE {donde} AND {g} IS NOT NULL AND proveedor_ganador IS NOT NULL AND {m} IS NOT NULL
+                GROUP BY {g}, proveedor_ganador
+            ), cuotas AS (
+                SELECT g, c, s, s / nullif(sum(s) OVER (PARTITION BY g), 0) AS cuota,
+                       row_number() OVER (PARTITION BY g ORDER BY s DESC) AS puesto
+                FROM pares
+            )
+            SELECT g AS {g}, CAST(sum(c) AS BIGINT) AS "Cantidad", sum(s) AS {m}, count(*) AS proveedores,
+                   sum(cuota * cuota) * 10000 AS hhi,
+                   sum(cuota) FILTER (WHERE puesto <= ?) AS participacion_top
+            FROM cuotas GROUP BY g ORDER BY g
+        """, parametros + [k])
+
+    def datos(self, consulta, columnas):
+        donde, parametros = self._donde(consulta)
+        return self._df(f"SELECT {', '.join(_id(c) for c in columnas)} FROM {self.TABLA} WHERE {donde}",
+                        parametros)
+
+    def bins_ofertas(self, consulta, n_bins=BINS_MONTO):
+        donde, parametros = self._donde(consulta)
+        m = _id(COLUMNA_MONTO)
+        donde += f" AND numero_ofertas >= 0 AND {m} > 0"
+        minimo, maximo = self._fila(f"SELECT min({m}), max({m}) FROM {self.TABLA} WHERE {donde}", parametros)
+        if minimo is None:
+            return _sin_bins()
+        bordes = bordes_monto(np.log10(minimo), np.log10(maximo), n_bins)
+        df = self._df(f"""
+            SELECT CAST(floor(numero_ofertas) AS BIGINT) AS o,
+                   least(greatest(CAST(floor((log10({m}) - ?) / ?) AS BIGINT), 0), ?) AS b,
+                   count(*) AS c, sum({m}) AS s
+            FROM {self.TABLA} WHERE {donde}
+            GROUP BY 1, 2
+        """, [float(bordes[0]), float(bordes[1] - bordes[0]), n_bins - 1] + parametros)
+        return tabla_bins(df['o'], df['b'], df['c'], df['s'], bordes, minimo, maximo)
+
+    def fuente(self, consulta):
+        return FuenteSQL(self, consulta)
+
+    def _bloques(self, consulta):
+        """Resultado completo en bloques de Arrow convertidos a pandas"""
+        donde, parametros = self._donde(consulta)
+        cursor = self._con.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM {self.TABLA} WHERE {donde}", parametros)
+            lector = cursor.fetch_record_batch(TAMANO_BLOQUE)
+            vacio = True
+            for lote in lector:
+                vacio = False
+                yield lote.to_pandas()
+            if vacio:
+                yield lector.schema.empty_table().to_pandas()
+        finally:
+            cursor.close()
+
+    def exportar(self, consulta, extension):
+        return abrir_exportacion(lambda: self._bloques(consulta), self.version, consulta.firma(), extension)
@@ -0,0 +1,220 @@
+# cubo.py
+"""Cubo pre-agregado de licitaciones para indicadores y gráficos"""
+import numpy as np
+import pandas as pd
+
+from indices import COLUMNA_MONTO
+
+
+def momentos(grupos, valores, n_grupos):
+    """Conteo, suma y M2 (suma de cuadrados respecto de la media) por grupo"""
+    conteo = np.bincount(grupos, minlength=n_grupos)
+    suma = np.bincount(grupos, weights=valores, minlength=n_grupos)
+    media = np.divide(suma, conteo, out=np.zeros(n_grupos), where=conteo > 0)
+    m2 = np.bincount(grupos, weights=(valores - media[grupos]) ** 2, minlength=n_grupos)
+    return conteo, suma, m2
+
+
+def combinar_m2(conteo, suma, m2):
+    """M2 de la unión de varios grupos (fórmula de Chan et al.)"""
+    con = conteo > 0
+    total = conteo[con].sum()
+    if total == 0:
+        return 0.0
+    medias = suma[con] / conteo[con]
+    media = suma[con].sum() / total
+    return float(m2[con].sum() + (conteo[con] * (medias - media) ** 2).sum())
+
+
+def armar_resumen(total, suma, m2, proveedores, departamentos, regiones):
+    promedio = suma / total if total else float('nan')
+    if total > 1:
+        # M2 ya viene centrado: sin la resta de dos sumas grandes de suma - suma²/n
+        desviacion = float(np.sqrt(max(m2, 0.0) / (total - 1)))
+    else:
+        desviacion = float('nan')
+    return {
+        'total': int(total),
+        'monto_total': float(suma),
+        'monto_promedio': float(promedio),
+        'monto_desviacion': desviacion,
+        'proveedores': int(proveedores),
+        'departamentos': int(departamentos),
+        'regiones': int(regiones),
+    }
+
+
+class CuboLicitaciones:
+    """Conteo, suma y M2 del monto por celda del cubo.
+
+    Una celda es una combinación observada de (año, región, departamento,
+    tipo de proyecto, estatus). Solo entran filas con todas las dimensiones
+    y el monto informados: son las únicas que pueden pasar los filtros del
+    sidebar. Los proveedores por celda están en proveedores.py.
+
+    Tras un upsert, ``retirar`` resta la contribución de las filas antes de
+    modificarlas y ``agregar`` suma la nueva. M2 (cuadrados respecto de la
+    media de la celda) se combina con la fórmula de Chan, así la desviación
+    no pierde precisión con montos grandes.
+    """
+
+    def __init__(self, df, indice, col_monto=COLUMNA_MONTO):
+        self.indice = indice
+        self.dimensiones = list(indice.dimensiones)
+        self.col_monto = col_monto
+        montos = df[col_monto].to_numpy(dtype=float)
+
+        codigos = np.column_stack([indice.codigos[d] for d in self.dimensiones])
+        validas = (codigos >= 0).all(axis=1) & ~np.isnan(montos)
+        tamanos = [max(len(indice.valores[d]), 1) for d in self.dimensiones]
+
+        # Clave entera por celda y posición de cada fila en el cubo
+        claves = np.ravel_multi_index(codigos[validas].T, tamanos)
+        claves_celda, inversa = np.unique(claves, return_inverse=True)
+        self.celdas = np.column_stack(np.unravel_index(claves_celda, tamanos))
+        self._celda_de = {tuple(c): i for i, c in enumerate(self.celdas.tolist())}
+        self.celda_por_fila = np.full(len(df), -1, dtype=np.int64)
+        self.celda_por_fila[validas] = inversa
+
+        n_celdas = len(claves_celda)
+        self.conteo, self.suma, self.m2 = momentos(inversa, montos[validas], n_celdas)
+
+    # ----------------------------------------
+    # Actualización incremental
+    # ----------------------------------------
+    def _sumar(self, df, filas, signo):
+        celdas = self.celda_por_fila[filas]
+        dentro = celdas >= 0
+        filas, celdas = filas[dentro], celdas[dentro]
+        m = df[self.col_monto].to_numpy(dtype=float)[filas]
+        celdas, inversa = np.unique(celdas, return_inverse=True)
+        n_b, s_b, m2_b = momentos(inversa, m, len(celdas))
+        n_a, s_a, m2_a = self.conteo[celdas], self.suma[celdas], self.m2[celdas]
+        media_b = s_b / np.maximum(n_b, 1)
+
+        # Chan: M2 = M2_a + M2_b + delta² · n_a · n_b / (n_a + n_b); al retirar se despeja M2_a
+        n, s = n_a + signo * n_b, s_a + signo * s_b
+        if signo > 0:
+            delta = media_b - np.divide(s_a, n_a, out=np.zeros(len(celdas)), where=n_a > 0)
+            m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / np.maximum(n, 1)
+        else:
+            delta = media_b - np.divide(s, n, out=np.zeros(len(celdas)), where=n > 0)
+            m2 = np.where(n > 0, m2_a - m2_b - delta ** 2 * n * n_b / np.maximum(n_a, 1), 0.0)
+        self.conteo[celdas] = n
+        self.suma[celdas] = s
+        self.m2[celdas] = np.maximum(m2, 0.0)
+
+    def retirar(self, df, filas):
+        """Resta la contribución de ``filas`` (llamar antes de modificarlas)"""
+        self._sumar(df, np.asarray(filas, dtype=np.int64), -1)
+
+    def agregar(self, df, filas):
+        """Suma ``filas`` ya actualizadas en ``df`` y en el índice"""
+        filas = np.asarray(filas, dtype=np.int64)
+        extra = len(df) - len(self.celda_por_fila)
+        if extra > 0:
+            self.celda_por_fila = np.concatenate([self.celda_por_fila, np.full(extra, -1, dtype=np.int64)])
+
+        codigos = np.column_stack([self.indice.codigos[d][filas] for d in self.dimensiones])
+        validas = (codigos >= 0).all(axis=1) & ~np.isnan(df[self.col_monto].to_numpy(dtype=float)[filas])
+        celdas = np.full(len(filas), -1, dtype=np.int64)
+        nuevas = []
+        for i in np.flatnonzero(validas):
+            clave = tuple(codigos[i].tolist())
+            if clave not in self._celda_de:
+                self._celda_de[clave] = len(self.celdas) + len(nuevas)
+                nuevas.append(clave)
+            celdas[i] = self._celda_de[clave]
+        if nuevas:
+            self.celdas = np.vstack([self.celdas, np.asarray(nuevas, dtype=self.celdas.dtype)])
+            self.conteo = np.concatenate([self.conteo, np.zeros(len(nuevas), dtype=self.conteo.dtype)])
+            self.suma = np.concatenate([self.suma, np.zeros(len(nuevas))])
+            self.m2 = np.concatenate([self.m2, np.zeros(len(nuevas))])
+
+        self.celda_por_fila[filas] = celdas
+        self._sumar(df, filas, 1)
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    def seleccionar(self, seleccion):
+        """Máscara de celdas que cumplen ``seleccion`` ({dimensión: valores})"""
+        mascara = self.conteo > 0
+        for j, dim in enumerate(self.dimensiones):
+            if dim in seleccion:
+                mascara &= np.isin(self.celdas[:, j], self.indice.codigos_de(dim, seleccion[dim]))
+        return mascara
+
+    def resumen(self, mascara, proveedores):
+        """Indicadores clave sumando las celdas seleccionadas (``proveedores``: distintos)"""
+        j_depto = self.dimensiones.index('departamento')
+        j_region = self.dimensiones.index('region')
+        return armar_resumen(
+            self.conteo[mascara].sum(),
+            self.suma[mascara].sum(),
+            combinar_m2(self.conteo[mascara], self.suma[mascara], self.m2[mascara]),
+            proveedores,
+            len(np.unique(self.celdas[mascara, j_depto])),
+            len(np.unique(self.celdas[mascara, j_region])),
+        )
+
+    def agrupar(self, dim, mascara):
+        """Cantidad y monto por valor de ``dim`` dentro de las celdas seleccionadas"""
+        j = self.dimensiones.index(dim)
+        valores = self.indice.valores[dim]
+        codigos = self.celdas[mascara, j]
+        cantidad = np.bincount(codigos, weights=self.conteo[mascara], minlength=len(valores))
+        monto = np.bincount(codigos, weights=self.suma[mascara], minlength=len(valores))
+        presentes = cantidad > 0
+        return pd.DataFrame({
+            dim: valores[presentes],
+            'Cantidad': cantidad[presentes].astype(int),
+            COLUMNA_MONTO: monto[presentes],
+        }).sort_values(dim, ignore_index=True)
+
+
+# ============================================
+# PARES (CELDA, VALOR)
+# ============================================
+class ParesCelda:
+    """Conteo y monto por clave (celda << 32 | valor), con claves ordenadas para sumar o insertar"""
+
+    def __init__(self, claves, conteo, suma):
+        self.claves = claves
+        self.conteo = conteo
+        self.suma = suma
+
+    def sumar(self, claves, conteo, suma):
+        posiciones = np.searchsorted(self.claves, claves)
+        existe = (posiciones < len(self.claves)) & \
+            (self.claves[np.minimum(posiciones, len(self.claves) - 1)] == claves)
+        np.add.at(self.conteo, posiciones[existe], conteo[existe])
+        np.add.at(self.suma, posiciones[existe], suma[existe])
+        if (~existe).any():
+            self.claves = np.insert(self.claves, posiciones[~existe], claves[~existe])
+            self.conteo = np.insert(self.conteo, posiciones[~existe], conteo[~existe])
+            self.suma = np.insert(self.suma, posiciones[~existe], suma[~existe])
+
+
+# ============================================
+# EQUIVALENTES POR FILAS
+# ============================================
+# Se usan cuando el filtro no se puede responder con el cubo (rango de monto
+# parcial o búsqueda de texto); devuelven exactamente la misma forma.
+def resumen_filas(df, col_monto=COLUMNA_MONTO):
+    montos = df[col_monto].dropna().to_numpy(dtype=float)
+    return armar_resumen(
+        len(montos),
+        montos.sum(),
+        ((montos - montos.mean()) ** 2).sum() if len(montos) else 0.0,
+        df['proveedor_ganador'].nunique(),
+        df['departamento'].nunique(),
+        df['region'].nunique(),
+    )
+
+
+def agrupar_filas(df, dim, col_monto=COLUMNA_MONTO):
+    agrupado = df.groupby(dim, observed=True)[col_monto].agg(['size', 'sum'])
+    agrupado.columns = ['Cantidad', col_monto]
+    return agrupado.reset_index()
+
@@ -0,0 +1,298 @@
+# datos.py
+"""Carga tipada de licitaciones con snapshot columnar (Arrow/Feather)"""
+import csv
+import hashlib
+import json
+import os
+import uuid
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.feather as feather
+except ImportError:  # Sin pyarrow se lee siempre el CSV
+    pa = None
+    pacsv = None
+    feather = None
+
+from esquema import FIRMA_ESQUEMA, VALORES_NULOS, convertir, normalizar_columnas
+
+
+ARCHIVO_CSV = 'proyectos_guatecompras.csv'
+
+# Clave bajo la que se guarda la firma del CSV en los metadatos del snapshot
+CLAVE_FIRMA = b'guatecompras_firma'
+
+
+# ============================================
+# PARSEO DEL CSV
+# ============================================
+def leer_texto(ruta=ARCHIVO_CSV):
+    """Todas las columnas como texto, con los nombres ya normalizados.
+
+    Con pyarrow el CSV se lee por bloques en varios hilos; los tipos los
+    pone después el esquema, sin inferencia.
+    """
+    if pacsv is None:
+        crudo = pd.read_csv(ruta, encoding='utf-8', dtype=str, na_values=VALORES_NULOS, keep_default_na=False)
+    else:
+        with open(ruta, encoding='utf-8', newline='') as f:
+            encabezado = next(csv.reader(f), [])
+        tabla = pacsv.read_csv(ruta, convert_options=pacsv.ConvertOptions(
+            column_types={nombre: pa.string() for nombre in encabezado},
+            null_values=VALORES_NULOS,
+            strings_can_be_null=True,
+        ))
+        crudo = tabla.to_pandas()
+    crudo.columns = normalizar_columnas(crudo.columns)
+    return crudo
+
+
+def parsear_csv(ruta=ARCHIVO_CSV):
+    """(DataFrame tipado según esquema.ESQUEMA, reporte de filas rechazadas)"""
+    df, rechazos = convertir(leer_texto(ruta))
+
+    # Extraer año de adjudicación
+    if 'fecha_adjudicacion' in df.columns:
+        df['año_adjudicacion'] = df['fecha_adjudicacion'].dt.year
+
+    return df, rechazos
+
+
+def leer_csv(ruta=ARCHIVO_CSV):
+    """Lee el CSV y devuelve el DataFrame con tipos ya convertidos.
+
+    Las filas que no cumplen el esquema se excluyen y quedan en el reporte
+    de rechazos al lado del CSV (ver ruta_rechazos).
+    """
+    df, rechazos = parsear_csv(ruta)
+    escribir_rechazos(ruta, rechazos)
+    return df
+
+
+# ============================================
+# REPORTE DE RECHAZOS
+# ============================================
+def ruta_rechazos(ruta=ARCHIVO_CSV):
+    """Ruta del reporte de filas rechazadas que acompaña al CSV"""
+    return os.path.splitext(ruta)[0] + '.rechazos.csv'
+
+
+def escribir_rechazos(ruta, rechazos):
+    """Escribe el reporte (o borra el anterior si ya no hay rechazos)"""
+    destino = ruta_rechazos(ruta)
+    try:
+        if len(rechazos):
+            temporal = f"{destino}.{uuid.uuid4().hex}.tmp"
+            rechazos.to_csv(temporal, index=False, encoding='utf-8')
+            os.replace(temporal, destino)
+        elif os.path.exists(destino):
+            os.remove(destino)
+    except OSError:
+        pass  # Directorio de solo lectura: el reporte es informativo
+
+
+@lru_cache(maxsize=8)
+def _leer_rechazos(destino, mtime_ns):
+    return pd.read_csv(destino, encoding='utf-8', dtype={'valor': str, 'nog': str})
+
+
+def leer_rechazos(ruta=ARCHIVO_CSV):
+    """Reporte de rechazos del CSV, o None si todas las filas cumplieron el esquema"""
+    destino = ruta_rechazos(ruta)
+    try:
+        mtime_ns = os.stat(destino).st_mtime_ns
+    except OSError:
+        return None
+    return _leer_rechazos(destino, mtime_ns)
+
+
+# ============================================
+# SNAPSHOT COLUMNAR
+# ============================================
+def ruta_snapshot(ruta=ARCHIVO_CSV):
+    """Ruta del snapshot Feather que acompaña al CSV"""
+    return os.path.splitext(ruta)[0] + '.feather'
+
+
+def hash_archivo(ruta, bloque=1 << 20):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def firma_archivo(ruta, calcular_hash=True):
+    """Tamaño, mtime, esquema con que se parsea y (opcionalmente) hash del archivo"""
+    info = os.stat(ruta)
+    firma = {'tamano': info.st_size, 'mtime_ns': info.st_mtime_ns, 'esquema': FIRMA_ESQUEMA}
+    if calcular_hash:
+        firma['sha256'] = hash_archivo(ruta)
+    return firma
+
+
+def _firma_snapshot(ruta_snap):
+    """Lee solo el esquema del snapshot y devuelve la firma guardada (o None)"""
+    try:
+        with pa.memory_map(ruta_snap) as fuente:
+            esquema = pa.ipc.open_file(fuente).schema
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadatos = esquema.metadata or {}
+    if CLAVE_FIRMA not in metadatos:
+        return None
+    return json.loads(metadatos[CLAVE_FIRMA])
+
+
+def escribir_snapshot(df, ruta_snap, firma):
+    """Escribe el DataFrame tipado como Feather sin compresión (apto para mmap)"""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[CLAVE_FIRMA] = json.dumps(firma).encode('utf-8')
+    tabla = tabla.replace_schema_metadata(metadatos)
+
+    # Escritura atómica: otro proceso nunca ve un snapshot a medias
+    temporal = f"{ruta_snap}.{uuid.uuid4().hex}.tmp"
+    feather.write_feather(tabla, temporal, compression='uncompressed')
+    os.replace(temporal, ruta_snap)
+
+
+def leer_snapshot(ruta_snap):
+    """Lectura memory-mapped del snapshot"""
+    tabla = feather.read_table(ruta_snap, memory_map=True)
+    return tabla.to_pandas(split_blocks=True)
+
+
+def snapshot_vigente(ruta=ARCHIVO_CSV):
+    """Indica si el snapshot corresponde al CSV actual.
+
+    Primero compara tamaño y mtime; solo si difieren se calcula el hash del
+    contenido. Un snapshot escrito con otro esquema nunca está vigente.
+    Devuelve (vigente, firma_actual, firma_guardada).
+    """
+    ruta_snap = ruta_snapshot(ruta)
+    guardada = _firma_snapshot(ruta_snap) if os.path.exists(ruta_snap) else None
+    actual = firma_archivo(ruta, calcular_hash=False)
+    if guardada is None or guardada.get('esquema') != FIRMA_ESQUEMA:
+        return False, actual, None
+
+    if (guardada.get('tamano'), guardada.get('mtime_ns')) == (actual['tamano'], actual['mtime_ns']):
+        actual['sha256'] = guardada.get('sha256')
+        return True, actual, guardada
+
+    actual['sha256'] = hash_archivo(ruta)
+    return actual['sha256'] == guardada.get('sha256'), actual, guardada
+
+
+def cargar_datos(ruta=ARCHIVO_CSV):
+    """Devuelve el DataFrame tipado, usando el snapshot si está vigente.
+
+    El snapshot se reconstruye solo cuando cambia el CSV (tamaño, mtime o
+    contenido). Si pyarrow no está instalado se parsea el CSV directamente.
+    """
+    if pa is None:
+        return leer_csv(ruta)
+
+    ruta_snap = ruta_snapshot(ruta)
+    vigente, firma, guardada = snapshot_vigente(ruta)
+
+    if vigente:
+        df = leer_snapshot(ruta_snap)
+        if firma != guardada:
+            # Mismo contenido con otro mtime (p. ej. tras un redeploy): se
+            # actualiza la firma para no volver a calcular el hash
+            escribir_snapshot(df, ruta_snap, firma)
+        return df
+
+    df = leer_csv(ruta)
+    if 'sha256' not in firma:
+        firma['sha256'] = hash_archivo(ruta)
+    try:
+        escribir_snapshot(df, ruta_snap, firma)
+    except OSError:
+        pass  # Directorio de solo lectura: se sigue sin snapshot
+    return df
+
+
+# ============================================
+# EXTRACTOS INCREMENTALES
+# ============================================
+# Carpeta con los extractos diarios (un CSV por fecha, p. ej. 2025-01-31.csv).
+# Cada extracto se parsea una sola vez: cargar_datos() deja su propio
+# snapshot Feather al lado.
+DIRECTORIO_EXTRACTOS = 'extractos'
+
+
+def listar_extractos(directorio=DIRECTORIO_EXTRACTOS):
+    """{nombre: (tamaño, mtime_ns)} de los CSV del directorio, en orden de nombre"""
+    if not os.path.isdir(directorio):
+        return {}
+    extractos = {}
+    for nombre in sorted(os.listdir(directorio)):
+        # El reporte de rechazos de un extracto queda en la misma carpeta y no es un extracto
+        if nombre.endswith('.csv') and not nombre.endswith('.rechazos.csv'):
+            firma = firma_archivo(os.path.join(directorio, nombre), calcular_hash=False)
+            extractos[nombre] = (firma['tamano'], firma['mtime_ns'])
+    return extractos
+
+
+def leer_rechazos_extractos(directorio=DIRECTORIO_EXTRACTOS):
+    """Reportes de rechazos de los extractos con la columna ``extracto``, o None si no hay"""
+    partes = []
+    for nombre in listar_extractos(directorio):
+        rechazos = leer_rechazos(os.path.join(directorio, nombre))
+        if rechazos is not None:
+            partes.append(rechazos.assign(extracto=nombre))
+    return pd.concat(partes, ignore_index=True) if partes else None
+
+
+def cargar_extractos(nombres, directorio=DIRECTORIO_EXTRACTOS, clave='nog'):
+    """Une los extractos (ya tipados) en orden; ante NOG repetidos gana el último"""
+    partes = [cargar_datos(os.path.join(directorio, nombre)) for nombre in nombres]
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return None
+    delta = pd.concat(partes, ignore_index=True)
+    return delta.drop_duplicates(clave, keep='last').reset_index(drop=True)
+
+
+def upsert(df, delta, clave='nog'):
+    """Aplica ``delta`` sobre ``df`` por ``clave``.
+
+    Las filas con clave existente se reemplazan en su misma posición y las
+    nuevas se agregan al final, de modo que las posiciones previas siguen
+    siendo válidas para los índices. Devuelve (df_nuevo, filas_reemplazadas,
+    filas_agregadas). ``df`` no se modifica.
+    """
+    posicion = pd.Series(np.arange(len(df)), index=df[clave].to_numpy())
+    posicion = posicion[~posicion.index.duplicated(keep='last')]
+    encontradas = posicion.reindex(delta[clave].to_numpy()).to_numpy()
+    existe = ~np.isnan(encontradas)
+
+    # Categorías nuevas al final: los códigos existentes no cambian
+    base = df.copy(deep=False)
+    delta = delta.copy()
+    for col in base.columns:
+        if isinstance(base[col].dtype, pd.CategoricalDtype) and col in delta.columns:
+            nuevas = pd.Index(delta[col].dropna().unique()).difference(base[col].cat.categories)
+            if len(nuevas):
+                base[col] = base[col].cat.add_categories(nuevas)
+            delta[col] = pd.Categorical(delta[col].astype(object), categories=base[col].cat.categories)
+    delta = delta.reindex(columns=base.columns)
+
+    agregadas = delta[~existe]
+    df_nuevo = pd.concat([base, agregadas], ignore_index=True) if len(agregadas) else base.copy()
+    reemplazadas = encontradas[existe].astype(np.int64)
+    if len(reemplazadas):
+        reemplazo = delta[existe]
+        for j, col in enumerate(df_nuevo.columns):
+            df_nuevo.iloc[reemplazadas, j] = reemplazo[col].to_numpy()
+
+    filas_agregadas = np.arange(len(df), len(df_nuevo), dtype=np.int64)
+    return df_nuevo, reemplazadas, filas_agregadas
@@ -0,0 +1,266 @@
+# esquema.py
+"""Esquema declarado de las 21 columnas del CSV de Guatecompras
+
+Cada columna fija su tipo, si admite vacíos, su dominio (categóricas), su
+mínimo (números) y el formato exacto (fechas). El mismo esquema convierte
+el CSV en pandas (``convertir``, con pyarrow.compute si está instalado) y
+en DuckDB (``Columna.sql``). Un valor que no lo cumple rechaza su fila y
+queda en el reporte de rechazos en lugar de llegar como NaN a los agregados.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Sin pyarrow la conversión se hace solo con pandas
+    pa = None
+    pc = None
+
+from territorio import COORDENADAS_DEPARTAMENTOS, REGIONES, plegar_nombre
+
+
+FORMATO_FECHA = '%Y-%m-%d'
+
+# Textos que se leen como vacío (los mismos en pyarrow, pandas y DuckDB)
+VALORES_NULOS = ['', 'NA', 'N/A', 'n/a', 'NULL', 'null', 'NaN', 'nan']
+
+ESTATUS = ['Adjudicado', 'Evaluacion', 'En Proceso', 'Finalizado']
+
+COLUMNAS_RECHAZOS = ['fila', 'nog', 'columna', 'valor', 'motivo']
+
+
+def _literal_sql(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+# ============================================
+# CONVERSIÓN VECTORIZADA
+# ============================================
+def _numeros(serie):
+    """float64 por fila; los textos que no son número quedan NaN"""
+    if pc is not None:
+        try:
+            return pc.cast(pa.array(serie, from_pandas=True), pa.float64()).to_numpy(zero_copy_only=False)
+        except pa.ArrowInvalid:
+            pass  # Hay valores mal formados: pandas ubica cuáles
+    return pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float)
+
+
+def _fechas(serie, formato):
+    """datetime64[us] por fila con ``formato`` exacto; lo que no calza queda NaT.
+
+    Cada texto distinto se parsea una sola vez (hay pocos miles de días
+    distintos aunque el CSV tenga millones de filas).
+    """
+    codigos, distintos = pd.factorize(serie)
+    fechas = pd.to_datetime(pd.Series(distintos, dtype=object), format=formato, errors='coerce')
+    # El código -1 (vacío) toma el NaT agregado al final
+    return np.append(fechas.to_numpy(dtype='datetime64[us]'), np.datetime64('NaT', 'us'))[codigos]
+
+
+# ============================================
+# COLUMNAS
+# ============================================
+class Columna:
+    """Columna del CSV con su tipo: 'texto', 'categoria', 'entero', 'decimal' o 'fecha'.
+
+    ``dominio`` (categóricas) se compara sin tildes ni mayúsculas: 'Peten'
+    cumple con 'Petén' y se guarda como 'Petén', así una misma categoría no
+    se parte por cómo viene escrita. Una categórica sin dominio acepta
+    cualquier valor tal cual.
+    """
+
+    def __init__(self, nombre, tipo, requerida=False, dominio=None, minimo=None, formato=None):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.requerida = requerida
+        self.dominio = list(dominio) if dominio is not None else None
+        self.minimo = minimo
+        self.formato = formato or (FORMATO_FECHA if tipo == 'fecha' else None)
+        # Clave plegada -> grafía del dominio
+        self.canonicos = {plegar_nombre(v): v for v in self.dominio} if self.dominio is not None else None
+
+    def fuera_de_dominio(self, distintos):
+        """Valores de ``distintos`` que no pertenecen al dominio"""
+        if self.canonicos is None:
+            return []
+        return [v for v in distintos if plegar_nombre(v) not in self.canonicos]
+
+    def renombres(self, distintos):
+        """{valor: grafía del dominio} para los valores de ``distintos`` escritos de otra forma"""
+        if self.canonicos is None:
+            return {}
+        cambios = {v: self.canonicos.get(plegar_nombre(v), v) for v in distintos}
+        return {v: c for v, c in cambios.items() if v != c}
+
+    def convertir(self, serie):
+        """(valores tipados, [(motivo, máscara de filas que no cumplen)])"""
+        nulos = serie.isna().to_numpy()
+        problemas = [('vacío', nulos)] if self.requerida else []
+
+        if self.tipo == 'texto':
+            return serie, problemas
+        if self.tipo == 'categoria':
+            valores = serie.astype('category')
+            # Solo se pliegan los valores distintos, no cada fila
+            fuera = self.fuera_de_dominio(valores.cat.categories)
+            if fuera:
+                problemas.append(('dominio', valores.isin(fuera).to_numpy()))
+            cambios = self.renombres(valores.cat.categories)
+            if cambios:
+                # 'GUATEMALA' y 'Guatemala' pasan a ser el mismo código
+                nuevas = pd.Index([cambios.get(v, v) for v in valores.cat.categories])
+                categorias = nuevas.unique().sort_values()
+                codigos = valores.cat.codes.to_numpy()
+                codigos = np.where(codigos >= 0, categorias.get_indexer(nuevas)[codigos], -1)
+                valores = pd.Series(pd.Categorical.from_codes(codigos, categorias), index=serie.index)
+            return valores, problemas
+
+        if self.tipo == 'fecha':
+            valores = _fechas(serie, self.formato)
+            problemas.append(('formato', ~nulos & np.isnat(valores)))
+            return valores, problemas
+
+        valores = _numeros(serie)
+        finitos = np.isfinite(valores)
+        invalidos = ~nulos & ~finitos
+        if self.tipo == 'entero':
+            invalidos[finitos] |= valores[finitos] % 1 != 0
+        problemas.append(('formato', invalidos))
+        if self.minimo is not None:
+            problemas.append(('rango', finitos & (valores < self.minimo)))
+        return valores, problemas
+
+    def sql(self, expresion, fuera=(), renombres=None):
+        """(expresión tipada, [(motivo, condición de rechazo)]) sobre el texto crudo en DuckDB.
+
+        ``fuera`` y ``renombres`` salen de los valores distintos, resueltos
+        antes con ``fuera_de_dominio`` y ``renombres`` (así el plegado corre
+        en Python igual que en pandas y no por fila en SQL).
+        """
+        problemas = [('vacío', f"{expresion} IS NULL")] if self.requerida else []
+        if self.tipo == 'texto':
+            return expresion, problemas
+        if self.tipo == 'categoria':
+            if fuera:
+                problemas.append(('dominio', f"{expresion} IN ({', '.join(_literal_sql(v) for v in fuera)})"))
+            tipada = expresion
+            if renombres:
+                casos = ' '.join(f"WHEN {_literal_sql(v)} THEN {_literal_sql(c)}" for v, c in renombres.items())
+                tipada = f"CASE {expresion} {casos} ELSE {expresion} END"
+            return tipada, problemas
+
+        if self.tipo == 'fecha':
+            tipada = f"TRY_STRPTIME({expresion}, {_literal_sql(self.formato)})"
+            problemas.append(('formato', f"{expresion} IS NOT NULL AND {tipada} IS NULL"))
+            return tipada, problemas
+
+        numero = f"TRY_CAST({expresion} AS DOUBLE)"
+        invalido = f"NOT coalesce(isfinite({numero}), FALSE)"
+        if self.tipo == 'entero':
+            invalido += f" OR {numero} % 1 <> 0"
+        problemas.append(('formato', f"{expresion} IS NOT NULL AND ({invalido})"))
+        if self.minimo is not None:
+            problemas.append(('rango', f"{numero} < {self.minimo!r}"))
+        tipada = f"CAST({numero} AS BIGINT)" if self.tipo == 'entero' else numero
+        return tipada, problemas
+
+
+ESQUEMA = [
+    Columna('nog', 'entero', requerida=True, minimo=1),
+    Columna('descripcion', 'texto'),
+    Columna('region', 'categoria', dominio=REGIONES),
+    Columna('departamento', 'categoria', dominio=COORDENADAS_DEPARTAMENTOS),
+    Columna('municipio', 'texto'),
+    Columna('aldea', 'texto'),
+    Columna('tipo_proyecto', 'categoria'),
+    Columna('especialidad', 'texto'),
+    Columna('entidad', 'texto'),
+    Columna('unidad_compradora', 'texto'),
+    Columna('modalidad', 'texto'),
+    Columna('fecha_publicacion', 'fecha'),
+    Columna('fecha_presentacion', 'fecha'),
+    Columna('fecha_cierre', 'fecha'),
+    Columna('fecha_adjudicacion', 'fecha'),
+    Columna('monto_adjudicado', 'decimal', minimo=0),
+    Columna('proveedor_ganador', 'texto'),
+    Columna('numero_ofertas', 'entero', minimo=0),
+    Columna('estatus', 'categoria', dominio=ESTATUS),
+    Columna('fianza_sostenimiento', 'decimal', minimo=0),
+    Columna('fianza_cumplimiento', 'decimal', minimo=0),
+]
+
+ESQUEMA_POR_NOMBRE = {c.nombre: c for c in ESQUEMA}
+
+# Sube cuando cambia cómo se convierte un valor sin cambiar el esquema
+# (2: las categóricas con dominio se guardan con la grafía del dominio)
+VERSION_CONVERSION = 2
+
+# Cambia con cualquier cambio del esquema: invalida snapshots y Parquet viejos
+FIRMA_ESQUEMA = hashlib.sha256(json.dumps(
+    [[c.nombre, c.tipo, c.requerida, c.dominio, c.minimo, c.formato] for c in ESQUEMA]
+    + [VALORES_NULOS, VERSION_CONVERSION]
+).encode('utf-8')).hexdigest()[:12]
+
+
+def normalizar_columnas(nombres):
+    """Nombres de columna como en el esquema ('Monto Adjudicado' -> 'monto_adjudicado')"""
+    return [str(n).strip().lower().replace(' ', '_') for n in nombres]
+
+
+def convertir(crudo):
+    """DataFrame tipado según ESQUEMA y reporte de rechazos.
+
+    ``crudo`` trae todas las columnas como texto. Una fila se rechaza si
+    alguno de sus valores no cumple el esquema; el reporte tiene una línea
+    por valor (``fila`` cuenta desde 1 sin el encabezado). Las columnas
+    fuera del esquema pasan como texto.
+    """
+    columnas = {}
+    hallazgos = []
+    rechazada = np.zeros(len(crudo), dtype=bool)
+    for nombre in crudo.columns:
+        columna = ESQUEMA_POR_NOMBRE.get(nombre)
+        if columna is None:
+            columnas[nombre] = crudo[nombre]
+            continue
+        columnas[nombre], problemas = columna.convertir(crudo[nombre])
+        for motivo, mascara in problemas:
+            if mascara.any():
+                rechazada |= mascara
+                hallazgos.append((nombre, motivo, np.flatnonzero(mascara)))
+
+    if rechazada.any():
+        validas = ~rechazada
+        columnas = {
+            nombre: valores[validas].reset_index(drop=True) if isinstance(valores, pd.Series) else valores[validas]
+            for nombre, valores in columnas.items()
+        }
+    df = pd.DataFrame(columnas)
+    for nombre in df.columns:
+        columna = ESQUEMA_POR_NOMBRE.get(nombre)
+        if columna is None:
+            continue
+        if columna.tipo == 'categoria' and rechazada.any():
+            df[nombre] = df[nombre].cat.remove_unused_categories()
+        elif columna.tipo == 'entero' and not df[nombre].isna().any():
+            df[nombre] = df[nombre].astype(np.int64)  # Con vacíos queda float64, como en pandas
+
+    nog = crudo['nog'] if 'nog' in crudo.columns else pd.Series([None] * len(crudo))
+    reporte = [
+        pd.DataFrame({
+            'fila': filas + 1,
+            'nog': nog.iloc[filas].to_numpy(dtype=object),
+            'columna': nombre,
+            'valor': crudo[nombre].iloc[filas].to_numpy(dtype=object),
+            'motivo': motivo,
+        })
+        for nombre, motivo, filas in hallazgos
+    ]
+    rechazos = (pd.concat(reporte, ignore_index=True).sort_values(['fila', 'columna'], kind='stable')
+                .reset_index(drop=True) if reporte else pd.DataFrame(columns=COLUMNAS_RECHAZOS))
+    return df, rechazos
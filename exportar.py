@@ -0,0 +1,126 @@
+# exportar.py
+"""Exportación por bloques (CSV, CSV gzip, Parquet) con caché por filtros"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Sin pyarrow no se ofrece Parquet
+    pa = None
+    pq = None
+
+
+TAMANO_BLOQUE = 50_000
+MAX_ARCHIVOS_CACHE = 20
+DIRECTORIO_CACHE = os.path.join(tempfile.gettempdir(), 'guatecompras_exportaciones')
+
+# Las sesiones son hilos del mismo proceso: abrir un archivo de la caché y
+# limpiarla no se intercalan
+_lock_cache = threading.Lock()
+
+# Nombre visible -> (extensión, tipo MIME)
+FORMATOS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV comprimido (gzip)': ('csv.gz', 'application/gzip'),
+}
+if pq is not None:
+    FORMATOS['Parquet'] = ('parquet', 'application/vnd.apache.parquet')
+
+
+def bloques(df, filas, tamano=TAMANO_BLOQUE):
+    """Genera el DataFrame de ``filas`` en trozos de ``tamano`` filas"""
+    for inicio in range(0, len(filas), tamano):
+        yield df.take(filas[inicio:inicio + tamano])
+    if len(filas) == 0:
+        yield df.iloc[:0]
+
+
+def escribir_csv(partes, destino):
+    """CSV en UTF-8 escrito bloque a bloque en un archivo binario"""
+    for i, bloque in enumerate(partes):
+        destino.write(bloque.to_csv(index=False, header=(i == 0)).encode('utf-8'))
+
+
+def escribir_csv_gz(partes, destino):
+    with gzip.GzipFile(fileobj=destino, mode='wb') as comprimido:
+        escribir_csv(partes, comprimido)
+
+
+def escribir_parquet(partes, destino):
+    """Parquet con un row group por bloque"""
+    escritor = None
+    try:
+        for bloque in partes:
+            # El esquema del primer bloque fija los tipos de los siguientes
+            esquema = escritor.schema if escritor is not None else None
+            tabla = pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabla.schema)
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+ESCRITORES = {
+    'csv': escribir_csv,
+    'csv.gz': escribir_csv_gz,
+    'parquet': escribir_parquet,
+}
+
+
+def firma_exportacion(version, firma_consulta, extension):
+    """Hash canónico del dataset, los filtros (ver consultas.Consulta) y el formato"""
+    return hashlib.sha256(f"{version}|{firma_consulta}|{extension}".encode('utf-8')).hexdigest()[:24]
+
+
+def _limpiar_cache(directorio, maximo=MAX_ARCHIVOS_CACHE):
+    """Borra los archivos más antiguos si la caché supera ``maximo`` (llamar con _lock_cache)"""
+    archivos = sorted(
+        (os.path.join(directorio, f) for f in os.listdir(directorio) if not f.endswith('.tmp')),
+        key=os.path.getmtime,
+    )
+    for ruta in archivos[:-maximo]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+def abrir_exportacion(generar_bloques, version, firma_consulta, extension, directorio=DIRECTORIO_CACHE):
+    """Archivo exportado abierto para lectura, generándolo solo si no está en caché.
+
+    ``generar_bloques`` devuelve un iterable de DataFrames y solo se llama
+    cuando hay que escribir el archivo. Se devuelve abierto (st.download_button
+    lo lee en trozos): si la limpieza lo borra después, lo ya abierto se sigue
+    leyendo completo.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{firma_exportacion(version, firma_consulta, extension)}.{extension}")
+    with _lock_cache:
+        try:
+            archivo = open(ruta, 'rb')
+            os.utime(ruta)  # Marca de uso reciente para la limpieza
+            return archivo
+        except FileNotFoundError:
+            pass
+
+    # Nombre único por escritura: dos sesiones pueden exportar la misma vista a la vez
+    temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporal, 'wb') as destino:
+            ESCRITORES[extension](generar_bloques(), destino)
+    except BaseException:
+        os.remove(temporal)
+        raise
+    with _lock_cache:
+        os.replace(temporal, ruta)
+        archivo = open(ruta, 'rb')
+        _limpiar_cache(directorio)
+    return archivo
+
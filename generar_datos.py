@@ -0,0 +1,183 @@
+# generar_datos.py
+"""Generador de datasets sintéticos con el esquema de proyectos_guatecompras.csv
+
+Uso:
+    python generar_datos.py --filas 1000000 --salida benchmarks/licitaciones_1m.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Departamento -> región (con los nombres tal como vienen en el CSV)
+DEPARTAMENTOS = {
+    'Guatemala': 'Metropolitana',
+    'Escuintla': 'Central',
+    'Quetzaltenango': 'Suroccidental',
+    'Alta Verapaz': 'Norte',
+    'Huehuetenango': 'Noroccidental',
+    'San Marcos': 'Suroccidental',
+    'Quiche': 'Noroccidental',
+    'Peten': 'Peten',
+    'Chimaltenango': 'Central',
+    'Sacatepequez': 'Central',
+    'Izabal': 'Nororiental',
+    'Jutiapa': 'Suroriental',
+    'Suchitepequez': 'Suroccidental',
+    'Santa Rosa': 'Suroriental',
+    'Chiquimula': 'Nororiental',
+    'Retalhuleu': 'Suroccidental',
+    'Solola': 'Suroccidental',
+    'Totonicapan': 'Suroccidental',
+    'Jalapa': 'Suroriental',
+    'Zacapa': 'Nororiental',
+    'Baja Verapaz': 'Norte',
+    'El Progreso': 'Nororiental',
+}
+
+# Tipo de proyecto -> plantillas de descripción
+TIPOS = {
+    'Electrificacion': ['ELECTRIFICACION RURAL EN'],
+    'Infraestructura Educativa': ['CONSTRUCCION DE ESCUELA EN', 'SUMINISTRO DE MOBILIARIO ESCOLAR PARA'],
+    'Equipamiento Municipal': ['CONSTRUCCION DE MERCADO MUNICIPAL EN'],
+    'Salud': ['REMOZAMIENTO DE CENTRO DE SALUD EN', 'ADQUISICION DE EQUIPO MEDICO PARA'],
+    'Agua y Saneamiento': ['AMPLIACION DE RED DE AGUA POTABLE'],
+    'Caminos Rurales': ['MEJORAMIENTO DE CAMINO RURAL'],
+    'Edificios Publicos': ['REMOZAMIENTO DE EDIFICIO PUBLICO EN'],
+    'Proyectos Productivos': ['CONSTRUCCION DE CENTRO DE ACOPIO EN'],
+}
+
+ENTIDADES = [
+    'MUNICIPALIDADES VARIAS', 'MINISTERIO DE COMUNICACIONES', 'FONDO DE INVERSION SOCIAL -FIS-',
+    'MINISTERIO DE SALUD', 'MINISTERIO DE EDUCACION', 'MINISTERIO DE AGRICULTURA', 'INFOM',
+]
+ESPECIALIDADES = ['Construccion', 'Suministros', 'Consultoria', 'Servicios', 'Bienes', 'Arrendamiento']
+UNIDADES = ['UACI', 'UECE', 'UCEE', 'DGP', 'DAC', 'UIP']
+MODALIDADES = ['Licitacion Publica', 'Cotizacion', 'Compra Directa']
+ALDEAS = ['San Jose', 'El Centro', 'Las Flores', 'Buena Vista', 'Santa Cruz', 'El Rosario']
+
+# Los estatus sin adjudicar no tienen fecha, monto ni proveedor
+ESTATUS = {'Adjudicado': 0.68, 'Evaluacion': 0.15, 'Finalizado': 0.09, 'En Proceso': 0.08}
+
+COLUMNAS = [
+    'nog', 'descripcion', 'region', 'departamento', 'municipio', 'aldea', 'tipo_proyecto',
+    'especialidad', 'entidad', 'unidad_compradora', 'modalidad', 'fecha_publicacion',
+    'fecha_presentacion', 'fecha_cierre', 'fecha_adjudicacion', 'monto_adjudicado',
+    'proveedor_ganador', 'numero_ofertas', 'estatus', 'fianza_sostenimiento', 'fianza_cumplimiento',
+]
+
+TAMANO_BLOQUE = 250_000
+
+
+def pesos_zipf(n, exponente=1.1):
+    """Probabilidades decrecientes 1/k^s: pocos valores concentran la mayoría"""
+    pesos = 1.0 / np.arange(1, n + 1) ** exponente
+    return pesos / pesos.sum()
+
+
+def _elegir(rng, valores, n, p=None):
+    return np.asarray(valores, dtype=object)[rng.choice(len(valores), size=n, p=p)]
+
+
+def generar_bloque(rng, inicio, n, proveedores, fecha_inicio, dias):
+    """DataFrame de ``n`` licitaciones con NOG a partir de ``inicio``"""
+    deptos = list(DEPARTAMENTOS)
+    i_depto = rng.choice(len(deptos), size=n, p=pesos_zipf(len(deptos)))
+    departamento = np.asarray(deptos, dtype=object)[i_depto]
+    region = np.asarray([DEPARTAMENTOS[d] for d in deptos], dtype=object)[i_depto]
+
+    # Municipios: hasta 12 por departamento, también sesgados
+    k_muni = rng.choice(12, size=n, p=pesos_zipf(12, 1.3)) + 1
+    municipio = pd.Series(departamento).radd('Municipio ' + pd.Series(k_muni).astype(str) + ' de ')
+
+    tipos = list(TIPOS)
+    i_tipo = rng.integers(0, len(tipos), size=n)
+    plantilla = np.asarray([TIPOS[t][0] for t in tipos], dtype=object)[i_tipo]
+    alternativa = np.asarray([TIPOS[t][-1] for t in tipos], dtype=object)[i_tipo]
+    plantilla = np.where(rng.random(n) < 0.5, plantilla, alternativa)
+
+    aldea = _elegir(rng, ALDEAS, n)
+    sin_aldea = rng.random(n) < 0.25
+    aldea[sin_aldea] = None
+    descripcion = pd.Series(plantilla) + ' ' + pd.Series(departamento).str.upper()
+    con_aldea = ~sin_aldea & (rng.random(n) < 0.4)
+    descripcion[con_aldea] = descripcion[con_aldea] + ' - ALDEA ' + pd.Series(aldea[con_aldea]).str.upper().to_numpy()
+
+    estatus = _elegir(rng, list(ESTATUS), n, p=list(ESTATUS.values()))
+    adjudicado = estatus == 'Adjudicado'
+
+    publicacion = fecha_inicio + pd.to_timedelta(rng.integers(0, dias, size=n), unit='D')
+    presentacion = publicacion + pd.to_timedelta(rng.integers(20, 60, size=n), unit='D')
+    cierre = presentacion + pd.Timedelta(days=1)
+    adjudicacion = pd.Series(cierre + pd.to_timedelta(rng.integers(15, 45, size=n), unit='D'))
+    adjudicacion[~adjudicado] = pd.NaT
+
+    # Montos log-normales (cola larga) y proveedores con distribución Zipf
+    monto = np.round(rng.lognormal(mean=np.log(1_500_000), sigma=1.0, size=n), 2)
+    monto[~adjudicado] = np.nan
+    proveedor = proveedores[rng.choice(len(proveedores), size=n, p=pesos_zipf(len(proveedores), 1.0))]
+    proveedor[~adjudicado] = None
+
+    return pd.DataFrame({
+        'nog': 10_000_000 + inicio + rng.permutation(n),
+        'descripcion': descripcion.to_numpy(),
+        'region': region,
+        'departamento': departamento,
+        'municipio': municipio.to_numpy(),
+        'aldea': aldea,
+        'tipo_proyecto': np.asarray(tipos, dtype=object)[i_tipo],
+        'especialidad': _elegir(rng, ESPECIALIDADES, n),
+        'entidad': _elegir(rng, ENTIDADES, n, p=pesos_zipf(len(ENTIDADES), 0.8)),
+        'unidad_compradora': _elegir(rng, UNIDADES, n),
+        'modalidad': _elegir(rng, MODALIDADES, n, p=[0.7, 0.2, 0.1]),
+        'fecha_publicacion': publicacion.strftime('%Y-%m-%d'),
+        'fecha_presentacion': presentacion.strftime('%Y-%m-%d'),
+        'fecha_cierre': cierre.strftime('%Y-%m-%d'),
+        'fecha_adjudicacion': adjudicacion.dt.strftime('%Y-%m-%d').to_numpy(),
+        'monto_adjudicado': monto,
+        'proveedor_ganador': proveedor,
+        'numero_ofertas': np.minimum(rng.poisson(2.5, size=n), 15),
+        'estatus': estatus,
+        'fianza_sostenimiento': 1.0,
+        'fianza_cumplimiento': np.where(adjudicado, 10.0, np.nan),
+    }, columns=COLUMNAS)
+
+
+def generar(filas, salida, semilla=42, desde='2015-01-01', hasta='2025-12-31', tamano_bloque=TAMANO_BLOQUE):
+    """Escribe ``filas`` licitaciones sintéticas en ``salida`` por bloques"""
+    rng = np.random.default_rng(semilla)
+    fecha_inicio = pd.Timestamp(desde)
+    dias = (pd.Timestamp(hasta) - fecha_inicio).days + 1
+    # Un proveedor cada ~100 licitaciones, al menos 200
+    n_proveedores = max(200, filas // 100)
+    proveedores = np.asarray([f"PROVEEDOR {i:06d} S.A." for i in range(n_proveedores)], dtype=object)
+
+    directorio = os.path.dirname(salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    temporal = f"{salida}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8', newline='') as f:
+        for inicio in range(0, filas, tamano_bloque):
+            n = min(tamano_bloque, filas - inicio)
+            bloque = generar_bloque(rng, inicio, n, proveedores, fecha_inicio, dias)
+            bloque.to_csv(f, index=False, header=(inicio == 0))
+    os.replace(temporal, salida)
+    return salida
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, required=True)
+    parser.add_argument('--salida', required=True)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--desde', default='2015-01-01', help='Primera fecha de publicación')
+    parser.add_argument('--hasta', default='2025-12-31', help='Última fecha de publicación')
+    args = parser.parse_args()
+    generar(args.filas, args.salida, args.semilla, args.desde, args.hasta)
+    print(f"✅ {args.filas:,} licitaciones escritas en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# geometria.py
+"""Límites de departamentos y municipios: carga única y simplificación para el mapa
+
+Los archivos GeoJSON se buscan en ``geodatos/departamentos.geojson`` y
+``geodatos/municipios.geojson`` (o en las rutas de
+``GUATECOMPRAS_GEO_DEPARTAMENTOS`` / ``GUATECOMPRAS_GEO_MUNICIPIOS``). Si no
+existen, el mapa de montos vuelve a los círculos por departamento.
+"""
+import json
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from territorio import plegar_nombre
+
+
+RUTAS_LIMITES = {
+    'departamento': os.environ.get('GUATECOMPRAS_GEO_DEPARTAMENTOS', os.path.join('geodatos', 'departamentos.geojson')),
+    'municipio': os.environ.get('GUATECOMPRAS_GEO_MUNICIPIOS', os.path.join('geodatos', 'municipios.geojson')),
+}
+
+# Zoom para el que se simplifica: un paso más fino que el zoom inicial de los
+# departamentos (mapas.ZOOM_MONTOS), así los bordes aguantan el primer acercamiento
+ZOOM_GEOMETRIA = 8
+DECIMALES = 4  # ~11 m, por debajo de la tolerancia de ZOOM_GEOMETRIA
+
+# Propiedades donde se busca el nombre, en orden de preferencia (INE, GADM, geoBoundaries)
+CAMPOS_DEPARTAMENTO = ['departamento', 'DEPARTAMENTO', 'depto', 'DEPTO', 'NAME_1']
+CAMPOS_NOMBRE = ['nombre', 'NOMBRE', 'name', 'NAME', 'shapeName']
+CAMPOS_MUNICIPIO = ['municipio', 'MUNICIPIO', 'NAME_2'] + CAMPOS_NOMBRE
+
+_lock_capas = threading.Lock()
+
+
+# ============================================
+# SIMPLIFICACIÓN (DOUGLAS-PEUCKER)
+# ============================================
+def tolerancia_zoom(zoom):
+    """Grados que ocupa un píxel a ese zoom (teselas de 256 px)"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def douglas_peucker(puntos, tolerancia):
+    """Puntos de la polilínea que se apartan más de ``tolerancia`` de la recta.
+
+    Versión iterativa (sin recursión) con las distancias de cada tramo
+    calculadas en bloque con numpy.
+    """
+    puntos = np.asarray(puntos, dtype=float)[:, :2]
+    n = len(puntos)
+    if n < 3:
+        return puntos
+    conservar = np.zeros(n, dtype=bool)
+    conservar[[0, n - 1]] = True
+    pendientes = [(0, n - 1)]
+    while pendientes:
+        i, j = pendientes.pop()
+        if j <= i + 1:
+            continue
+        a, b = puntos[i], puntos[j]
+        tramo = puntos[i + 1:j] - a
+        dx, dy = b - a
+        largo = np.hypot(dx, dy)
+        if largo == 0:  # Anillo cerrado: distancia al punto de inicio
+            distancias = np.hypot(tramo[:, 0], tramo[:, 1])
+        else:
+            distancias = np.abs(dx * tramo[:, 1] - dy * tramo[:, 0]) / largo
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            k += i + 1
+            conservar[k] = True
+            pendientes += [(i, k), (k, j)]
+    return puntos[conservar]
+
+
+def _anillo(anillo, tolerancia):
+    """Anillo simplificado y redondeado, o None si colapsa a menos de 4 puntos"""
+    simplificado = np.round(douglas_peucker(anillo, tolerancia), DECIMALES)
+    return simplificado.tolist() if len(simplificado) >= 4 else None
+
+
+def simplificar_geometria(geometria, tolerancia):
+    """Polygon/MultiPolygon simplificado; los polígonos que colapsan se descartan"""
+    if geometria['type'] == 'Polygon':
+        poligonos = [geometria['coordinates']]
+    elif geometria['type'] == 'MultiPolygon':
+        poligonos = geometria['coordinates']
+    else:
+        return geometria
+
+    resultado = []
+    for anillos in poligonos:
+        exterior = _anillo(anillos[0], tolerancia)
+        if exterior is None:
+            continue  # Islas más chicas que un píxel
+        huecos = [h for h in (_anillo(a, tolerancia) for a in anillos[1:]) if h is not None]
+        resultado.append([exterior] + huecos)
+    if not resultado:
+        # Nunca se pierde una zona entera: queda su primer contorno sin simplificar
+        resultado = [[np.round(np.asarray(poligonos[0][0], dtype=float)[:, :2], DECIMALES).tolist()]]
+    if len(resultado) == 1:
+        return {'type': 'Polygon', 'coordinates': resultado[0]}
+    return {'type': 'MultiPolygon', 'coordinates': resultado}
+
+
+def _json_incrustable(valor):
+    """JSON compacto que se puede incrustar en un <script> (como hace folium)"""
+    return (json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+            .replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+
+
+def _vertices(geometria):
+    if geometria['type'] == 'Polygon':
+        return sum(len(a) for a in geometria['coordinates'])
+    if geometria['type'] == 'MultiPolygon':
+        return sum(len(a) for p in geometria['coordinates'] for a in p)
+    return 0
+
+
+# ============================================
+# CAPAS
+# ============================================
+def _primer_campo(propiedades, candidatos):
+    return next((c for c in candidatos if c in propiedades), None)
+
+
+class CapaLimites:
+    """Límites de un archivo GeoJSON con su geometría simplificada para ``zoom``.
+
+    El archivo se lee y se simplifica una sola vez por proceso; cada zona
+    lleva una clave plegada (minúsculas, sin tildes) de departamento y, en
+    la capa de municipios, también de municipio. Los montos se unen por esa
+    clave sin tocar la geometría, que queda serializada una sola vez.
+    """
+
+    def __init__(self, ruta, nivel, firma='', zoom=ZOOM_GEOMETRIA):
+        with open(ruta, encoding='utf-8') as f:
+            fuente = json.load(f)
+        zonas = fuente['features'] if fuente.get('type') == 'FeatureCollection' else [fuente]
+        zonas = [z for z in zonas if z.get('geometry')]
+        propiedades = (zonas[0].get('properties') or {}) if zonas else {}
+
+        self.ruta = ruta
+        self.nivel = nivel
+        self.firma = firma
+        self.zoom = zoom
+        if nivel == 'municipio':
+            self.campo_departamento = _primer_campo(propiedades, CAMPOS_DEPARTAMENTO)
+            self.campo_nombre = _primer_campo(propiedades, CAMPOS_MUNICIPIO)
+        else:
+            self.campo_departamento = _primer_campo(propiedades, CAMPOS_DEPARTAMENTO + CAMPOS_NOMBRE)
+            self.campo_nombre = self.campo_departamento
+        if self.campo_nombre is None:
+            raise ValueError(f"{ruta}: ninguna propiedad con el nombre del {nivel}")
+
+        self.nombres = []
+        self.claves = []
+        for zona in zonas:
+            props = zona.get('properties') or {}
+            nombre = props.get(self.campo_nombre)
+            self.nombres.append(str(nombre))
+            departamento = props.get(self.campo_departamento) if nivel == 'municipio' else None
+            self.claves.append(self.clave(departamento if nivel == 'municipio' else nombre,
+                                          nombre if nivel == 'municipio' else None))
+
+        self.geometrias = [simplificar_geometria(z['geometry'], tolerancia_zoom(zoom)) for z in zonas]
+        self._geometrias_json = [_json_incrustable(g) for g in self.geometrias]
+        self.vertices = {
+            'simplificado': sum(_vertices(g) for g in self.geometrias),
+            'original': sum(_vertices(z['geometry']) for z in zonas),
+        }
+
+    def clave(self, departamento, municipio=None):
+        """Clave de unión; sin departamento en el archivo solo se usa el municipio"""
+        if self.nivel != 'municipio':
+            return plegar_nombre(departamento)
+        prefijo = plegar_nombre(departamento) if self.campo_departamento else ''
+        return f"{prefijo}|{plegar_nombre(municipio)}"
+
+    def geojson(self, valores, vacio=None):
+        """Texto JSON de la FeatureCollection con ``valores[clave]`` en las propiedades.
+
+        Por cada combinación de filtros solo se serializan las propiedades;
+        la geometría se pega ya serializada.
+        """
+        zonas = ','.join(
+            '{"type":"Feature","geometry":' + geometria + ',"properties":'
+            + _json_incrustable(dict(valores.get(clave, vacio or {}), nombre=nombre, clave=clave)) + '}'
+            for nombre, clave, geometria in zip(self.nombres, self.claves, self._geometrias_json)
+        )
+        return '{"type":"FeatureCollection","features":[' + zonas + ']}'
+
+
+@lru_cache(maxsize=4)
+def _cargar_capa(ruta, nivel, tamano, mtime_ns):
+    return CapaLimites(ruta, nivel, firma=f"{tamano}-{mtime_ns}")
+
+
+def capa_limites(nivel):
+    """Capa de ``nivel`` ('departamento' o 'municipio'), o None si no hay archivo.
+
+    Se comparte entre sesiones y se vuelve a leer solo si el archivo cambia.
+    """
+    ruta = RUTAS_LIMITES[nivel]
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        return None
+    with _lock_capas:
+        return _cargar_capa(ruta, nivel, info.st_size, info.st_mtime_ns)
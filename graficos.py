@@ -0,0 +1,169 @@
+# graficos.py
+"""Figuras Plotly del dashboard a partir de datos ya agregados"""
+import numpy as np
+import plotly.express as px
+
+
+# Desde este número de puntos el scatter se dibuja con WebGL (scattergl)
+UMBRAL_WEBGL = 5_000
+
+
+def evolucion_anual(licitaciones_por_año):
+    fig = px.line(
+        licitaciones_por_año,
+        x='año_adjudicacion',
+        y='Cantidad',
+        markers=True,
+        line_shape='linear'
+    )
+    fig.update_traces(line=dict(width=3), marker=dict(size=10))
+    return fig
+
+
+def serie_temporal(serie, metrica, etiqueta_periodo, ventana):
+    """Serie por período con su media móvil; la variación interanual va en el hover"""
+    prefijo = 'Cantidad' if metrica == 'Cantidad' else 'monto'
+    formato = ',d' if metrica == 'Cantidad' else ',.2f'
+    fig = px.line(
+        serie,
+        x='periodo',
+        y=metrica,
+        custom_data=[f"{prefijo}_interanual"],
+        labels={'periodo': etiqueta_periodo, 'Cantidad': 'Cantidad', 'monto_adjudicado': 'Monto (Q)'},
+        markers=len(serie) <= 60
+    )
+    fig.update_traces(
+        name=metrica, showlegend=ventana > 1,
+        hovertemplate=f"%{{x}}<br>%{{y:{formato}}}<br>Interanual: %{{customdata[0]:+.1%}}<extra></extra>"
+    )
+    if ventana > 1:
+        fig.add_scatter(
+            x=serie['periodo'], y=serie[f"{prefijo}_media"], mode='lines',
+            name=f"Media móvil ({ventana})", line=dict(width=3, dash='dot'),
+            hovertemplate=f"%{{y:{formato}}}<extra>Media móvil</extra>"
+        )
+    return fig
+
+
+def por_tipo(licitaciones_por_tipo):
+    top = licitaciones_por_tipo.sort_values('Cantidad', ascending=False).head(10)
+    return px.bar(
+        top,
+        x='tipo_proyecto',
+        y='Cantidad',
+        title="Top 10 Tipos de Proyecto",
+        color='Cantidad',
+        color_continuous_scale='Viridis'
+    )
+
+
+def monto_por_region(por_region):
+    por_region = por_region.sort_values('monto_adjudicado', ascending=True)
+    return px.bar(
+        por_region,
+        x='monto_adjudicado',
+        y='region',
+        orientation='h',
+        title="Monto Total por Región",
+        labels={'monto_adjudicado': 'Monto (Q)', 'region': 'Región'},
+        color='monto_adjudicado',
+        color_continuous_scale='Blues'
+    )
+
+
+def top_proveedores(proveedores):
+    return px.bar(
+        proveedores,
+        x='monto_adjudicado',
+        y='proveedor_ganador',
+        orientation='h',
+        title="Top 10 Proveedores",
+        hover_data={'Cantidad': True, 'participacion': ':.1%'},
+        labels={'monto_adjudicado': 'Monto (Q)', 'proveedor_ganador': 'Proveedor',
+                'participacion': 'Participación'},
+        color='monto_adjudicado',
+        color_continuous_scale='Greens'
+    )
+
+
+def concentracion_proveedores(tabla, dim, etiqueta, k, umbral_alto):
+    """HHI de los valores de ``dim`` con más monto; la línea marca el umbral de alta concentración"""
+    top = tabla.sort_values('monto_adjudicado', ascending=False).head(15).sort_values('hhi')
+    fig = px.bar(
+        top,
+        x='hhi',
+        y=dim,
+        orientation='h',
+        title=f"Concentración de proveedores por {etiqueta.lower()} (HHI)",
+        color='participacion_top',
+        range_color=(0, 1),
+        hover_data={'proveedores': True, 'monto_adjudicado': ':,.2f', 'participacion_top': ':.1%'},
+        labels={'hhi': 'HHI', dim: etiqueta, 'proveedores': 'Proveedores', 'monto_adjudicado': 'Monto (Q)',
+                'participacion_top': f"Top {k}"},
+        color_continuous_scale='Oranges'
+    )
+    fig.add_vline(x=umbral_alto, line_dash='dash', line_color='red')
+    return fig
+
+
+def distribucion_estatus(por_estatus):
+    estatus_count = por_estatus.sort_values('Cantidad', ascending=False)
+    estatus_count = estatus_count.rename(columns={'estatus': 'Estatus'})
+    return px.pie(
+        estatus_count,
+        values='Cantidad',
+        names='Estatus',
+        title="Proporción de Licitaciones por Estatus",
+        hole=0.3
+    )
+
+
+def ofertas_vs_monto(df_ofertas):
+    """Un punto por licitación; el detalle se pide al seleccionar (customdata = NOG)"""
+    return px.scatter(
+        df_ofertas,
+        x='numero_ofertas',
+        y='monto_adjudicado',
+        color='tipo_proyecto',
+        size='monto_adjudicado',
+        custom_data=['nog'],
+        hover_data=['nog'],
+        render_mode='webgl' if len(df_ofertas) > UMBRAL_WEBGL else 'svg',
+        title="Número de Ofertas vs Monto Adjudicado",
+        labels={'numero_ofertas': 'Número de Ofertas', 'monto_adjudicado': 'Monto (Q)'}
+    )
+
+
+def densidad_ofertas_monto(bins):
+    """Una celda por (ofertas, rango de monto en escala log) coloreada por cantidad"""
+    celdas = bins.assign(monto_centro=np.sqrt(bins['monto_desde'] * bins['monto_hasta']))
+    fig = px.scatter(
+        celdas,
+        x='numero_ofertas',
+        y='monto_centro',
+        color='Cantidad',
+        log_y=True,
+        custom_data=['numero_ofertas', 'bin_monto', 'monto_desde', 'monto_hasta'],
+        hover_data={'monto_centro': False, 'monto_desde': ':,.2f', 'monto_hasta': ':,.2f',
+                    'monto_adjudicado': ':,.2f'},
+        title="Número de Ofertas vs Monto Adjudicado (densidad)",
+        labels={'numero_ofertas': 'Número de Ofertas', 'monto_centro': 'Monto (Q)',
+                'monto_desde': 'Desde (Q)', 'monto_hasta': 'Hasta (Q)', 'monto_adjudicado': 'Monto total (Q)'},
+        color_continuous_scale='Viridis'
+    )
+    fig.update_traces(marker=dict(symbol='square', size=14))
+    return fig
+
+
+def top_departamentos(por_departamento):
+    top_deptos = por_departamento.sort_values('Cantidad', ascending=False).head(10)
+    top_deptos = top_deptos.rename(columns={'departamento': 'Departamento'})
+    return px.bar(
+        top_deptos,
+        x='Cantidad',
+        y='Departamento',
+        orientation='h',
+        title="Licitaciones por Departamento",
+        color='Cantidad',
+        color_continuous_scale='Viridis'
+    )
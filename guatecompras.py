@@ -1,11 +1,21 @@
 # dashboard_licitaciones.py
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import numpy as np
-import json
+
+import graficos
+from alertas import REGLAS, REGLAS_POR_NOMBRE
+from almacen import firma_rapida
+from consultas import (
+    Consulta, FuenteDataFrame, consulta_celda, crear_motor, duckdb_disponible, motor_configurado
+)
+from datos import ARCHIVO_CSV, DIRECTORIO_EXTRACTOS, leer_rechazos, leer_rechazos_extractos, ruta_rechazos
+from exportar import FORMATOS
+from perfil import perfilador
+from proveedores import DIMENSIONES_CONCENTRACION, UMBRAL_HHI_ALTO
+from secciones import cache_renderizados, firma_seccion, memo_seccion
+from series import COLUMNAS_FECHA, GRANULARIDADES
+from tablas import tabla_paginada
 
 
 
@@ -20,40 +30,40 @@ st.set_page_config(
 st.title("📊 Dashboard de Licitaciones Públicas")
 st.markdown("---")
 
+# Modo perfil (GUATECOMPRAS_PERFIL=1 en el servidor): tiempos, filas y memoria por sección
+perfil = perfilador()
+perfil.nuevo_rerun()
+
 # ============================================
 # CARGA DE DATOS
 # ============================================
-@st.cache_data
-def load_data():
-    """Carga los datos desde el archivo CSV"""
-    df = pd.read_csv('proyectos_guatecompras.csv', encoding='utf-8')
-    
-    # Limpiar nombres de columnas
-    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
-    
-    # Convertir columnas numéricas
-    columnas_numericas = ['monto_adjudicado', 'fianza_sostenimiento', 'fianza_cumplimiento', 'numero_ofertas']
-    for col in columnas_numericas:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Convertir fechas
-    columnas_fechas = ['fecha_publicacion', 'fecha_presentacion', 'fecha_cierre', 'fecha_adjudicacion']
-    for col in columnas_fechas:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-    
-    # Extraer año de adjudicación
-    if 'fecha_adjudicacion' in df.columns:
-        df['año_adjudicacion'] = df['fecha_adjudicacion'].dt.year
-    
-    return df
+@st.cache_resource(max_entries=1)
+def load_data(firma, nombre_motor):
+    """Crea el motor de consultas compartido por todas las sesiones.
+
+    ``firma`` (tamaño y mtime del CSV) solo sirve como clave: si el archivo
+    cambia se construye un motor nuevo.
+    """
+    return crear_motor(nombre_motor, ARCHIVO_CSV)
+
+# Motor de consultas: en memoria (pandas) o DuckDB sobre Parquet (GUATECOMPRAS_MOTOR=duckdb)
+nombre_motor = motor_configurado()
+if nombre_motor == 'duckdb' and not duckdb_disponible():
+    st.warning("⚠️ DuckDB no está instalado; se usa el motor en memoria (pip install duckdb)")
+    nombre_motor = 'pandas'
 
 # Cargar datos
+t_carga = perfil.cronometro('cargar_datos')
 try:
-    df = load_data()
-    if df is not None and not df.empty:
-        st.success(f"✅ Datos cargados correctamente: {len(df)} licitaciones")
+    motor = load_data(firma_rapida(ARCHIVO_CSV), nombre_motor)
+    # Extractos diarios nuevos: solo se procesan las filas del delta
+    filas_actualizadas = motor.actualizar()
+    if filas_actualizadas:
+        st.toast(f"🔄 {filas_actualizadas} licitaciones incorporadas desde extractos nuevos")
+    total_licitaciones = motor.total()
+    t_carga.detener(filas_salida=total_licitaciones)
+    if total_licitaciones:
+        st.success(f"✅ Datos cargados correctamente: {total_licitaciones} licitaciones")
     else:
         st.error("❌ No se encontraron datos en el archivo")
         st.stop()
@@ -62,86 +72,122 @@ except Exception as e:
     st.info("📝 Asegúrate de que el archivo 'licitaciones.csv' existe en el mismo directorio")
     st.stop()
 
+# Filas del CSV que no cumplieron el esquema (esquema.py) y quedaron fuera
+rechazos = leer_rechazos(ARCHIVO_CSV)
+if rechazos is not None:
+    with st.expander(f"⚠️ {rechazos['fila'].nunique():,} filas del CSV no cumplen el esquema y se excluyeron"):
+        st.caption(f"Reporte completo en {ruta_rechazos(ARCHIVO_CSV)}")
+        tabla_paginada(FuenteDataFrame(rechazos), list(rechazos.columns), {}, clave='rechazos')
+rechazos_extractos = leer_rechazos_extractos(DIRECTORIO_EXTRACTOS)
+if rechazos_extractos is not None:
+    n_filas = len(rechazos_extractos[['extracto', 'fila']].drop_duplicates())
+    with st.expander(f"⚠️ {n_filas:,} filas de los extractos no cumplen el esquema y se excluyeron"):
+        st.caption(f"Un reporte *.rechazos.csv al lado de cada extracto en {DIRECTORIO_EXTRACTOS}/")
+        tabla_paginada(FuenteDataFrame(rechazos_extractos), list(rechazos_extractos.columns), {},
+                       clave='rechazos_extractos')
+
 # ============================================
 # FILTROS
 # ============================================
+# Cada filtro agrega una restricción a la consulta; las opciones, indicadores
+# y gráficos los resuelve el motor y a Python solo llegan los resultados.
 st.sidebar.header("🔍 Filtros")
 
 # FILTRO 1: Año
+t_filtros = perfil.cronometro('filtros', filas_entrada=total_licitaciones)
 st.sidebar.subheader("📅 1. Año de Adjudicación")
-años_disponibles = sorted(df['año_adjudicacion'].dropna().unique().astype(int))
+consulta = Consulta()
+años_disponibles = motor.opciones('año_adjudicacion', consulta)
 años_seleccionados = st.sidebar.multiselect(
     "Año",
     options=años_disponibles,
     default=años_disponibles
 )
 
-df_filtrado = df[df['año_adjudicacion'].isin(años_seleccionados)]
+consulta = consulta.filtrar('año_adjudicacion', años_seleccionados)
 
-if df_filtrado.empty:
+if motor.contar(consulta) == 0:
     st.warning("⚠️ No hay licitaciones en los años seleccionados.")
     st.stop()
 
 # FILTRO 2: Región
 st.sidebar.subheader("🗺️ 2. Región")
-regiones_disponibles = sorted(df_filtrado['region'].dropna().unique())
+regiones_disponibles = motor.opciones('region', consulta)
 regiones_seleccionadas = st.sidebar.multiselect(
     "Región",
     options=regiones_disponibles,
     default=regiones_disponibles
 )
 
-df_filtrado = df_filtrado[df_filtrado['region'].isin(regiones_seleccionadas)]
+consulta = consulta.filtrar('region', regiones_seleccionadas)
 
 # FILTRO 3: Departamento
 st.sidebar.subheader("📍 3. Departamento")
-deptos_disponibles = sorted(df_filtrado['departamento'].dropna().unique())
+deptos_disponibles = motor.opciones('departamento', consulta)
 deptos_seleccionados = st.sidebar.multiselect(
     "Departamento",
     options=deptos_disponibles,
     default=deptos_disponibles
 )
 
-df_filtrado = df_filtrado[df_filtrado['departamento'].isin(deptos_seleccionados)]
+consulta = consulta.filtrar('departamento', deptos_seleccionados)
 
 # FILTRO 4: Tipo de Proyecto
 st.sidebar.subheader("🏗️ 4. Tipo de Proyecto")
-tipos_disponibles = sorted(df_filtrado['tipo_proyecto'].dropna().unique())
+tipos_disponibles = motor.opciones('tipo_proyecto', consulta)
 tipos_seleccionados = st.sidebar.multiselect(
     "Tipo de Proyecto",
     options=tipos_disponibles,
     default=tipos_disponibles
 )
 
-df_filtrado = df_filtrado[df_filtrado['tipo_proyecto'].isin(tipos_seleccionados)]
+consulta = consulta.filtrar('tipo_proyecto', tipos_seleccionados)
 
 # FILTRO 5: Estatus
 st.sidebar.subheader("📌 5. Estatus")
-estatus_disponibles = sorted(df_filtrado['estatus'].dropna().unique())
+estatus_disponibles = motor.opciones('estatus', consulta)
 estatus_seleccionados = st.sidebar.multiselect(
     "Estatus",
     options=estatus_disponibles,
     default=estatus_disponibles
 )
 
-df_filtrado = df_filtrado[df_filtrado['estatus'].isin(estatus_seleccionados)]
+consulta = consulta.filtrar('estatus', estatus_seleccionados)
 
 # FILTRO 6: Rango de Monto
 st.sidebar.subheader("💰 6. Rango de Monto")
-monto_min = float(df_filtrado['monto_adjudicado'].min() if not df_filtrado['monto_adjudicado'].isna().all() else 0)
-monto_max = float(df_filtrado['monto_adjudicado'].max() if not df_filtrado['monto_adjudicado'].isna().all() else 10000000)
-
-rango_monto = st.sidebar.slider(
-    "Monto Adjudicado (Q)",
-    min_value=monto_min,
-    max_value=monto_max,
-    value=(monto_min, monto_max),
-    format="Q%.2f"
-)
+rango_disponible = motor.rango_monto(consulta)
+
+if rango_disponible is None:
+    # Sin ningún monto no hay rango que elegir: no se filtra por monto
+    st.sidebar.info("ℹ️ Ninguna licitación de la selección tiene monto adjudicado")
+elif rango_disponible[0] == rango_disponible[1]:
+    # El slider no admite mínimo igual a máximo
+    st.sidebar.caption(f"Todas las licitaciones con monto tienen Q{rango_disponible[0]:,.2f}")
+    consulta = consulta.con_rango_monto()
+else:
+    monto_min, monto_max = rango_disponible
+    rango_monto = st.sidebar.slider(
+        "Monto Adjudicado (Q)",
+        min_value=monto_min,
+        max_value=monto_max,
+        value=(monto_min, monto_max),
+        format="Q%.2f"
+    )
 
-df_filtrado = df_filtrado[
-    df_filtrado['monto_adjudicado'].between(rango_monto[0], rango_monto[1])
-]
+    # Con el rango completo solo se exige monto informado: el motor en memoria
+    # responde entonces indicadores y gráficos desde el cubo pre-agregado.
+    if tuple(rango_monto) == (monto_min, monto_max):
+        consulta = consulta.con_rango_monto()
+    else:
+        consulta = consulta.con_rango_monto(*rango_monto)
+
+def agrupado(dim):
+    """Cantidad y monto por valor de ``dim`` para los filtros activos"""
+    return motor.agrupar(dim, consulta)
+
+resumen = motor.resumen(consulta)
+t_filtros.detener(filas_salida=resumen['total'])
 
 # Resumen de filtros
 st.sidebar.markdown("---")
@@ -152,7 +198,7 @@ st.sidebar.info(f"""
 **Departamentos:** {len(deptos_seleccionados)}  
 **Tipos:** {len(tipos_seleccionados)}  
 **Estatus:** {len(estatus_seleccionados)}  
-**Licitaciones:** {len(df_filtrado)}
+**Licitaciones:** {resumen['total']}
 """)
 
 # ============================================
@@ -163,116 +209,186 @@ st.header("📈 Indicadores Clave")
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    st.metric("Total Licitaciones", len(df_filtrado))
+    st.metric("Total Licitaciones", resumen['total'])
 
 with col2:
-    monto_total = df_filtrado['monto_adjudicado'].sum()
-    st.metric("Monto Total Adjudicado", f"Q{monto_total:,.2f}")
+    st.metric("Monto Total Adjudicado", f"Q{resumen['monto_total']:,.2f}")
 
 with col3:
-    monto_promedio = df_filtrado['monto_adjudicado'].mean()
-    st.metric("Monto Promedio", f"Q{monto_promedio:,.2f}")
+    st.metric("Monto Promedio", f"Q{resumen['monto_promedio']:,.2f}")
 
 with col4:
-    proveedores = df_filtrado['proveedor_ganador'].nunique()
-    st.metric("Proveedores Distintos", proveedores)
+    st.metric("Proveedores Distintos", resumen['proveedores'])
 
 st.markdown("---")
 
 # ============================================
 # GRÁFICOS PRINCIPALES
 # ============================================
-
-# Gráfico 1: Evolución por año
-st.subheader("📅 Evolución de Licitaciones por Año")
-licitaciones_por_año = df_filtrado.groupby('año_adjudicacion').size().reset_index(name='Cantidad')
-fig_temporal = px.line(
-    licitaciones_por_año,
-    x='año_adjudicacion',
-    y='Cantidad',
-    markers=True,
-    line_shape='linear'
-)
-fig_temporal.update_traces(line=dict(width=3), marker=dict(size=10))
-st.plotly_chart(fig_temporal, use_container_width=True)
+# Cada figura se reconstruye solo si cambian el dataset o los filtros; la
+# búsqueda, la tabla y los mapas no las invalidan.
+firma_graficos = firma_seccion(motor.version, consulta.firma())
+
+def grafico(nombre, construir):
+    """Construye (o reutiliza) la figura y la dibuja"""
+    with perfil.seccion(f"grafico_{nombre}", filas_entrada=resumen['total']):
+        fig = memo_seccion(nombre, firma_graficos, construir)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+
+# Gráfico 1: Evolución en el tiempo
+st.subheader("📅 Evolución de Licitaciones")
+
+ETIQUETAS_FECHA = {
+    'fecha_adjudicacion': "Adjudicación",
+    'fecha_publicacion': "Publicación",
+    'fecha_presentacion': "Presentación",
+    'fecha_cierre': "Cierre",
+}
+METRICAS_SERIE = {"Cantidad": 'Cantidad', "Monto": 'monto_adjudicado'}
+
+@st.fragment
+def seccion_tendencia(motor, consulta, total):
+    """Cambiar fecha, granularidad o métrica re-ejecuta solo este bloque"""
+    col_fecha, col_gran, col_metrica = st.columns(3)
+    with col_fecha:
+        fecha = st.selectbox("Fecha", COLUMNAS_FECHA, format_func=ETIQUETAS_FECHA.get, key='serie_fecha')
+    with col_gran:
+        gran = st.radio("Granularidad", list(GRANULARIDADES), index=list(GRANULARIDADES).index('M'),
+                        format_func=lambda g: GRANULARIDADES[g][0], horizontal=True, key='serie_granularidad')
+    with col_metrica:
+        metrica = METRICAS_SERIE[st.radio("Métrica", list(METRICAS_SERIE), horizontal=True, key='serie_metrica')]
+
+    etiqueta, ventana, _ = GRANULARIDADES[gran]
+    firma = firma_seccion(motor.version, consulta.firma())
+    with perfilador().seccion(f"grafico_serie_{gran}", filas_entrada=total):
+        serie = memo_seccion(f"serie_{fecha}_{gran}", firma, lambda: motor.serie_temporal(consulta, fecha, gran))
+        if serie.empty:
+            st.info("No hay licitaciones con esa fecha informada")
+            return
+        fig = memo_seccion(f"serie_{fecha}_{gran}_{metrica}", firma,
+                           lambda: graficos.serie_temporal(serie, metrica, etiqueta, ventana))
+        st.plotly_chart(fig, use_container_width=True, key='serie_temporal')
+
+    # La ventana que termina en el último período contra la misma ventana un año antes
+    ultima = serie['Cantidad_interanual' if metrica == 'Cantidad' else 'monto_interanual'].iloc[-1]
+    if pd.notna(ultima):
+        alcance = f"últimos {ventana} períodos" if ventana > 1 else "último período"
+        st.caption(f"Variación interanual ({alcance} hasta {serie['periodo'].iloc[-1]:%Y-%m-%d}): {ultima:+.1%}")
+
+seccion_tendencia(motor, consulta, resumen['total'])
 
 # Gráficos en dos columnas
 col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("📊 Licitaciones por Tipo de Proyecto")
-    licitaciones_por_tipo = df_filtrado.groupby('tipo_proyecto').size().reset_index(name='Cantidad')
-    licitaciones_por_tipo = licitaciones_por_tipo.sort_values('Cantidad', ascending=False).head(10)
-    fig_tipo = px.bar(
-        licitaciones_por_tipo,
-        x='tipo_proyecto',
-        y='Cantidad',
-        title="Top 10 Tipos de Proyecto",
-        color='Cantidad',
-        color_continuous_scale='Viridis'
-    )
-    st.plotly_chart(fig_tipo, use_container_width=True)
+    grafico('tipo', lambda: graficos.por_tipo(agrupado('tipo_proyecto')))
 
 with col2:
     st.subheader("💰 Monto por Región")
-    monto_por_region = df_filtrado.groupby('region')['monto_adjudicado'].sum().reset_index()
-    monto_por_region = monto_por_region.sort_values('monto_adjudicado', ascending=True)
-    fig_region = px.bar(
-        monto_por_region,
-        x='monto_adjudicado',
-        y='region',
-        orientation='h',
-        title="Monto Total por Región",
-        labels={'monto_adjudicado': 'Monto (Q)', 'region': 'Región'},
-        color='monto_adjudicado',
-        color_continuous_scale='Blues'
-    )
-    st.plotly_chart(fig_region, use_container_width=True)
+    grafico('region', lambda: graficos.monto_por_region(agrupado('region')))
 
 # Gráfico 3: Top Proveedores
 st.subheader("🏢 Top 10 Proveedores por Monto Adjudicado")
-top_proveedores = df_filtrado.groupby('proveedor_ganador')['monto_adjudicado'].sum().reset_index()
-top_proveedores = top_proveedores.sort_values('monto_adjudicado', ascending=False).head(10)
-fig_proveedores = px.bar(
-    top_proveedores,
-    x='monto_adjudicado',
-    y='proveedor_ganador',
-    orientation='h',
-    title="Top 10 Proveedores",
-    labels={'monto_adjudicado': 'Monto (Q)', 'proveedor_ganador': 'Proveedor'},
-    color='monto_adjudicado',
-    color_continuous_scale='Greens'
-)
-st.plotly_chart(fig_proveedores, use_container_width=True)
+grafico('proveedores', lambda: graficos.top_proveedores(motor.top_proveedores(consulta, 10)))
+
+# Gráfico 3b: Concentración de proveedores
+st.subheader("🏛️ Concentración de Proveedores")
+
+ETIQUETAS_CONCENTRACION = {'entidad': "Entidad", 'departamento': "Departamento", 'tipo_proyecto': "Tipo de Proyecto"}
+
+@st.fragment
+def seccion_concentracion(motor, consulta, total):
+    """Cambiar la dimensión o el K re-ejecuta solo este bloque"""
+    col_dim, col_k = st.columns(2)
+    with col_dim:
+        dim = st.selectbox("Por", DIMENSIONES_CONCENTRACION, format_func=ETIQUETAS_CONCENTRACION.get,
+                           key='concentracion_dim')
+    with col_k:
+        k = st.select_slider("Participación de los K mayores", [1, 2, 3, 4, 5, 10], value=4, key='concentracion_k')
+
+    etiqueta = ETIQUETAS_CONCENTRACION[dim]
+    firma = firma_seccion(motor.version, consulta.firma())
+    with perfilador().seccion(f"concentracion_{dim}", filas_entrada=total):
+        tabla = memo_seccion(f"concentracion_{dim}_{k}", firma, lambda: motor.concentracion(consulta, dim, k))
+        if tabla.empty:
+            st.info("No hay licitaciones con proveedor para mostrar")
+            return
+        fig = memo_seccion(f"grafico_concentracion_{dim}_{k}", firma, lambda: graficos.concentracion_proveedores(
+            tabla, dim, etiqueta, k, UMBRAL_HHI_ALTO))
+        st.plotly_chart(fig, use_container_width=True, key='concentracion')
+
+    altas = int((tabla['hhi'] > UMBRAL_HHI_ALTO).sum())
+    st.caption(f"HHI de 0 a 10,000 sobre el monto adjudicado; {altas:,} de {len(tabla):,} "
+               f"con concentración alta (más de {UMBRAL_HHI_ALTO:,})")
+    resumen_concentracion = tabla.rename(columns={
+        dim: etiqueta, 'monto_adjudicado': 'Monto_Total', 'proveedores': 'Proveedores', 'hhi': 'HHI',
+        'participacion_top': f"Top_{k}",
+    })
+    tabla_paginada(
+        FuenteDataFrame(resumen_concentracion.sort_values('HHI', ascending=False)),
+        list(resumen_concentracion.columns),
+        {'Monto_Total': 'Q{:,.2f}', 'HHI': '{:,.0f}', f"Top_{k}": '{:.1%}'},
+        clave='concentracion'
+    )
+
+seccion_concentracion(motor, consulta, resumen['total'])
 
 # Gráfico 4: Estatus
 st.subheader("📌 Distribución por Estatus")
-estatus_count = df_filtrado['estatus'].value_counts().reset_index()
-estatus_count.columns = ['Estatus', 'Cantidad']
-fig_estatus = px.pie(
-    estatus_count,
-    values='Cantidad',
-    names='Estatus',
-    title="Proporción de Licitaciones por Estatus",
-    hole=0.3
-)
-st.plotly_chart(fig_estatus, use_container_width=True)
+grafico('estatus', lambda: graficos.distribucion_estatus(agrupado('estatus')))
 
 # Gráfico 5: Número de Ofertas vs Monto
 st.subheader("📊 Relación: Número de Ofertas vs Monto Adjudicado")
-df_ofertas = df_filtrado.dropna(subset=['numero_ofertas', 'monto_adjudicado'])
-if not df_ofertas.empty:
-    fig_ofertas = px.scatter(
-        df_ofertas,
-        x='numero_ofertas',
-        y='monto_adjudicado',
-        color='tipo_proyecto',
-        size='monto_adjudicado',
-        hover_data=['proveedor_ganador', 'departamento', 'descripcion'],
-        title="Número de Ofertas vs Monto Adjudicado",
-        labels={'numero_ofertas': 'Número de Ofertas', 'monto_adjudicado': 'Monto (Q)'}
-    )
-    st.plotly_chart(fig_ofertas, use_container_width=True)
+
+# Con muchas licitaciones se dibuja la densidad (ofertas × bins log del monto)
+# en lugar de un punto por fila; por encima de MAX_PUNTOS_OFERTAS siempre.
+MODOS_OFERTAS = ["Automático", "Puntos", "Densidad"]
+UMBRAL_DENSIDAD = 50_000
+MAX_PUNTOS_OFERTAS = 200_000
+COLUMNAS_DETALLE_OFERTAS = [
+    'nog', 'descripcion', 'proveedor_ganador', 'departamento', 'tipo_proyecto', 'numero_ofertas', 'monto_adjudicado'
+]
+
+@st.fragment
+def seccion_ofertas(motor, consulta, total):
+    """Seleccionar un punto o celda re-ejecuta solo este bloque y trae su detalle"""
+    firma = firma_seccion(motor.version, consulta.firma())
+    t_ofertas = perfilador().cronometro('grafico_ofertas', filas_entrada=total)
+    bins = memo_seccion('ofertas_bins', firma, lambda: motor.bins_ofertas(consulta))
+    puntos = int(bins['Cantidad'].sum())
+    if puntos == 0:
+        return
+
+    modo = st.radio("Vista", MODOS_OFERTAS, horizontal=True, label_visibility='collapsed', key='modo_ofertas')
+    densidad = modo == "Densidad" or puntos > MAX_PUNTOS_OFERTAS or (modo == "Automático" and puntos > UMBRAL_DENSIDAD)
+    if densidad:
+        if modo == "Puntos":
+            st.caption(f"ℹ️ Más de {MAX_PUNTOS_OFERTAS:,} licitaciones: se muestra la densidad")
+        fig = memo_seccion('ofertas_densidad', firma, lambda: graficos.densidad_ofertas_monto(bins))
+    else:
+        # Solo viajan las columnas del gráfico; descripción y proveedor se piden al seleccionar
+        fig = memo_seccion('ofertas_puntos', firma, lambda: graficos.ofertas_vs_monto(
+            motor.datos(consulta, ['nog', 'numero_ofertas', 'monto_adjudicado', 'tipo_proyecto'])
+            .dropna(subset=['numero_ofertas', 'monto_adjudicado'])
+        ))
+    evento = st.plotly_chart(fig, use_container_width=True, on_select='rerun', selection_mode='points',
+                             key='ofertas_densidad' if densidad else 'ofertas_puntos')
+    t_ofertas.detener(filas_salida=len(bins) if densidad else puntos)
+
+    seleccion = evento.selection.points if evento else []
+    if not seleccion:
+        st.caption("👆 Seleccione un punto (o una celda) para ver el detalle de esas licitaciones")
+        return
+    if densidad:
+        detalle = consulta_celda(consulta, *seleccion[0]['customdata'])
+    else:
+        detalle = consulta.con(('nog', 'in', [p['customdata'][0] for p in seleccion]))
+    tabla_paginada(motor.fuente(detalle), COLUMNAS_DETALLE_OFERTAS, {'monto_adjudicado': 'Q{:,.2f}'},
+                   clave='detalle_ofertas')
+
+seccion_ofertas(motor, consulta, resumen['total'])
 
 
 # ============================================
@@ -280,193 +396,120 @@ if not df_ofertas.empty:
 # ============================================
 st.header("🗺️ Visualización Geográfica de Licitaciones")
 
-try:
+VISTAS_MAPA = {
+    "📍 Mapa de Licitaciones": 'licitaciones',
+    "🔥 Mapa de Calor": 'calor',
+    "💰 Mapa de Montos": 'montos',
+}
+
+@st.fragment
+def seccion_mapas(motor, consulta):
+    """Solo se construye el mapa elegido; cambiar de mapa re-ejecuta este bloque"""
     import folium
-    from streamlit_folium import folium_static
-    from folium.plugins import MarkerCluster, HeatMap
-    
+    from streamlit.components.v1 import html as mostrar_html
+
+    from mapas import (
+        COLUMNAS_MAPA, agregar_coordenadas, centro_ponderado, html_mapa, mapa_calor, mapa_coropletico,
+        mapa_licitaciones, mapa_montos
+    )
+    from geometria import capa_limites
+
+    firma = firma_seccion(motor.version, consulta.firma())
+    por_depto = memo_seccion('mapa_deptos', firma, lambda: motor.agrupar('departamento', consulta))
+
     # NOTA: Tus datos de licitaciones NO tienen coordenadas (LATITUD/LONGITUD)
-    # Por lo tanto, usamos centroides por departamento para ubicar las licitaciones
-    
-    # Cargar coordenadas de departamentos (puedes crear un archivo con las coordenadas de cada departamento)
-    # Si no tienes coordenadas, usamos centroides aproximados
-    coordenadas_departamentos = {
-        'Guatemala': [14.6349, -90.5069],
-        'Sacatepéquez': [14.5547, -90.7333],
-        'Chimaltenango': [14.6604, -90.8215],
-        'Escuintla': [14.3012, -90.7852],
-        'Santa Rosa': [14.1646, -90.2852],
-        'Sololá': [14.7483, -91.1858],
-        'Totonicapán': [14.9124, -91.3611],
-        'Quetzaltenango': [14.8348, -91.5184],
-        'Suchitepéquez': [14.5358, -91.4839],
-        'Retalhuleu': [14.5341, -91.6787],
-        'San Marcos': [14.9657, -91.7951],
-        'Huehuetenango': [15.3192, -91.4724],
-        'Quiché': [15.0304, -91.1484],
-        'Baja Verapaz': [15.1322, -90.3761],
-        'Alta Verapaz': [15.4865, -90.3273],
-        'Petén': [16.9064, -89.9315],
-        'Izabal': [15.6868, -88.8704],
-        'Zacapa': [14.9781, -89.5283],
-        'Chiquimula': [14.8003, -89.5442],
-        'Jalapa': [14.6347, -89.9867],
-        'Jutiapa': [14.2905, -89.8919],
-        'El Progreso': [14.8571, -90.0795]
-    }
-    
-    # Crear coordenadas para las licitaciones basadas en su departamento
-    licitaciones_con_coords = df_filtrado.copy()
-    
-    # Agregar coordenadas según departamento
-    def get_coords(departamento):
-        if departamento in coordenadas_departamentos:
-            return coordenadas_departamentos[departamento]
+    # Por lo tanto, usamos centroides por departamento (join vectorizado en mapas.py)
+    centro = centro_ponderado(por_depto)
+    if centro is None:
+        st.info("ℹ️ No hay licitaciones con departamento asignado para mostrar en el mapa")
+        return
+
+    vista = st.radio("Mapa", list(VISTAS_MAPA), horizontal=True, label_visibility='collapsed', key='vista_mapa')
+    t_mapa = perfilador().cronometro(f"mapa_{VISTAS_MAPA[vista]}", filas_entrada=int(por_depto['Cantidad'].sum()))
+
+    if VISTAS_MAPA[vista] == 'licitaciones':
+        st.subheader("📍 Ubicación de Licitaciones por Departamento")
+
+        def construir_marcadores():
+            licitaciones_con_coords = agregar_coordenadas(motor.datos(consulta, COLUMNAS_MAPA))
+            return html_mapa(mapa_licitaciones(licitaciones_con_coords, centro)), len(licitaciones_con_coords)
+
+        # Los marcadores viajan como un arreglo compacto y se dibujan en el navegador
+        html, mapeadas = memo_seccion('mapa_licitaciones', firma, construir_marcadores)
+        t_mapa.registro['filas_salida'] = mapeadas
+        mostrar_html(html, width=1200, height=610)
+
+        # Estadísticas
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Licitaciones mapeadas", mapeadas)
+        with col2:
+            st.metric("Total licitaciones", int(por_depto['Cantidad'].sum()))
+
+    elif VISTAS_MAPA[vista] == 'calor':
+        st.subheader("🔥 Mapa de Calor - Densidad de Licitaciones por Departamento")
+
+        # Un punto por ubicación con el monto como peso (no se repiten coordenadas)
+        html = memo_seccion('mapa_calor', firma, lambda: html_mapa(
+            mapa_calor(agregar_coordenadas(motor.datos(consulta, COLUMNAS_MAPA)), centro)
+        ))
+        mostrar_html(html, width=1200, height=610)
+
+        # Top departamentos por cantidad de licitaciones
+        st.subheader("🏙️ Top 10 Departamentos con más licitaciones")
+        fig_top = memo_seccion('top_deptos', firma, lambda: graficos.top_departamentos(por_depto))
+        st.plotly_chart(fig_top, use_container_width=True)
+
+    else:
+        nivel = st.radio("Nivel", ['departamento', 'municipio'], format_func=str.capitalize,
+                         horizontal=True, key='nivel_montos')
+        st.subheader(f"💰 Mapa de Montos por {nivel.capitalize()}")
+
+        if nivel == 'municipio':
+            montos = memo_seccion('montos_municipio', firma,
+                                  lambda: motor.agrupar_por(['departamento', 'municipio'], consulta))
         else:
-            return [15.5, -90.25]  # Centro aproximado de Guatemala
-    
-    licitaciones_con_coords['LATITUD'] = licitaciones_con_coords['departamento'].apply(
-        lambda x: get_coords(x)[0] if pd.notna(x) else None
-    )
-    licitaciones_con_coords['LONGITUD'] = licitaciones_con_coords['departamento'].apply(
-        lambda x: get_coords(x)[1] if pd.notna(x) else None
-    )
-    
-    # Eliminar filas sin coordenadas
-    licitaciones_con_coords = licitaciones_con_coords.dropna(subset=['LATITUD', 'LONGITUD'])
-    
-    if len(licitaciones_con_coords) > 0:
-        center_lat = licitaciones_con_coords['LATITUD'].mean()
-        center_lon = licitaciones_con_coords['LONGITUD'].mean()
-        
-        tab1, tab2, tab3 = st.tabs(["📍 Mapa de Licitaciones", "🔥 Mapa de Calor", "💰 Mapa de Montos"])
-        
-        with tab1:
-            st.subheader("📍 Ubicación de Licitaciones por Departamento")
-            
-            m = folium.Map(location=[center_lat, center_lon], zoom_start=8, control_scale=True)
-            marker_cluster = MarkerCluster().add_to(m)
-            
-            # Definir colores según estatus
-            status_colors = {
-                'Adjudicado': 'green',
-                'Evaluacion': 'orange',
-                'En Proceso': 'blue',
-                'Finalizado': 'purple'
-            }
-            
-            for _, row in licitaciones_con_coords.iterrows():
-                color = status_colors.get(row['estatus'], 'gray')
-                
-                popup = f"""
-                <div style="font-family: monospace; min-width: 280px;">
-                    <b style="font-size: 14px;">NOG: {row['nog']}</b><br>
-                    <hr style="margin: 5px 0;">
-                    <b>Descripción:</b> {row['descripcion'][:100]}...<br>
-                    <b>Ubicación:</b> {row['municipio']}, {row['departamento']}<br>
-                    <b>Tipo:</b> {row['tipo_proyecto']}<br>
-                    <b>Monto:</b> Q{row['monto_adjudicado']:,.2f}<br>
-                    <b>Proveedor:</b> {row['proveedor_ganador']}<br>
-                    <b>Ofertas:</b> {row['numero_ofertas']}<br>
-                    <b>Estatus:</b> {row['estatus']}<br>
-                    <b>Adjudicación:</b> {row['fecha_adjudicacion'].strftime('%d/%m/%Y') if pd.notna(row['fecha_adjudicacion']) else 'N/A'}
-                </div>
-                """
-                
-                folium.Marker(
-                    location=[row['LATITUD'], row['LONGITUD']],
-                    popup=folium.Popup(popup, max_width=350),
-                    tooltip=f"NOG: {row['nog']} - {row['proveedor_ganador']}",
-                    icon=folium.Icon(color=color, icon='info-sign', prefix='glyphicon')
-                ).add_to(marker_cluster)
-            
-            folium_static(m, width=1200, height=600)
-            
-            # Estadísticas
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Licitaciones mapeadas", len(licitaciones_con_coords))
-            with col2:
-                st.metric("Total licitaciones", len(df_filtrado))
-        
-        with tab2:
-            st.subheader("🔥 Mapa de Calor - Densidad de Licitaciones por Departamento")
-            
-            # Preparar datos ponderados por monto para el mapa de calor
-            heat_data = []
-            for _, row in licitaciones_con_coords.iterrows():
-                # Repetir coordenadas según el monto (para dar peso)
-                peso = min(int(row['monto_adjudicado'] / 100000), 50)  # Máximo 50 repeticiones
-                for _ in range(max(1, peso)):
-                    heat_data.append([row['LATITUD'], row['LONGITUD']])
-            
-            heat_map = folium.Map(location=[center_lat, center_lon], zoom_start=8)
-            HeatMap(heat_data, radius=20, blur=15, min_opacity=0.3).add_to(heat_map)
-            folium_static(heat_map, width=1200, height=600)
-            
-            # Top departamentos por cantidad de licitaciones
-            st.subheader("🏙️ Top 10 Departamentos con más licitaciones")
-            top_deptos = licitaciones_con_coords['departamento'].value_counts().head(10).reset_index()
-            top_deptos.columns = ['Departamento', 'Cantidad']
-            fig_top = px.bar(
-                top_deptos,
-                x='Cantidad',
-                y='Departamento',
-                orientation='h',
-                title="Licitaciones por Departamento",
-                color='Cantidad',
-                color_continuous_scale='Viridis'
-            )
-            st.plotly_chart(fig_top, use_container_width=True)
-        
-        with tab3:
-            st.subheader("💰 Mapa de Montos por Departamento")
-            
-            # Crear mapa coroplético con montos por departamento
-            monto_por_dep = licitaciones_con_coords.groupby('departamento')['monto_adjudicado'].sum().reset_index()
+            montos = por_depto
+        capa = capa_limites(nivel)
+
+        if capa is not None:
+            # Polígonos simplificados una vez por proceso (geometria.py); solo cambian los colores
+            def construir_coropletico():
+                mapa, faltantes = mapa_coropletico(capa, montos, centro)
+                return html_mapa(mapa), faltantes
+
+            html, faltantes = memo_seccion(f"mapa_montos_{nivel}", (firma, capa.firma), construir_coropletico)
+            mostrar_html(html, width=1200, height=610)
+            if faltantes:
+                st.caption(f"⚠️ {len(faltantes)} zonas con licitaciones sin polígono en el archivo de límites: "
+                           + ', '.join(f.replace('|', ' / ') for f in faltantes[:10]) + ('…' if len(faltantes) > 10 else ''))
+        else:
+            # Sin archivo de límites: círculos con tamaño según monto por departamento
+            if nivel == 'municipio':
+                st.info("ℹ️ No hay límites municipales (geodatos/municipios.geojson); "
+                        "se muestran los montos por departamento")
+            monto_por_dep = por_depto[['departamento', 'monto_adjudicado']]
             monto_por_dep.columns = ['Departamento', 'Monto_Total']
-            
-            # Crear mapa de colores
-            m_choropleth = folium.Map(location=[center_lat, center_lon], zoom_start=7)
-            
-            # Crear un GeoJSON simple para los departamentos (usando coordenadas de los centroides)
-            # Nota: Para un mapa coroplético más preciso, necesitarías un archivo GeoJSON de departamentos
-            # Por ahora, usamos marcadores con tamaño según monto
-            
-            for _, row in monto_por_dep.iterrows():
-                if row['Departamento'] in coordenadas_departamentos:
-                    coords = coordenadas_departamentos[row['Departamento']]
-                    monto = row['Monto_Total']
-                    
-                    # Tamaño del círculo según el monto
-                    radius = max(5, min(int(monto / 50000), 40))
-                    
-                    folium.CircleMarker(
-                        location=coords,
-                        radius=radius,
-                        popup=f"<b>{row['Departamento']}</b><br>Monto: Q{monto:,.2f}",
-                        tooltip=f"{row['Departamento']}: Q{monto:,.2f}",
-                        color='blue',
-                        fill=True,
-                        fillColor='blue',
-                        fillOpacity=0.5
-                    ).add_to(m_choropleth)
-            
-            folium_static(m_choropleth, width=1200, height=600)
-            
-            # Tabla de montos por departamento
-            st.subheader("📊 Resumen de Montos por Departamento")
-            monto_por_dep_sorted = monto_por_dep.sort_values('Monto_Total', ascending=False)
-            st.dataframe(
-                monto_por_dep_sorted.style.format({
-                    'Monto_Total': 'Q{:,.2f}'
-                }),
-                use_container_width=True
-            )
-    
-    else:
-        st.info("ℹ️ No hay licitaciones con departamento asignado para mostrar en el mapa")
-        
+            html = memo_seccion('mapa_montos', firma, lambda: html_mapa(mapa_montos(monto_por_dep, centro)))
+            mostrar_html(html, width=1200, height=610)
+
+        # Tabla de montos por zona
+        st.subheader(f"📊 Resumen de Montos por {nivel.capitalize()}")
+        columnas_resumen = ['departamento', 'municipio'] if nivel == 'municipio' else ['departamento']
+        resumen_montos = montos[columnas_resumen + ['Cantidad', 'monto_adjudicado']]
+        resumen_montos.columns = [c.capitalize() for c in columnas_resumen] + ['Cantidad', 'Monto_Total']
+        tabla_paginada(
+            FuenteDataFrame(resumen_montos.sort_values('Monto_Total', ascending=False)),
+            list(resumen_montos.columns),
+            {'Monto_Total': 'Q{:,.2f}'},
+            clave=f"resumen_{nivel}"
+        )
+        t_mapa.registro['filas_salida'] = len(montos)
+
+    t_mapa.detener()
+
+try:
+    seccion_mapas(motor, consulta)
 except ImportError as e:
     st.warning(f"⚠️ Librerías de mapas no instaladas: {e}")
     st.info("📌 Para instalar: pip install folium streamlit-folium")
@@ -484,21 +527,25 @@ columnas_mostrar = [
     'numero_ofertas', 'fecha_adjudicacion'
 ]
 
-columnas_existentes = [col for col in columnas_mostrar if col in df_filtrado.columns]
+columnas_existentes = [col for col in columnas_mostrar if col in motor.columnas()]
 
-busqueda = st.text_input("🔍 Buscar por descripción o NOG:", "")
+busqueda = st.text_input("🔍 Buscar por descripción, entidad, proveedor o NOG:", "")
 if busqueda:
-    df_filtrado = df_filtrado[
-        df_filtrado['descripcion'].str.contains(busqueda, case=False, na=False) |
-        df_filtrado['nog'].astype(str).str.contains(busqueda, case=False, na=False)
-    ]
+    consulta = consulta.con_busqueda(busqueda)
 
-st.dataframe(
-    df_filtrado[columnas_existentes].style.format({
+with perfil.seccion('busqueda' if busqueda else 'filas_detalle', filas_entrada=resumen['total']) as registro:
+    fuente_detalle = motor.fuente(consulta)
+    registro['filas_salida'] = fuente_detalle.total
+
+# Solo se formatea y envía la página visible; el motor resuelve orden y página
+tabla_paginada(
+    fuente_detalle,
+    columnas_existentes,
+    {
         'monto_adjudicado': 'Q{:,.2f}',
         'numero_ofertas': '{:.0f}'
-    }),
-    use_container_width=True,
+    },
+    clave='detalle',
     height=400
 )
 
@@ -506,22 +553,27 @@ st.dataframe(
 # ALERTAS
 # ============================================
 st.subheader("⚠️ Alertas")
+t_alertas = perfil.cronometro('alertas', filas_entrada=resumen['total'])
 
-# Licitaciones con una sola oferta
-ofertas_unicas = df_filtrado[df_filtrado['numero_ofertas'] == 1]
-if len(ofertas_unicas) > 0:
-    st.warning(f"🚨 {len(ofertas_unicas)} licitaciones con solo una oferta")
-    with st.expander("Ver detalles"):
-        st.dataframe(ofertas_unicas[['nog', 'descripcion', 'monto_adjudicado', 'proveedor_ganador']])
+# Las reglas (alertas.REGLAS) se evalúan una vez por versión del dataset; aquí
+# solo se cuentan las licitaciones marcadas que cumplen los filtros
+conteos_alertas = motor.contar_alertas(consulta)
+alertas_activas = [regla for regla in REGLAS if conteos_alertas[regla.nombre] > 0]
+for regla in alertas_activas:
+    mostrar_alerta = st.warning if regla.nivel == 'warning' else st.info
+    mostrar_alerta(regla.mensaje.format(n=conteos_alertas[regla.nombre]))
 
-# Licitaciones con estatus "Evaluacion" o "En Proceso" antiguas
-fecha_limite = datetime.now() - pd.Timedelta(days=90)
-licitaciones_pendientes = df_filtrado[
-    (df_filtrado['estatus'].isin(['Evaluacion', 'En Proceso'])) &
-    (df_filtrado['fecha_adjudicacion'] < fecha_limite)
-]
-if len(licitaciones_pendientes) > 0:
-    st.info(f"📋 {len(licitaciones_pendientes)} licitaciones en proceso por más de 90 días")
+if alertas_activas:
+    with st.expander("Ver detalles"):
+        nombre_regla = st.selectbox("Alerta", [r.nombre for r in alertas_activas],
+                                    format_func=lambda n: REGLAS_POR_NOMBRE[n].etiqueta, key='alerta_detalle')
+        tabla_paginada(
+            motor.fuente(consulta.con_alerta(nombre_regla)),
+            ['nog', 'descripcion', 'entidad', 'monto_adjudicado', 'proveedor_ganador'],
+            {'monto_adjudicado': 'Q{:,.2f}'},
+            clave=f"alerta_{nombre_regla}"
+        )
+t_alertas.detener(filas_salida=sum(conteos_alertas.values()))
 
 # ============================================
 # EXPORTAR
@@ -529,33 +581,51 @@ if len(licitaciones_pendientes) > 0:
 st.sidebar.markdown("---")
 st.sidebar.subheader("📥 Exportar")
 
-if st.sidebar.button("Exportar a CSV"):
-    csv = df_filtrado.to_csv(index=False)
-    st.sidebar.download_button(
-        label="Descargar",
-        data=csv,
-        file_name=f"licitaciones_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
-    )
+formato_exportacion = st.sidebar.selectbox("Formato", list(FORMATOS))
+extension, mime = FORMATOS[formato_exportacion]
+
+# El archivo se genera por bloques solo al pulsar "Descargar" y queda en caché
+# para la misma combinación de filtros; el botón lee el archivo abierto de la caché
+def generar_exportacion():
+    with perfil.seccion(f"exportar_{extension}", filas_entrada=resumen['total']):
+        return motor.exportar(consulta, extension)
+
+st.sidebar.download_button(
+    label="Descargar",
+    data=generar_exportacion,
+    file_name=f"licitaciones_{datetime.now().strftime('%Y%m%d')}.{extension}",
+    mime=mime
+)
 
 # ============================================
 # INFORMACIÓN
 # ============================================
+# Con búsqueda activa el resumen se recalcula sobre las filas encontradas
+resumen_info = motor.resumen(consulta) if busqueda else resumen
+
 with st.expander("ℹ️ Información del Dashboard"):
     st.markdown(f"""
     **Resumen General:**
-    - Total licitaciones: {len(df_filtrado)}
-    - Monto total: Q{df_filtrado['monto_adjudicado'].sum():,.2f}
-    - Monto promedio: Q{df_filtrado['monto_adjudicado'].mean():,.2f}
-    - Proveedores distintos: {df_filtrado['proveedor_ganador'].nunique()}
-    - Departamentos: {df_filtrado['departamento'].nunique()}
-    - Regiones: {df_filtrado['region'].nunique()}
+    - Total licitaciones: {resumen_info['total']}
+    - Monto total: Q{resumen_info['monto_total']:,.2f}
+    - Monto promedio: Q{resumen_info['monto_promedio']:,.2f}
+    - Desviación estándar: Q{resumen_info['monto_desviacion']:,.2f}
+    - Proveedores distintos: {resumen_info['proveedores']}
+    - Departamentos: {resumen_info['departamentos']}
+    - Regiones: {resumen_info['regiones']}
     
     **Columnas disponibles:**
     - NOG, Descripción, Región, Departamento, Municipio
     - Tipo de Proyecto, Estatus, Monto Adjudicado
     - Proveedor Ganador, Número de Ofertas, Fechas
     """)
+    cache = cache_renderizados()
+    st.caption(
+        f"Caché de figuras y mapas: {len(cache)} entradas · {cache.bytes / 2**20:,.1f} MB · "
+        f"{cache.aciertos} aciertos / {cache.fallos} fallos"
+    )
 
 st.markdown("---")
 st.markdown(f"📅 Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+perfil.panel()
@@ -0,0 +1,236 @@
+# indices.py
+"""Índice de bitmaps para la cadena de filtros del sidebar"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Dimensiones de filtro, en el orden de la cascada del sidebar
+DIMENSIONES = ['año_adjudicacion', 'region', 'departamento', 'tipo_proyecto', 'estatus']
+COLUMNA_MONTO = 'monto_adjudicado'
+
+
+def contar_bits(bitmap):
+    """Número de bits encendidos en un bitmap empaquetado"""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bitmap).sum())
+    return int(np.unpackbits(bitmap).sum())
+
+
+def codificar(serie):
+    """Códigos enteros (-1 = nulo) y valores ordenados de una columna"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy().astype(np.int32), np.asarray(serie.cat.categories)
+    codigos, valores = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int32), np.asarray(valores)
+
+
+class IndiceFiltros:
+    """Bitmaps por valor de cada dimensión y montos ordenados.
+
+    Se construye una vez al cargar los datos. Los filtros y las opciones de
+    cada widget se resuelven con AND/OR de bitmaps empaquetados (1 bit por
+    fila) en lugar de recorrer las columnas en cada rerun. Tras un upsert,
+    ``actualizar`` re-indexa solo las filas afectadas.
+    """
+
+    def __init__(self, df, dimensiones=DIMENSIONES, col_monto=COLUMNA_MONTO):
+        self.n = len(df)
+        self.dimensiones = [d for d in dimensiones if d in df.columns]
+        self.col_monto = col_monto
+        self.codigos = {}
+        self.valores = {}
+        self.posiciones = {}
+        self.bitmaps = {}
+        for dim in self.dimensiones:
+            self._indexar_dimension(dim, df[dim])
+        self._indexar_monto(df[col_monto].to_numpy(dtype=float))
+
+    def _indexar_dimension(self, dim, serie):
+        codigos, valores = codificar(serie)
+        if dim == 'año_adjudicacion':
+            valores = valores.astype(int)
+        self.codigos[dim] = codigos
+        self.valores[dim] = valores
+        self.posiciones[dim] = {v: k for k, v in enumerate(valores.tolist())}
+
+        # Una fila de bits por valor: bitmaps[dim][k] marca las filas con el valor k
+        self.bitmaps[dim] = np.stack([np.packbits(codigos == k) for k in range(len(valores))]) \
+            if len(valores) else np.zeros((0, self._bytes()), dtype=np.uint8)
+
+    def _indexar_monto(self, montos):
+        validas = np.flatnonzero(~np.isnan(montos))
+        orden = np.argsort(montos[validas], kind='stable')
+        self.orden_monto = validas[orden]
+        self.montos_ordenados = montos[self.orden_monto]
+
+    def _bytes(self):
+        return (self.n + 7) // 8
+
+    def _empaquetar(self, filas):
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[filas] = True
+        return np.packbits(mascara)
+
+    def codigos_de(self, dim, seleccion):
+        """Códigos de los valores seleccionados (los desconocidos se ignoran)"""
+        posiciones = self.posiciones[dim]
+        return [posiciones[v] for v in seleccion if v in posiciones]
+
+    # ----------------------------------------
+    # Actualización incremental
+    # ----------------------------------------
+    def _codificar_valores(self, dim, valores):
+        """Códigos para ``valores``; los valores nuevos se agregan al final"""
+        codigos = np.full(len(valores), -1, dtype=np.int32)
+        nulos = pd.isna(valores)
+        for valor in pd.unique(valores[~nulos]):
+            clave = int(valor) if dim == 'año_adjudicacion' else valor
+            if clave not in self.posiciones[dim]:
+                self.posiciones[dim][clave] = len(self.valores[dim])
+                self.valores[dim] = np.append(self.valores[dim], np.asarray([clave], dtype=self.valores[dim].dtype))
+                self.bitmaps[dim] = np.vstack([self.bitmaps[dim], np.zeros((1, self.bitmaps[dim].shape[1]), np.uint8)])
+            codigos[~nulos & (valores == valor)] = self.posiciones[dim][clave]
+        return codigos
+
+    def actualizar(self, df, filas):
+        """Re-indexa ``filas`` (reemplazadas o agregadas al final de ``df``)"""
+        filas = np.asarray(filas, dtype=np.int64)
+        n_anterior = self.n
+        self.n = len(df)
+        bits = (0x80 >> (filas & 7)).astype(np.uint8)
+        bytes_fila = filas >> 3
+
+        for dim in self.dimensiones:
+            codigos = np.concatenate([self.codigos[dim], np.full(self.n - n_anterior, -1, dtype=np.int32)])
+            nuevos = self._codificar_valores(dim, df[dim].to_numpy(dtype=object)[filas])
+            bitmaps = self.bitmaps[dim]
+            if bitmaps.shape[1] < self._bytes():
+                bitmaps = np.pad(bitmaps, ((0, 0), (0, self._bytes() - bitmaps.shape[1])))
+
+            # Apagar el bit del valor anterior y encender el del nuevo
+            viejos = codigos[filas]
+            con_viejo = viejos >= 0
+            np.bitwise_and.at(bitmaps, (viejos[con_viejo], bytes_fila[con_viejo]), ~bits[con_viejo])
+            con_nuevo = nuevos >= 0
+            np.bitwise_or.at(bitmaps, (nuevos[con_nuevo], bytes_fila[con_nuevo]), bits[con_nuevo])
+
+            codigos[filas] = nuevos
+            self.codigos[dim] = codigos
+            self.bitmaps[dim] = bitmaps
+
+        # Sacar las filas afectadas del orden de montos y reinsertarlas
+        montos = df[self.col_monto].to_numpy(dtype=float)
+        conservar = ~np.isin(self.orden_monto, filas)
+        orden, ordenados = self.orden_monto[conservar], self.montos_ordenados[conservar]
+        nuevas = filas[~np.isnan(montos[filas])]
+        nuevas = nuevas[np.argsort(montos[nuevas], kind='stable')]
+        posiciones = np.searchsorted(ordenados, montos[nuevas], side='right')
+        self.orden_monto = np.insert(orden, posiciones, nuevas)
+        self.montos_ordenados = np.insert(ordenados, posiciones, montos[nuevas])
+
+    # ----------------------------------------
+    # Operaciones sobre bitmaps
+    # ----------------------------------------
+    def todas(self):
+        """Bitmap con todas las filas"""
+        return self._empaquetar(slice(None))
+
+    def filtrar(self, dim, seleccion, bitmap=None):
+        """Filas cuyo valor de ``dim`` está en ``seleccion`` (AND con ``bitmap``)"""
+        codigos = self.codigos_de(dim, seleccion)
+        if codigos:
+            resultado = np.bitwise_or.reduce(self.bitmaps[dim][codigos], axis=0)
+        else:
+            resultado = np.zeros(self._bytes(), dtype=np.uint8)
+        return resultado if bitmap is None else resultado & bitmap
+
+    def opciones(self, dim, bitmap):
+        """Valores de ``dim`` presentes en las filas del bitmap, ordenados"""
+        presentes = (self.bitmaps[dim] & bitmap).any(axis=1)
+        return sorted(self.valores[dim][presentes].tolist())
+
+    def rango_monto(self, bitmap):
+        """(mín, máx) del monto dentro del bitmap, o None si no hay montos"""
+        bits = np.unpackbits(bitmap, count=self.n).view(bool)[self.orden_monto]
+        if not bits.any():
+            return None
+        primero = int(np.argmax(bits))
+        ultimo = len(bits) - 1 - int(np.argmax(bits[::-1]))
+        return float(self.montos_ordenados[primero]), float(self.montos_ordenados[ultimo])
+
+    def filtrar_monto(self, minimo, maximo, bitmap=None):
+        """Filas con ``minimo <= monto <= maximo`` vía búsqueda binaria"""
+        inicio = np.searchsorted(self.montos_ordenados, minimo, side='left')
+        fin = np.searchsorted(self.montos_ordenados, maximo, side='right')
+        resultado = self._empaquetar(self.orden_monto[inicio:fin])
+        return resultado if bitmap is None else resultado & bitmap
+
+    def filas(self, bitmap):
+        """Posiciones de las filas encendidas en el bitmap"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n))
+
+    def contar(self, bitmap):
+        return contar_bits(bitmap)
+
+
+class OrdenesTabla:
+    """Orden precalculado (nulos al final) de cada columna ordenable.
+
+    ``rangos[col][fila]`` es la posición de la fila en el orden ascendente;
+    ordenar un subconjunto de filas es entonces ordenar enteros, o recorrer el
+    orden global si el subconjunto es grande. Tras un upsert cada columna se
+    vuelve a ordenar solo cuando se pide por primera vez.
+    """
+
+    def __init__(self, df, columnas):
+        self.n = len(df)
+        self.ordenes = {}
+        self.rangos = {}
+        self.validos = {}
+        self._df = None
+        self._vigentes = set()
+        self._lock = threading.Lock()  # Dos lecturas pueden pedir la misma columna vencida
+        for col in columnas:
+            if col in df.columns:
+                self._ordenar_columna(col, df[col])
+
+    def _ordenar_columna(self, col, serie):
+        serie = serie.reset_index(drop=True)
+        orden = serie.sort_values(kind='stable', na_position='last').index.to_numpy()
+        rango = np.empty(self.n, dtype=np.int64)
+        rango[orden] = np.arange(self.n)
+        self.ordenes[col] = orden
+        self.rangos[col] = rango
+        self.validos[col] = int(serie.notna().sum())
+
+    def actualizar(self, df, filas):
+        """Marca todos los órdenes como vencidos tras modificar ``filas``"""
+        self.n = len(df)
+        self._df = df
+        self._vigentes = set()
+
+    def _asegurar(self, col):
+        with self._lock:
+            if self._df is not None and col not in self._vigentes:
+                self._ordenar_columna(col, self._df[col])
+                self._vigentes.add(col)
+
+    def ordenar(self, filas, col, ascendente=True):
+        """``filas`` reordenadas por ``col`` (los nulos siempre al final)"""
+        self._asegurar(col)
+        validos = self.validos[col]
+        if len(filas) * 16 < self.n:
+            rango = self.rangos[col]
+            if not ascendente:
+                rango = np.where(rango < validos, validos - 1 - rango, rango)
+            return filas[np.argsort(rango[filas], kind='stable')]
+
+        # Subconjunto grande: se recorre el orden global sin ordenar nada
+        orden = self.ordenes[col]
+        if not ascendente:
+            orden = np.concatenate([orden[:validos][::-1], orden[validos:]])
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[filas] = True
+        return orden[mascara[orden]]
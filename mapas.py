@@ -0,0 +1,296 @@
+# mapas.py
+"""Preparación de datos y construcción de los mapas de licitaciones"""
+import numpy as np
+import pandas as pd
+
+from indices import codificar
+from territorio import COORDENADAS_DEPARTAMENTOS, plegar_nombre
+
+
+CENTRO_GUATEMALA = [15.5, -90.25]  # Para departamentos desconocidos
+
+STATUS_COLORS = {
+    'Adjudicado': 'green',
+    'Evaluacion': 'orange',
+    'En Proceso': 'blue',
+    'Finalizado': 'purple'
+}
+
+
+# Tabla de coordenadas indexada por nombre normalizado
+TABLA_COORDENADAS = pd.DataFrame(
+    list(COORDENADAS_DEPARTAMENTOS.values()),
+    index=[plegar_nombre(d) for d in COORDENADAS_DEPARTAMENTOS],
+    columns=['LATITUD', 'LONGITUD'],
+)
+
+
+def _coordenadas_de(departamentos):
+    """Centroide de cada departamento (el centro del país si no se conoce)"""
+    coords = TABLA_COORDENADAS.reindex([plegar_nombre(v) for v in departamentos])
+    return coords.fillna({'LATITUD': CENTRO_GUATEMALA[0], 'LONGITUD': CENTRO_GUATEMALA[1]}).to_numpy()
+
+
+def agregar_coordenadas(df, columna='departamento'):
+    """Agrega LATITUD/LONGITUD con un solo join contra la tabla de centroides.
+
+    La búsqueda se hace una vez por valor distinto de ``columna`` y se expande
+    a las filas por código. Las filas sin departamento se descartan.
+    """
+    codigos, valores = codificar(df[columna])
+    coords = _coordenadas_de(valores)
+
+    con_depto = codigos >= 0
+    resultado = df[con_depto].copy()
+    if len(coords):
+        resultado['LATITUD'] = coords[codigos[con_depto], 0]
+        resultado['LONGITUD'] = coords[codigos[con_depto], 1]
+    else:
+        resultado['LATITUD'] = np.nan
+        resultado['LONGITUD'] = np.nan
+    return resultado
+
+
+# ============================================
+# MAPA DE LICITACIONES (marcadores en el cliente)
+# ============================================
+# Columnas que se piden al motor para los mapas de licitaciones y de calor
+COLUMNAS_MAPA = [
+    'nog', 'descripcion', 'municipio', 'departamento', 'tipo_proyecto', 'monto_adjudicado',
+    'proveedor_ganador', 'numero_ofertas', 'estatus', 'fecha_adjudicacion'
+]
+
+# Orden de los campos de cada fila que recibe el navegador
+CAMPOS_MARCADOR = ['LATITUD', 'LONGITUD', 'nog', 'descripcion', 'municipio', 'departamento',
+                   'tipo_proyecto', 'monto_adjudicado', 'proveedor_ganador', 'numero_ofertas',
+                   'estatus', 'fecha_adjudicacion', 'color']
+
+# El popup y el tooltip se generan en JS solo al abrirlos
+CALLBACK_MARCADOR = """
+function (row) {
+    function esc(v) {
+        if (v === null || v === undefined) { return 'N/A'; }
+        return String(v).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+    function quetzales(v) {
+        if (v === null) { return 'N/A'; }
+        return 'Q' + Number(v).toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
+    var icon = L.AwesomeMarkers.icon({icon: 'info-sign', prefix: 'glyphicon', markerColor: row[12]});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindTooltip(function () { return 'NOG: ' + esc(row[2]) + ' - ' + esc(row[8]); });
+    marker.bindPopup(function () {
+        return '<div style="font-family: monospace; min-width: 280px;">' +
+            '<b style="font-size: 14px;">NOG: ' + esc(row[2]) + '</b><br>' +
+            '<hr style="margin: 5px 0;">' +
+            '<b>Descripción:</b> ' + esc(row[3]) + '...<br>' +
+            '<b>Ubicación:</b> ' + esc(row[4]) + ', ' + esc(row[5]) + '<br>' +
+            '<b>Tipo:</b> ' + esc(row[6]) + '<br>' +
+            '<b>Monto:</b> ' + quetzales(row[7]) + '<br>' +
+            '<b>Proveedor:</b> ' + esc(row[8]) + '<br>' +
+            '<b>Ofertas:</b> ' + esc(row[9]) + '<br>' +
+            '<b>Estatus:</b> ' + esc(row[10]) + '<br>' +
+            '<b>Adjudicación:</b> ' + esc(row[11]) +
+            '</div>';
+    }, {maxWidth: 350});
+    return marker;
+}
+"""
+
+
+def datos_marcadores(df_coords):
+    """Arreglo compacto (una lista por licitación) para los marcadores"""
+    datos = pd.DataFrame({
+        'LATITUD': df_coords['LATITUD'].round(5),
+        'LONGITUD': df_coords['LONGITUD'].round(5),
+        'nog': df_coords['nog'],
+        'descripcion': df_coords['descripcion'].astype('string').str.slice(0, 100),
+        'municipio': df_coords['municipio'],
+        'departamento': df_coords['departamento'].astype('string'),
+        'tipo_proyecto': df_coords['tipo_proyecto'].astype('string'),
+        'monto_adjudicado': df_coords['monto_adjudicado'].round(2),
+        'proveedor_ganador': df_coords['proveedor_ganador'],
+        'numero_ofertas': df_coords['numero_ofertas'],
+        'estatus': df_coords['estatus'].astype('string'),
+        'fecha_adjudicacion': df_coords['fecha_adjudicacion'].dt.strftime('%d/%m/%Y'),
+        'color': df_coords['estatus'].astype('string').map(STATUS_COLORS).fillna('gray'),
+    }, columns=CAMPOS_MARCADOR)
+    # NaN/NA -> None para que viajen como null en el JSON
+    datos = datos.astype(object).where(datos.notna(), None)
+    return datos.to_numpy().tolist()
+
+
+def mapa_licitaciones(df_coords, centro):
+    """Mapa con los marcadores agrupados y renderizados en el navegador"""
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    m = folium.Map(location=centro, zoom_start=8, control_scale=True)
+    FastMarkerCluster(datos_marcadores(df_coords), callback=CALLBACK_MARCADOR).add_to(m)
+    return m
+
+
+# ============================================
+# MAPA DE CALOR (un punto ponderado por ubicación)
+# ============================================
+def datos_calor(df_coords):
+    """[lat, lon, peso] por ubicación distinta.
+
+    El peso de cada licitación es el de siempre (1 por cada Q100,000, entre 1
+    y 50), sumado por ubicación y normalizado a [0, 1] para que Leaflet.heat
+    no sature todas las ubicaciones por igual.
+    """
+    pesos = (df_coords['monto_adjudicado'].fillna(0).to_numpy() // 100000).clip(1, 50)
+    por_ubicacion = (
+        pd.DataFrame({
+            'LATITUD': df_coords['LATITUD'].to_numpy(),
+            'LONGITUD': df_coords['LONGITUD'].to_numpy(),
+            'peso': pesos,
+        })
+        .groupby(['LATITUD', 'LONGITUD'], sort=False)['peso'].sum()
+        .reset_index()
+    )
+    if por_ubicacion.empty:
+        return []
+    por_ubicacion['peso'] = por_ubicacion['peso'] / por_ubicacion['peso'].max()
+    return por_ubicacion.to_numpy().tolist()
+
+
+def mapa_calor(df_coords, centro):
+    """Mapa de calor con pesos nativos de Leaflet.heat"""
+    import folium
+    from folium.plugins import HeatMap
+
+    heat_map = folium.Map(location=centro, zoom_start=8)
+    HeatMap(datos_calor(df_coords), radius=20, blur=15, min_opacity=0.3).add_to(heat_map)
+    return heat_map
+
+
+# ============================================
+# MAPA DE MONTOS (un círculo por departamento, sin archivo de límites)
+# ============================================
+def centro_ponderado(por_depto, columna='departamento'):
+    """Centro de las licitaciones a partir del conteo por departamento.
+
+    Da lo mismo que promediar las coordenadas de cada fila (todas las filas
+    de un departamento comparten centroide) sin traer las filas.
+    """
+    pesos = por_depto['Cantidad'].to_numpy(dtype=float)
+    if pesos.sum() == 0:
+        return None
+    return (pesos @ _coordenadas_de(por_depto[columna]) / pesos.sum()).tolist()
+
+
+def mapa_montos(monto_por_dep, centro):
+    """Círculos con radio proporcional al monto (columnas Departamento, Monto_Total)"""
+    import folium
+
+    m_choropleth = folium.Map(location=centro, zoom_start=7)
+
+    # Sin GeoJSON de departamentos (ver geometria.py) se usan marcadores con
+    # tamaño según monto
+    for _, row in monto_por_dep.iterrows():
+        clave = plegar_nombre(row['Departamento'])
+        if clave in TABLA_COORDENADAS.index:
+            coords = TABLA_COORDENADAS.loc[clave].tolist()
+            monto = row['Monto_Total']
+
+            # Tamaño del círculo según el monto
+            radius = max(5, min(int(monto / 50000), 40))
+
+            folium.CircleMarker(
+                location=coords,
+                radius=radius,
+                popup=f"<b>{row['Departamento']}</b><br>Monto: Q{monto:,.2f}",
+                tooltip=f"{row['Departamento']}: Q{monto:,.2f}",
+                color='blue',
+                fill=True,
+                fillColor='blue',
+                fillOpacity=0.5
+            ).add_to(m_choropleth)
+    return m_choropleth
+
+
+# ============================================
+# MAPA DE MONTOS (coroplético con límites reales)
+# ============================================
+# Zoom inicial de cada nivel; la geometría llega ya simplificada para
+# geometria.ZOOM_GEOMETRIA, la misma en ambos
+ZOOM_MONTOS = {'departamento': 7, 'municipio': 8}
+
+
+def unir_montos(capa, montos):
+    """{clave: propiedades} por zona y claves de los datos sin polígono.
+
+    ``montos`` trae departamento (y municipio), Cantidad y monto_adjudicado,
+    como motor.agrupar_por; varias filas con la misma clave plegada se suman.
+    """
+    municipios = montos['municipio'] if capa.nivel == 'municipio' else [None] * len(montos)
+    claves = [capa.clave(d, m) for d, m in zip(montos['departamento'], municipios)]
+    por_clave = (
+        pd.DataFrame({'clave': claves, 'Cantidad': montos['Cantidad'].to_numpy(),
+                      'monto': montos['monto_adjudicado'].to_numpy(dtype=float)})
+        .groupby('clave')[['Cantidad', 'monto']].sum()
+    )
+    valores = {
+        clave: {'monto': float(fila.monto), 'cantidad': int(fila.Cantidad), 'monto_texto': f"Q{fila.monto:,.2f}"}
+        for clave, fila in por_clave.iterrows()
+    }
+    faltantes = sorted(set(por_clave.index) - set(capa.claves))
+    return valores, faltantes
+
+
+# Capa Leaflet que recibe la FeatureCollection ya serializada (CapaLimites.geojson):
+# folium.GeoJson la volvería a parsear y a serializar en cada mapa. El estilo y
+# el tooltip de cada zona vienen en sus propiedades.
+PLANTILLA_CAPA_MONTOS = """
+{% macro script(this, kwargs) %}
+    L.geoJson({{ this.datos }}, {
+        style: function (zona) { return zona.properties.estilo; },
+        onEachFeature: function (zona, capa) {
+            var p = zona.properties;
+            capa.bindTooltip('<b>' + p.nombre + '</b><br>Monto: ' + p.monto_texto
+                             + '<br>Licitaciones: ' + p.cantidad, {sticky: true});
+        }
+    }).addTo({{ this._parent.get_name() }});
+{% endmacro %}
+"""
+
+
+def mapa_coropletico(capa, montos, centro):
+    """Polígonos coloreados por monto; devuelve (mapa, claves sin polígono)"""
+    import folium
+    from branca.colormap import LinearColormap
+    from branca.element import MacroElement, Template
+
+    zoom = ZOOM_MONTOS[capa.nivel]
+    valores, faltantes = unir_montos(capa, montos)
+    maximo = max([v['monto'] for v in valores.values()] + [1.0])
+    escala = LinearColormap(['#deebf7', '#08306b'], vmin=0, vmax=maximo, caption='Monto adjudicado (Q)')
+
+    def estilo(monto):
+        return {
+            'fillColor': escala(monto) if monto is not None else '#f0f0f0',
+            'color': '#555555',
+            'weight': 0.6,
+            'fillOpacity': 0.75 if monto is not None else 0.3,
+        }
+
+    valores = {clave: dict(v, estilo=estilo(v['monto'])) for clave, v in valores.items()}
+
+    m = folium.Map(location=centro, zoom_start=zoom)
+    zonas = MacroElement()
+    zonas._template = Template(PLANTILLA_CAPA_MONTOS)
+    zonas.datos = capa.geojson(valores, vacio={'monto_texto': 'Sin licitaciones', 'cantidad': 0, 'estilo': estilo(None)})
+    m.add_child(zonas)
+    escala.add_to(m)
+    return m, faltantes
+
+
+def html_mapa(mapa):
+    """HTML autocontenido del mapa (lo mismo que dibuja folium_static)"""
+    import folium
+
+    return folium.Figure().add_child(mapa).render()
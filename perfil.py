@@ -0,0 +1,134 @@
+# perfil.py
+"""Modo perfil opcional: tiempos, filas y memoria por sección de cada rerun
+
+Se activa solo con ``GUATECOMPRAS_PERFIL=1`` en el entorno del servidor (no
+hay parámetro de URL: tracemalloc es de todo el proceso). Cada sección medida agrega una línea a ``perfil.jsonl`` (o a la ruta de
+``GUATECOMPRAS_PERFIL_LOG``) y el rerun se resume en un panel al final de la
+página.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+
+VARIABLE_PERFIL = 'GUATECOMPRAS_PERFIL'
+ARCHIVO_PERFIL = os.environ.get('GUATECOMPRAS_PERFIL_LOG', 'perfil.jsonl')
+
+_lock_archivo = threading.Lock()
+
+
+def perfil_activo():
+    """Modo perfil pedido por variable de entorno; un visitante no lo puede encender"""
+    return os.environ.get(VARIABLE_PERFIL, '') not in ('', '0')
+
+
+def _escribir(registro, ruta=ARCHIVO_PERFIL):
+    linea = json.dumps(registro, ensure_ascii=False, default=str) + '\n'
+    with _lock_archivo:
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(linea)
+
+
+class Cronometro:
+    """Medición de una sección en curso; ``detener`` la registra"""
+
+    def __init__(self, perfilador, nombre, filas_entrada=None):
+        self.perfilador = perfilador
+        self.registro = {'seccion': nombre, 'filas_entrada': filas_entrada, 'filas_salida': None}
+        if perfilador.activo:
+            self._memoria = tracemalloc.get_traced_memory()[0]
+            self._inicio = time.perf_counter()
+
+    def detener(self, filas_salida=None):
+        if not self.perfilador.activo:
+            return
+        segundos = time.perf_counter() - self._inicio
+        actual, pico = tracemalloc.get_traced_memory()
+        if filas_salida is not None:
+            self.registro['filas_salida'] = filas_salida
+        self.registro.update({
+            'segundos': round(segundos, 4),
+            'memoria_kb': round((actual - self._memoria) / 1024, 1),
+            'pico_kb': round(max(pico - self._memoria, 0) / 1024, 1),
+        })
+        self.perfilador._agregar(self.registro)
+
+
+class Perfilador:
+    """Registros de la sesión; inactivo no mide nada ni toca tracemalloc.
+
+    Con el modo perfil encendido en el servidor tracemalloc traza todo el
+    proceso: el pico es global, así que con varias sesiones a la vez es
+    orientativo.
+    """
+
+    def __init__(self, activo):
+        self.sesion = uuid.uuid4().hex[:8]
+        self.rerun = 0
+        self.registros = []
+        self.activo = False
+        self.activar(activo)
+
+    def activar(self, activo):
+        self.activo = activo
+        if activo and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def nuevo_rerun(self):
+        self.rerun += 1
+        self.registros = []
+
+    def _agregar(self, registro):
+        registro.update({
+            'fecha': datetime.now().isoformat(timespec='milliseconds'),
+            'sesion': self.sesion,
+            'rerun': self.rerun,
+        })
+        self.registros.append(registro)
+        try:
+            _escribir(registro)
+        except OSError:
+            pass  # Sin permiso de escritura: queda solo el panel
+
+    def cronometro(self, nombre, filas_entrada=None):
+        if self.activo:
+            tracemalloc.reset_peak()
+        return Cronometro(self, nombre, filas_entrada)
+
+    @contextmanager
+    def seccion(self, nombre, filas_entrada=None):
+        """Mide el bloque; se puede fijar ``registro['filas_salida']`` dentro"""
+        cronometro = self.cronometro(nombre, filas_entrada)
+        yield cronometro.registro
+        cronometro.detener()
+
+    def panel(self):
+        """Tabla con las secciones medidas en este rerun"""
+        if not self.activo or not self.registros:
+            return
+        df = pd.DataFrame(self.registros)[
+            ['seccion', 'segundos', 'filas_entrada', 'filas_salida', 'memoria_kb', 'pico_kb']
+        ]
+        with st.expander("🐞 Perfil de este rerun", expanded=True):
+            st.dataframe(df.sort_values('segundos', ascending=False), use_container_width=True, hide_index=True)
+            st.caption(
+                f"Sesión {self.sesion} · rerun {self.rerun} · {df['segundos'].sum():.3f} s medidos · "
+                f"registro en {ARCHIVO_PERFIL}"
+            )
+
+
+def perfilador():
+    """Perfilador de la sesión actual (los fragmentos usan el mismo)"""
+    if '_perfilador' not in st.session_state:
+        st.session_state['_perfilador'] = Perfilador(perfil_activo())
+    else:
+        st.session_state['_perfilador'].activar(perfil_activo())
+    return st.session_state['_perfilador']
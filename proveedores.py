@@ -0,0 +1,281 @@
+# proveedores.py
+"""Proveedores por celda del cubo: ranking, proveedores distintos y concentración
+
+Para cada celda del cubo se guarda cuántas licitaciones ganó cada proveedor
+y por qué monto; para las dimensiones que no están en el cubo ('entidad'),
+lo mismo por (celda, valor). Filtrar por el sidebar es elegir celdas: los
+totales por proveedor salen de sumar pares ya agregados, y el top-K y el
+índice de Herfindahl-Hirschman (HHI) se calculan sobre esos totales sin
+reagrupar filas.
+"""
+import numpy as np
+import pandas as pd
+
+from cubo import ParesCelda
+from indices import COLUMNA_MONTO, codificar
+
+
+COLUMNA_PROVEEDOR = 'proveedor_ganador'
+
+# Dimensiones de la vista de concentración; las que no son del cubo llevan su propia capa
+DIMENSIONES_CONCENTRACION = ['entidad', 'departamento', 'tipo_proyecto']
+
+# HHI en escala 0-10.000 (participaciones en %): por encima de 2.500 el mercado está muy concentrado
+UMBRAL_HHI_ALTO = 2500
+
+_MASCARA_CODIGO = 0xFFFFFFFF
+
+
+def _sumar_por_clave(claves, conteo, suma):
+    """Claves distintas (ordenadas) con su conteo y suma acumulados"""
+    orden = np.argsort(claves)
+    claves = claves[orden]
+    if len(claves) == 0:
+        return claves, np.zeros(0, dtype=np.int64), np.zeros(0)
+    inicios = np.concatenate([[0], np.flatnonzero(np.diff(claves)) + 1])
+    return claves[inicios], np.add.reduceat(conteo[orden], inicios), np.add.reduceat(suma[orden], inicios)
+
+
+def _sumar_por_grupo(grupos, codigos, conteo, suma):
+    """(grupo, cantidad, monto) de cada par (grupo, proveedor) vivo, ordenados por grupo y proveedor"""
+    n_codigos = int(codigos.max()) + 1 if len(codigos) else 0
+    n_pares = (int(grupos.max()) + 1) * n_codigos if len(grupos) else 0
+    if n_pares <= max(4 * len(grupos), 1 << 16):
+        # Tabla grupo × proveedor chica: se suma en ella sin ordenar
+        posicion = grupos * n_codigos + codigos
+        cantidad = np.bincount(posicion, weights=conteo, minlength=n_pares).astype(np.int64)
+        monto = np.bincount(posicion, weights=suma, minlength=n_pares)
+        vivos = np.flatnonzero(cantidad > 0)
+        return vivos // n_codigos, cantidad[vivos], monto[vivos]
+    claves, cantidad, monto = _sumar_por_clave((grupos << 32) | codigos, conteo, suma)
+    vivos = cantidad > 0
+    return claves[vivos] >> 32, cantidad[vivos], monto[vivos]
+
+
+# ============================================
+# RANKING Y CONCENTRACIÓN
+# ============================================
+def ranking(codigos, conteo, suma, nombres, k):
+    """Los ``k`` proveedores de mayor monto con su participación en el total.
+
+    ``codigos`` indexa ``nombres`` y puede repetirse (se suma). Solo se
+    ordenan los candidatos que superan el corte de una selección parcial;
+    los empates se resuelven por nombre.
+    """
+    cantidad = np.bincount(codigos, weights=conteo, minlength=len(nombres))
+    monto = np.bincount(codigos, weights=suma, minlength=len(nombres))
+    presentes = np.flatnonzero(cantidad > 0)
+    total = monto[presentes].sum()
+    if len(presentes) > k > 0:
+        corte = np.partition(monto[presentes], len(presentes) - k)[len(presentes) - k]
+        presentes = presentes[monto[presentes] >= corte]
+    elegidos = sorted(presentes.tolist(), key=lambda c: (-monto[c], nombres[c]))[:k]
+    return pd.DataFrame({
+        COLUMNA_PROVEEDOR: nombres[elegidos],
+        'Cantidad': cantidad[elegidos].astype(np.int64),
+        COLUMNA_MONTO: monto[elegidos],
+        'participacion': monto[elegidos] / total if total else np.nan,
+    })
+
+
+def concentracion(grupos, codigos, conteo, suma, valores, dim, k):
+    """Por valor de ``dim``: licitaciones, monto, proveedores, HHI y participación de los ``k`` mayores.
+
+    ``grupos`` indexa ``valores`` y ``codigos`` a los proveedores; los pares
+    repetidos se suman. Un grupo con monto total 0 queda con HHI NaN.
+    """
+    grupo, cantidad, monto = _sumar_por_grupo(grupos, codigos, conteo, suma)
+    if len(grupo) == 0:
+        return pd.DataFrame(columns=[dim, 'Cantidad', COLUMNA_MONTO, 'proveedores', 'hhi', 'participacion_top'])
+
+    inicios = np.concatenate([[0], np.flatnonzero(np.diff(grupo)) + 1])
+    tamanos = np.diff(np.append(inicios, len(grupo)))
+    total = np.add.reduceat(monto, inicios)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        participacion = monto / np.repeat(total, tamanos)
+
+    # Puesto de cada proveedor dentro de su grupo (los grupos ya son contiguos)
+    orden = np.lexsort((-monto, grupo))
+    puesto = np.empty(len(grupo), dtype=np.int64)
+    puesto[orden] = np.arange(len(grupo)) - np.repeat(inicios, tamanos)
+    return pd.DataFrame({
+        dim: valores[grupo[inicios]],
+        'Cantidad': np.add.reduceat(cantidad, inicios).astype(np.int64),
+        COLUMNA_MONTO: total,
+        'proveedores': tamanos,
+        'hhi': np.add.reduceat(participacion * participacion, inicios) * 10_000,
+        'participacion_top': np.add.reduceat(np.where(puesto < k, participacion, 0.0), inicios),
+    }).sort_values(dim, ignore_index=True)
+
+
+# ============================================
+# EQUIVALENTES POR FILAS
+# ============================================
+# Para consultas que el cubo no responde (rango de monto parcial o búsqueda)
+def _filas_con_proveedor(df, columnas):
+    return df.dropna(subset=[COLUMNA_PROVEEDOR, COLUMNA_MONTO] + columnas)
+
+
+def ranking_filas(df, k):
+    df = _filas_con_proveedor(df, [])
+    codigos, nombres = codificar(df[COLUMNA_PROVEEDOR])
+    unos = np.ones(len(df), dtype=np.int64)
+    return ranking(codigos, unos, df[COLUMNA_MONTO].to_numpy(dtype=float), np.asarray(nombres, dtype=object), k)
+
+
+def concentracion_filas(df, dim, k):
+    df = _filas_con_proveedor(df, [dim])
+    grupos, valores = codificar(df[dim])
+    codigos, _ = codificar(df[COLUMNA_PROVEEDOR])
+    unos = np.ones(len(df), dtype=np.int64)
+    return concentracion(grupos.astype(np.int64), codigos.astype(np.int64), unos,
+                         df[COLUMNA_MONTO].to_numpy(dtype=float), valores, dim, k)
+
+
+# ============================================
+# PARES POR CELDA
+# ============================================
+class _Diccionario:
+    """Código estable por valor; los valores nuevos se agregan al final"""
+
+    def __init__(self, valores):
+        self.valores = np.asarray(valores, dtype=object)
+        self._codigo_de = {v: k for k, v in enumerate(self.valores.tolist())}
+
+    def codigos(self, valores):
+        codigos = np.full(len(valores), -1, dtype=np.int64)
+        for i, valor in enumerate(valores):
+            if pd.isna(valor):
+                continue
+            if valor not in self._codigo_de:
+                self._codigo_de[valor] = len(self.valores)
+                self.valores = np.append(self.valores, np.asarray([valor], dtype=object))
+            codigos[i] = self._codigo_de[valor]
+        return codigos
+
+
+class _Capa:
+    """Pares (subcelda, proveedor) de una dimensión fuera del cubo; subcelda = (celda, valor)"""
+
+    def __init__(self, columna, celdas, grupos, valores, codigos, montos):
+        self.columna = columna
+        self.diccionario = _Diccionario(valores)
+        dentro = grupos >= 0
+        ancho = max(len(valores), 1)
+        claves_sub, subceldas = np.unique(celdas[dentro] * ancho + grupos[dentro], return_inverse=True)
+        self.celda_de = claves_sub // ancho
+        self.grupo_de = claves_sub % ancho
+        self._subcelda_de = {(c, g): i for i, (c, g) in enumerate(zip(self.celda_de.tolist(),
+                                                                       self.grupo_de.tolist()))}
+        unos = np.ones(len(subceldas), dtype=np.int64)
+        self.pares = ParesCelda(*_sumar_por_clave((subceldas << 32) | codigos[dentro], unos, montos[dentro]))
+
+    def subceldas(self, celdas, valores):
+        """Subcelda de cada (celda, valor); -1 si el valor es nulo"""
+        grupos = self.diccionario.codigos(valores)
+        subceldas = np.full(len(celdas), -1, dtype=np.int64)
+        nuevas = []
+        for i in np.flatnonzero(grupos >= 0):
+            clave = (int(celdas[i]), int(grupos[i]))
+            if clave not in self._subcelda_de:
+                self._subcelda_de[clave] = len(self.celda_de) + len(nuevas)
+                nuevas.append(clave)
+            subceldas[i] = self._subcelda_de[clave]
+        if nuevas:
+            self.celda_de = np.concatenate([self.celda_de, [c for c, _ in nuevas]])
+            self.grupo_de = np.concatenate([self.grupo_de, [g for _, g in nuevas]])
+        return subceldas
+
+
+class ProveedoresCubo:
+    """Conteo y monto por (celda, proveedor) y por (celda, valor, proveedor) para ``capas``.
+
+    Entran las mismas filas que al cubo con proveedor informado. Se construye
+    al cargar los datos; tras un upsert, ``retirar`` y ``agregar`` tocan solo
+    los pares de las filas que cambian.
+    """
+
+    def __init__(self, df, cubo, capas=('entidad',), col_monto=COLUMNA_MONTO):
+        self.cubo = cubo
+        self.col_monto = col_monto
+        codigos, nombres = codificar(df[COLUMNA_PROVEEDOR])
+        self.proveedores = _Diccionario(nombres)
+
+        celdas = cubo.celda_por_fila
+        dentro = (celdas >= 0) & (codigos >= 0)
+        celdas, codigos = celdas[dentro], codigos[dentro].astype(np.int64)
+        montos = df[col_monto].to_numpy(dtype=float)[dentro]
+        unos = np.ones(len(celdas), dtype=np.int64)
+        self.pares = ParesCelda(*_sumar_por_clave((celdas << 32) | codigos, unos, montos))
+
+        self.capas = {}
+        for columna in capas:
+            if columna in df.columns and columna not in cubo.dimensiones:
+                grupos, valores = codificar(df[columna])
+                self.capas[columna] = _Capa(columna, celdas, grupos[dentro].astype(np.int64), valores,
+                                            codigos, montos)
+
+    # ----------------------------------------
+    # Actualización incremental
+    # ----------------------------------------
+    def _sumar(self, df, filas, signo):
+        filas = np.asarray(filas, dtype=np.int64)
+        celdas = self.cubo.celda_por_fila[filas]
+        nombres = df[COLUMNA_PROVEEDOR].to_numpy(dtype=object)[filas]
+        dentro = (celdas >= 0) & pd.notna(nombres)
+        filas, celdas = filas[dentro], celdas[dentro]
+        codigos = self.proveedores.codigos(nombres[dentro])
+        montos = df[self.col_monto].to_numpy(dtype=float)[filas]
+        unos = np.ones(len(filas), dtype=np.int64)
+
+        claves, conteo, suma = _sumar_por_clave((celdas << 32) | codigos, unos, montos)
+        self.pares.sumar(claves, signo * conteo, signo * suma)
+        for capa in self.capas.values():
+            subceldas = capa.subceldas(celdas, df[capa.columna].to_numpy(dtype=object)[filas])
+            con = subceldas >= 0
+            claves, conteo, suma = _sumar_por_clave((subceldas[con] << 32) | codigos[con], unos[con], montos[con])
+            capa.pares.sumar(claves, signo * conteo, signo * suma)
+
+    def retirar(self, df, filas):
+        """Resta ``filas`` (llamar antes de modificarlas y antes de cubo.agregar)"""
+        self._sumar(df, filas, -1)
+
+    def agregar(self, df, filas):
+        """Suma ``filas`` ya actualizadas en ``df`` y en el cubo"""
+        self._sumar(df, filas, 1)
+
+    # ----------------------------------------
+    # Consultas
+    # ----------------------------------------
+    def _elegidos(self, pares, celdas, mascara):
+        return mascara[celdas] & (pares.conteo > 0)
+
+    def distintos(self, mascara):
+        """Proveedores con alguna licitación en las celdas seleccionadas"""
+        elegidos = self._elegidos(self.pares, self.pares.claves >> 32, mascara)
+        codigos = self.pares.claves[elegidos] & _MASCARA_CODIGO
+        return int((np.bincount(codigos, minlength=len(self.proveedores.valores)) > 0).sum())
+
+    def top(self, mascara, k):
+        """Ranking de proveedores por monto en las celdas seleccionadas (ver ranking)"""
+        pares = self.pares
+        elegidos = self._elegidos(pares, pares.claves >> 32, mascara)
+        return ranking(pares.claves[elegidos] & _MASCARA_CODIGO, pares.conteo[elegidos], pares.suma[elegidos],
+                       self.proveedores.valores, k)
+
+    def concentracion(self, mascara, dim, k):
+        """Concentración por valor de ``dim`` en las celdas seleccionadas (ver concentracion)"""
+        if dim in self.capas:
+            capa = self.capas[dim]
+            pares = capa.pares
+            subceldas = pares.claves >> 32
+            elegidos = self._elegidos(pares, capa.celda_de[subceldas], mascara)
+            grupos, valores = capa.grupo_de[subceldas[elegidos]], capa.diccionario.valores
+        else:
+            pares = self.pares
+            celdas = pares.claves >> 32
+            elegidos = self._elegidos(pares, celdas, mascara)
+            grupos = self.cubo.celdas[celdas[elegidos], self.cubo.dimensiones.index(dim)].astype(np.int64)
+            valores = self.cubo.indice.valores[dim]
+        return concentracion(grupos, pares.claves[elegidos] & _MASCARA_CODIGO, pares.conteo[elegidos],
+                             pares.suma[elegidos], valores, dim, k)
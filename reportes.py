@@ -0,0 +1,250 @@
+# reportes.py
+"""Reportes estáticos por departamento, entidad y año, sin Streamlit
+
+Uso:
+    python reportes.py --por departamento entidad año --formatos html json
+    python reportes.py --por año --formatos html png --procesos 8 --salida reportes/
+"""
+import argparse
+import hashlib
+import html
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import graficos
+from alertas import REGLAS
+from consultas import Consulta, crear_motor, duckdb_disponible
+from datos import ARCHIVO_CSV, DIRECTORIO_EXTRACTOS
+from territorio import plegar_texto
+
+
+# Dimensión del CLI -> columna del dataset
+DIMENSIONES_REPORTE = {
+    'departamento': 'departamento',
+    'entidad': 'entidad',
+    'año': 'año_adjudicacion',
+}
+FORMATOS_REPORTE = ('html', 'json', 'png')
+DIRECTORIO_REPORTES = 'reportes'
+ARCHIVO_PLOTLY_JS = 'plotly.min.js'
+
+# Motor del proceso: con fork los trabajadores heredan el del proceso
+# principal (páginas compartidas copy-on-write) en lugar de cargar otro
+_motor = None
+
+
+def kaleido_disponible():
+    return importlib.util.find_spec('kaleido') is not None
+
+
+def nombre_archivo(valor, desambiguar=False):
+    """Nombre de archivo seguro a partir del valor del filtro.
+
+    Con ``desambiguar`` se agrega un hash corto del valor original, para
+    valores distintos que se pliegan al mismo nombre.
+    """
+    texto = re.sub(r'[^a-z0-9]+', '-', plegar_texto(str(valor))).strip('-') or 'sin-nombre'
+    if desambiguar:
+        texto += '-' + hashlib.sha1(str(valor).encode('utf-8')).hexdigest()[:8]
+    return texto
+
+
+def combinaciones(motor, dimensiones):
+    """(dimensión, valor, carpeta) de cada reporte a generar"""
+    trabajos = []
+    for dim in dimensiones:
+        valores = motor.opciones(DIMENSIONES_REPORTE[dim], Consulta())
+        # Un reporte no pisa a otro: los nombres repetidos llevan el hash del valor
+        repetidos = Counter(nombre_archivo(valor) for valor in valores)
+        trabajos += [(dim, valor, nombre_archivo(valor, repetidos[nombre_archivo(valor)] > 1)) for valor in valores]
+    return trabajos
+
+
+# ============================================
+# CONTENIDO DE UN REPORTE
+# ============================================
+def armar_reporte(motor, dim, valor):
+    """Datos y figuras del reporte, con la misma lógica del dashboard"""
+    # Como el dashboard con el slider completo: solo licitaciones con monto
+    consulta = Consulta().filtrar(DIMENSIONES_REPORTE[dim], [valor]).con_rango_monto()
+    resumen = motor.resumen(consulta)
+    tablas = {
+        'por_año': motor.agrupar('año_adjudicacion', consulta),
+        'por_tipo': motor.agrupar('tipo_proyecto', consulta),
+        'por_region': motor.agrupar('region', consulta),
+        'por_departamento': motor.agrupar('departamento', consulta),
+        'por_estatus': motor.agrupar('estatus', consulta),
+        'top_proveedores': motor.top_proveedores(consulta, 10),
+    }
+    figuras = {}
+    if resumen['total']:
+        figuras = {
+            'temporal': graficos.evolucion_anual(tablas['por_año']),
+            'tipo': graficos.por_tipo(tablas['por_tipo']),
+            'region': graficos.monto_por_region(tablas['por_region']),
+            'departamentos': graficos.top_departamentos(tablas['por_departamento']),
+            'proveedores': graficos.top_proveedores(tablas['top_proveedores']),
+            'estatus': graficos.distribucion_estatus(tablas['por_estatus']),
+            'ofertas': graficos.densidad_ofertas_monto(motor.bins_ofertas(consulta)),
+        }
+    return {
+        'dimension': dim,
+        'valor': valor,
+        'version_dataset': motor.version,
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'resumen': resumen,
+        'alertas': motor.contar_alertas(consulta),
+        'tablas': tablas,
+    }, figuras
+
+
+def _valor_json(valor):
+    """Escalares de numpy como números; el resto (fechas) como texto"""
+    return valor.item() if hasattr(valor, 'item') else str(valor)
+
+
+def _json(reporte):
+    contenido = dict(reporte, tablas={k: df.to_dict(orient='records') for k, df in reporte['tablas'].items()})
+    return json.dumps(contenido, ensure_ascii=False, indent=2, default=_valor_json)
+
+
+def _html(reporte, figuras, ruta_plotly):
+    titulo = f"Licitaciones · {reporte['dimension'].capitalize()}: {reporte['valor']}"
+    r = reporte['resumen']
+    indicadores = [
+        ("Total licitaciones", f"{r['total']:,}"),
+        ("Monto total adjudicado", f"Q{r['monto_total']:,.2f}"),
+        ("Monto promedio", f"Q{r['monto_promedio']:,.2f}"),
+        ("Proveedores distintos", f"{r['proveedores']:,}"),
+    ]
+    indicadores += [(regla.etiqueta, f"{reporte['alertas'][regla.nombre]:,}") for regla in REGLAS]
+    filas = ''.join(f"<tr><th>{html.escape(k)}</th><td>{html.escape(v)}</td></tr>" for k, v in indicadores)
+    # plotly.js se escribe una vez en la carpeta de salida y cada reporte lo referencia
+    graficas = ''.join(fig.to_html(full_html=False, include_plotlyjs=False) for fig in figuras.values())
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(titulo)}</title>
+<script src="{ruta_plotly}"></script>
+<style>body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse}}
+th,td{{padding:4px 12px;border-bottom:1px solid #ddd;text-align:left}}</style>
+</head>
+<body>
+<h1>📊 {html.escape(titulo)}</h1>
+<p>Dataset {html.escape(reporte['version_dataset'])} · generado {html.escape(reporte['generado'])}</p>
+<table>{filas}</table>
+{graficas}
+</body>
+</html>
+"""
+
+
+# ============================================
+# TRABAJADORES
+# ============================================
+def _inicializar(nombre_motor, ruta, directorio_extractos):
+    """Motor del trabajador: heredado por fork o cargado si no existe.
+
+    DuckDB abre siempre su propia conexión (no sobrevive a un fork); todas
+    leen el mismo Parquet, que el sistema comparte en la caché de páginas.
+    """
+    global _motor
+    if _motor is None or _motor.nombre == 'duckdb':
+        _motor = crear_motor(nombre_motor, ruta, directorio_extractos)
+        _motor.actualizar()  # DuckDB no aplica los extractos al abrir; pandas ya los trae
+
+
+def generar_reporte(dim, valor, carpeta, salida, formatos):
+    """Escribe los archivos de un reporte en salida/dim/carpeta; devuelve (dim, valor, rutas, segundos)"""
+    inicio = time.perf_counter()
+    reporte, figuras = armar_reporte(_motor, dim, valor)
+    directorio = os.path.join(salida, dim, carpeta)
+    os.makedirs(directorio, exist_ok=True)
+
+    rutas = []
+    if 'json' in formatos:
+        rutas.append(os.path.join(directorio, 'datos.json'))
+        with open(rutas[-1], 'w', encoding='utf-8') as f:
+            f.write(_json(reporte))
+    if 'html' in formatos:
+        rutas.append(os.path.join(directorio, 'index.html'))
+        with open(rutas[-1], 'w', encoding='utf-8') as f:
+            f.write(_html(reporte, figuras, f"../../{ARCHIVO_PLOTLY_JS}"))
+    if 'png' in formatos:
+        for nombre, fig in figuras.items():
+            rutas.append(os.path.join(directorio, f"{nombre}.png"))
+            fig.write_image(rutas[-1], width=1200, height=600)
+    return dim, valor, rutas, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--por', nargs='+', choices=list(DIMENSIONES_REPORTE), default=list(DIMENSIONES_REPORTE))
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS_REPORTE, default=['html', 'json'])
+    parser.add_argument('--salida', default=DIRECTORIO_REPORTES)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    parser.add_argument('--csv', default=ARCHIVO_CSV)
+    parser.add_argument('--extractos', default=DIRECTORIO_EXTRACTOS)
+    parser.add_argument('--motor', choices=['pandas', 'duckdb'], default='pandas')
+    args = parser.parse_args()
+
+    formatos = list(args.formatos)
+    if 'png' in formatos and not kaleido_disponible():
+        print("⚠️ kaleido no está instalado: se omiten los PNG (pip install kaleido)")
+        formatos.remove('png')
+    if args.motor == 'duckdb' and not duckdb_disponible():
+        parser.error("el motor duckdb requiere 'pip install duckdb'")
+
+    # El proceso principal carga el dataset (y deja snapshot/Parquet al día)
+    # antes de crear los trabajadores
+    inicio = time.perf_counter()
+    global _motor
+    _motor = crear_motor(args.motor, args.csv, args.extractos)
+    _motor.actualizar()  # Mismos extractos en ambos motores
+    trabajos = combinaciones(_motor, args.por)
+    print(f"Dataset cargado en {time.perf_counter() - inicio:.1f} s · {len(trabajos)} reportes")
+
+    # Un reporte en el proceso principal carga los validadores de plotly,
+    # que con fork los trabajadores heredan ya inicializados
+    if trabajos:
+        armar_reporte(_motor, *trabajos[0][:2])
+
+    os.makedirs(args.salida, exist_ok=True)
+    if 'html' in formatos:
+        from plotly.offline import get_plotlyjs
+        with open(os.path.join(args.salida, ARCHIVO_PLOTLY_JS), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context('fork' if 'fork' in metodos else 'spawn')
+    fallidos = 0
+    with ProcessPoolExecutor(max_workers=args.procesos, mp_context=contexto, initializer=_inicializar,
+                             initargs=(args.motor, args.csv, args.extractos)) as pool:
+        futuros = {pool.submit(generar_reporte, dim, valor, carpeta, args.salida, formatos): (dim, valor)
+                   for dim, valor, carpeta in trabajos}
+        for hechos, futuro in enumerate(as_completed(futuros), start=1):
+            dim, valor = futuros[futuro]
+            try:
+                _, _, rutas, segundos = futuro.result()
+                print(f"[{hechos}/{len(trabajos)}] {dim}={valor}: {len(rutas)} archivos en {segundos:.2f} s")
+            except Exception as e:
+                fallidos += 1
+                print(f"[{hechos}/{len(trabajos)}] ❌ {dim}={valor}: {e}", file=sys.stderr)
+
+    print(f"\n✅ {len(trabajos) - fallidos} reportes en {args.salida} "
+          f"({time.perf_counter() - inicio:.1f} s en total)")
+    if fallidos:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# secciones.py
+"""Memoización por sección: cada bloque se reconstruye solo si cambian sus entradas"""
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+
+# Tope de memoria de la caché compartida de figuras y mapas (MB)
+MAX_MB_CACHE = int(os.environ.get('GUATECOMPRAS_CACHE_MB', '256'))
+
+
+def firma_seccion(*entradas):
+    """Hash canónico de las entradas de una sección (versión, firma de la consulta, ...)"""
+    contenido = json.dumps(entradas, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:24]
+
+
+# ============================================
+# CACHÉ COMPARTIDA ENTRE SESIONES
+# ============================================
+def _serializar(valor):
+    """Las figuras Plotly se guardan como JSON; el resto (HTML, tablas chicas) tal cual.
+
+    Lo guardado es de todas las sesiones y nadie lo modifica: ``_deserializar``
+    entrega siempre una copia.
+    """
+    if hasattr(valor, 'to_plotly_json'):
+        import plotly.io as pio
+        return ('plotly', pio.to_json(valor, validate=False))
+    return ('valor', valor)
+
+
+def _deserializar(guardado):
+    tipo, contenido = guardado
+    # st.plotly_chart acepta el dict de la figura directamente
+    if tipo == 'plotly':
+        return json.loads(contenido)
+    # Una sesión que modifique su DataFrame no altera la entrada de las demás
+    return contenido if isinstance(contenido, (str, bytes)) else copy.deepcopy(contenido)
+
+
+def _tamano(valor):
+    """Bytes aproximados de un valor guardado"""
+    if isinstance(valor, str):
+        return len(valor.encode('utf-8'))
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, (tuple, list)):
+        return sum(_tamano(v) for v in valor)
+    if hasattr(valor, 'memory_usage'):
+        return int(valor.memory_usage(deep=True).sum())
+    return sys.getsizeof(valor)
+
+
+class CacheRenderizados:
+    """LRU de figuras serializadas y HTML de mapas, acotada en bytes.
+
+    La clave es (sección, firma) con la firma de ``firma_seccion``: incluye
+    la versión del dataset, así que un cambio de datos nunca sirve figuras
+    viejas. Al pasar de ``max_bytes`` se descartan las menos usadas.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """(True, valor guardado) o (False, None)"""
+        with self._lock:
+            if clave not in self._entradas:
+                self.fallos += 1
+                return False, None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return True, self._entradas[clave][0]
+
+    def guardar(self, clave, guardado):
+        tamano = _tamano(guardado)
+        if tamano > self.max_bytes:
+            return  # Nunca cabría: no se desaloja toda la caché por una entrada
+        with self._lock:
+            if clave in self._entradas:
+                self.bytes -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (guardado, tamano)
+            self.bytes += tamano
+            while self.bytes > self.max_bytes:
+                self.bytes -= self._entradas.popitem(last=False)[1][1]
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+@st.cache_resource
+def cache_renderizados():
+    """Instancia única por proceso, compartida por todas las sesiones"""
+    return CacheRenderizados(MAX_MB_CACHE * 1024 * 1024)
+
+
+def memo_seccion(nombre, firma, construir):
+    """Resultado de ``construir()`` reutilizado mientras ``firma`` no cambie.
+
+    Primero se mira el último resultado de la sección en la sesión (al mover
+    un filtro que no la afecta se reutiliza tal cual); luego la caché
+    compartida, donde otra sesión con los mismos filtros puede haberlo dejado.
+    Solo si ambas fallan se construye. Las figuras se devuelven como dict.
+
+    Cada sesión recibe su propia copia de lo guardado en la caché compartida
+    (JSON para las figuras, copia profunda para DataFrames y demás), así que
+    puede modificarla sin afectar a otras; la copia de la sesión sí se
+    reutiliza tal cual en sus siguientes ejecuciones.
+    """
+    clave = f"_seccion_{nombre}"
+    guardado = st.session_state.get(clave)
+    if guardado is not None and guardado[0] == firma:
+        return guardado[1]
+
+    cache = cache_renderizados()
+    encontrado, serializado = cache.obtener((nombre, firma))
+    if not encontrado:
+        serializado = _serializar(construir())
+        cache.guardar((nombre, firma), serializado)
+    resultado = _deserializar(serializado)
+    st.session_state[clave] = (firma, resultado)
+    return resultado
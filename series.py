@@ -0,0 +1,181 @@
+# series.py
+"""Series de tiempo por día, semana, mes y año sobre las celdas del cubo
+
+Para cada columna de fecha y granularidad se guarda el conteo y el monto
+por (celda del cubo, período). Filtrar por las dimensiones del sidebar es
+elegir celdas, así que la serie filtrada se arma sumando pares ya
+agregados, sin reagrupar filas. Media móvil y variación interanual salen
+de sumas acumuladas sobre esa serie.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cubo import ParesCelda
+from indices import COLUMNA_MONTO
+
+
+COLUMNAS_FECHA = ['fecha_adjudicacion', 'fecha_publicacion', 'fecha_presentacion', 'fecha_cierre']
+
+# Código de granularidad -> (etiqueta, períodos de la media móvil, períodos en un año)
+GRANULARIDADES = {
+    'D': ("Día", 28, 364),  # 364: el mismo día de la semana un año antes
+    'W': ("Semana", 13, 52),
+    'M': ("Mes", 12, 12),
+    'A': ("Año", 1, 1),
+}
+
+_DESPLAZAMIENTO = 1 << 31  # Los períodos anteriores a 1970 son negativos
+_MASCARA_PERIODO = 0xFFFFFFFF
+
+
+# ============================================
+# PERÍODOS
+# ============================================
+def periodos(fechas, granularidad):
+    """Número entero del período de cada fecha (NaT da un valor sin sentido: filtrar antes)"""
+    fechas = np.asarray(fechas, dtype='datetime64[us]')
+    if granularidad == 'M':
+        return fechas.astype('datetime64[M]').astype(np.int64)
+    if granularidad == 'A':
+        return fechas.astype('datetime64[Y]').astype(np.int64)
+    dias = fechas.astype('datetime64[D]').astype(np.int64)
+    if granularidad == 'W':
+        return (dias + 3) // 7  # Semanas de lunes a domingo (el 1970-01-01 fue jueves)
+    return dias
+
+
+def inicio_periodo(numeros, granularidad):
+    """Fecha en que empieza cada período"""
+    numeros = np.asarray(numeros, dtype=np.int64)
+    if granularidad == 'M':
+        return numeros.astype('datetime64[M]').astype('datetime64[ns]')
+    if granularidad == 'A':
+        return numeros.astype('datetime64[Y]').astype('datetime64[ns]')
+    if granularidad == 'W':
+        numeros = numeros * 7 - 3
+    return numeros.astype('datetime64[D]').astype('datetime64[ns]')
+
+
+def _agregar_claves(claves, montos):
+    """Claves distintas (ordenadas) con su conteo y suma de monto"""
+    orden = np.argsort(claves, kind='stable')
+    claves, montos = claves[orden], montos[orden]
+    if len(claves) == 0:
+        return claves, np.zeros(0, dtype=np.int64), np.zeros(0)
+    inicios = np.concatenate([[0], np.flatnonzero(np.diff(claves)) + 1])
+    conteo = np.diff(np.append(inicios, len(claves)))
+    return claves[inicios], conteo, np.add.reduceat(montos, inicios)
+
+
+# ============================================
+# SERIE A PARTIR DE PERÍODOS
+# ============================================
+def armar_serie(numeros, cantidad, monto, granularidad):
+    """Serie densa (sin huecos entre el primer y el último período) con ventanas.
+
+    Columnas: periodo, Cantidad, monto_adjudicado y, para ambas métricas, la
+    media móvil (``_media``) y la variación contra la misma ventana un año
+    antes (``_interanual``, NaN si no hay con qué comparar).
+    """
+    presentes = cantidad > 0
+    numeros, cantidad, monto = numeros[presentes], cantidad[presentes], monto[presentes]
+    if len(numeros) == 0:
+        return pd.DataFrame(columns=['periodo', 'Cantidad', COLUMNA_MONTO, 'Cantidad_media', 'Cantidad_interanual',
+                                     'monto_media', 'monto_interanual'])
+    base = numeros.min()
+    largo = int(numeros.max() - base + 1)
+    serie = pd.DataFrame({
+        'periodo': inicio_periodo(np.arange(base, base + largo), granularidad),
+        'Cantidad': np.bincount(numeros - base, weights=cantidad, minlength=largo).astype(np.int64),
+        COLUMNA_MONTO: np.bincount(numeros - base, weights=monto, minlength=largo),
+    })
+
+    _, ventana, año = GRANULARIDADES[granularidad]
+    for columna, nombre in [('Cantidad', 'Cantidad'), (COLUMNA_MONTO, 'monto')]:
+        acumulado = np.concatenate([[0.0], np.cumsum(serie[columna].to_numpy(dtype=float))])
+        posiciones = np.arange(1, largo + 1)
+        desde = np.maximum(posiciones - ventana, 0)
+        suma_ventana = acumulado[posiciones] - acumulado[desde]
+        serie[f"{nombre}_media"] = suma_ventana / (posiciones - desde)
+        # Solo ventanas completas se comparan con la del año anterior
+        anterior = np.full(largo, np.nan)
+        completas = posiciones - ventana - año >= 0
+        anterior[completas] = (acumulado[posiciones[completas] - año]
+                               - acumulado[posiciones[completas] - año - ventana])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variacion = np.where(anterior > 0, suma_ventana / anterior - 1, np.nan)
+        serie[f"{nombre}_interanual"] = variacion
+    return serie
+
+
+def serie_filas(df, columna_fecha, granularidad, col_monto=COLUMNA_MONTO):
+    """Misma serie que SeriesTemporales.serie, calculada sobre las filas de ``df``"""
+    fechas = df[columna_fecha].to_numpy(dtype='datetime64[us]')
+    validas = ~np.isnat(fechas)
+    numeros = periodos(fechas[validas], granularidad)
+    montos = np.nan_to_num(df[col_monto].to_numpy(dtype=float)[validas])
+    distintos, cantidad, monto = _agregar_claves(numeros, montos)
+    return armar_serie(distintos, cantidad, monto, granularidad)
+
+
+# ============================================
+# SERIES POR CELDA
+# ============================================
+class SeriesTemporales:
+    """Series por columna de fecha y granularidad sobre las celdas de CuboLicitaciones.
+
+    Entran las mismas filas que al cubo (dimensiones y monto informados) con
+    la fecha elegida informada. Cada combinación (fecha, granularidad) se
+    calcula al primer uso; después, ``retirar`` y ``agregar`` mantienen al
+    día las ya calculadas tras un upsert, tocando solo los pares de las
+    filas que cambian.
+    """
+
+    def __init__(self, df, cubo, col_monto=COLUMNA_MONTO):
+        self.df = df
+        self.cubo = cubo
+        self.col_monto = col_monto
+        self.pares = {}
+        self._lock = threading.Lock()
+
+    def _claves(self, df, filas, columna_fecha, granularidad):
+        """Clave (celda, período) y monto de las ``filas`` que entran a la serie"""
+        celdas = self.cubo.celda_por_fila[filas]
+        fechas = df[columna_fecha].to_numpy(dtype='datetime64[us]')[filas]
+        dentro = (celdas >= 0) & ~np.isnat(fechas)
+        numeros = periodos(fechas[dentro], granularidad) + _DESPLAZAMIENTO
+        montos = df[self.col_monto].to_numpy(dtype=float)[filas][dentro]
+        return (celdas[dentro] << 32) | numeros, montos
+
+    def _obtener(self, columna_fecha, granularidad):
+        with self._lock:
+            clave = (columna_fecha, granularidad)
+            if clave not in self.pares:
+                todas = np.arange(len(self.cubo.celda_por_fila))
+                self.pares[clave] = ParesCelda(*_agregar_claves(*self._claves(self.df, todas, *clave)))
+            return self.pares[clave]
+
+    def _sumar(self, df, filas, signo):
+        filas = np.asarray(filas, dtype=np.int64)
+        with self._lock:
+            for (columna_fecha, granularidad), pares in self.pares.items():
+                claves, conteo, suma = _agregar_claves(*self._claves(df, filas, columna_fecha, granularidad))
+                pares.sumar(claves, signo * conteo, signo * suma)
+
+    def retirar(self, df, filas):
+        """Resta ``filas`` (llamar antes de modificarlas y antes de cubo.agregar)"""
+        self._sumar(df, filas, -1)
+
+    def agregar(self, df, filas):
+        """Suma ``filas`` ya actualizadas en ``df`` y en el cubo"""
+        self.df = df
+        self._sumar(df, filas, 1)
+
+    def serie(self, mascara, columna_fecha, granularidad):
+        """Serie (ver armar_serie) de las celdas seleccionadas por ``mascara``"""
+        pares = self._obtener(columna_fecha, granularidad)
+        elegidos = mascara[pares.claves >> 32] & (pares.conteo > 0)
+        numeros = (pares.claves[elegidos] & _MASCARA_PERIODO) - _DESPLAZAMIENTO
+        return armar_serie(numeros, pares.conteo[elegidos], pares.suma[elegidos], granularidad)
@@ -0,0 +1,50 @@
+# tablas.py
+"""Tabla paginada: solo se formatea y envía la página visible"""
+import streamlit as st
+
+from perfil import perfilador
+
+
+TAMANOS_PAGINA = [25, 50, 100, 250]
+
+
+@st.fragment
+def tabla_paginada(fuente, columnas, formatos, clave, height=None):
+    """Muestra ``fuente`` página por página.
+
+    ``fuente`` (ver consultas.FuenteDataFrame, FuenteFilas y FuenteSQL)
+    resuelve el orden y devuelve solo la página pedida; solo esa página pasa
+    por el Styler. Es un fragmento: cambiar de página u orden re-ejecuta solo
+    la tabla.
+    """
+    total = fuente.total
+    if total == 0:
+        st.info("ℹ️ No hay licitaciones para mostrar")
+        return
+
+    col_orden, col_sentido, col_tamano, col_pagina = st.columns([3, 2, 2, 2])
+    with col_orden:
+        ordenar_por = st.selectbox("Ordenar por", ['(sin orden)'] + columnas, key=f"{clave}_orden")
+    with col_sentido:
+        sentido = st.radio("Sentido", ['Asc', 'Desc'], horizontal=True, key=f"{clave}_sentido")
+    with col_tamano:
+        tamano = st.selectbox("Filas por página", TAMANOS_PAGINA, key=f"{clave}_tamano")
+    paginas = max(1, -(-total // tamano))
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1,
+                                 key=f"{clave}_pagina")
+
+    inicio = (int(pagina) - 1) * tamano
+    fin = min(inicio + tamano, total)
+    orden = None if ordenar_por == '(sin orden)' else ordenar_por
+    with perfilador().seccion(f"tabla_{clave}", filas_entrada=total) as registro:
+        ventana = fuente.pagina(columnas, orden, sentido == 'Asc', inicio, fin)
+        registro['filas_salida'] = len(ventana)
+
+        opciones = {'height': height} if height else {}
+        st.dataframe(
+            ventana.style.format({k: v for k, v in formatos.items() if k in columnas}),
+            use_container_width=True,
+            **opciones
+        )
+    st.caption(f"Mostrando {inicio + 1:,}–{fin:,} de {total:,} · Página {int(pagina)} de {paginas}")
@@ -0,0 +1,43 @@
+# territorio.py
+"""Departamentos y regiones de Guatemala, y el plegado con que se comparan nombres"""
+import unicodedata
+
+
+# Centroides aproximados por departamento (los datos no traen LATITUD/LONGITUD)
+COORDENADAS_DEPARTAMENTOS = {
+    'Guatemala': [14.6349, -90.5069],
+    'Sacatepéquez': [14.5547, -90.7333],
+    'Chimaltenango': [14.6604, -90.8215],
+    'Escuintla': [14.3012, -90.7852],
+    'Santa Rosa': [14.1646, -90.2852],
+    'Sololá': [14.7483, -91.1858],
+    'Totonicapán': [14.9124, -91.3611],
+    'Quetzaltenango': [14.8348, -91.5184],
+    'Suchitepéquez': [14.5358, -91.4839],
+    'Retalhuleu': [14.5341, -91.6787],
+    'San Marcos': [14.9657, -91.7951],
+    'Huehuetenango': [15.3192, -91.4724],
+    'Quiché': [15.0304, -91.1484],
+    'Baja Verapaz': [15.1322, -90.3761],
+    'Alta Verapaz': [15.4865, -90.3273],
+    'Petén': [16.9064, -89.9315],
+    'Izabal': [15.6868, -88.8704],
+    'Zacapa': [14.9781, -89.5283],
+    'Chiquimula': [14.8003, -89.5442],
+    'Jalapa': [14.6347, -89.9867],
+    'Jutiapa': [14.2905, -89.8919],
+    'El Progreso': [14.8571, -90.0795]
+}
+
+REGIONES = ['Metropolitana', 'Norte', 'Nororiental', 'Suroriental', 'Central', 'Suroccidental',
+            'Noroccidental', 'Petén']
+
+
+def plegar_texto(texto):
+    """Minúsculas, sin tildes y solo ASCII"""
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def plegar_nombre(valor):
+    """Clave de un nombre: plegado y con espacios simples ('Petén' y ' peten' son la misma)"""
+    return ' '.join(plegar_texto(str(valor)).split())
@@ -0,0 +1,52 @@
+# tests/conftest.py
+"""Dataset sintético con un extracto de upsert para las pruebas de los motores"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Los módulos del dashboard están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generar_datos import generar  # noqa: E402
+
+
+FILAS = 3_000
+
+
+def escribir_extracto(ruta_base, destino, semilla=7):
+    """Extracto que reemplaza filas existentes (otro monto y departamento) y agrega filas nuevas"""
+    base = pd.read_csv(ruta_base, dtype=str, keep_default_na=False)
+    rng = np.random.default_rng(semilla)
+    reemplazadas = base.sample(200, random_state=semilla)
+    reemplazadas['monto_adjudicado'] = np.where(
+        reemplazadas['monto_adjudicado'] == '', '', (rng.uniform(1e4, 1e7, len(reemplazadas))).round(2).astype(str)
+    )
+    reemplazadas['departamento'] = rng.choice(base['departamento'].unique(), len(reemplazadas))
+    nuevas = base.sample(100, random_state=semilla + 1)
+    nuevas['nog'] = (nuevas['nog'].astype(np.int64) + 10 ** 9).astype(str)
+    pd.concat([reemplazadas, nuevas]).to_csv(destino, index=False)
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    """(CSV base, carpeta de extractos con el extracto ya escrito, motor pandas que lo aplicó con actualizar)"""
+    from consultas import crear_motor
+
+    carpeta = tmp_path_factory.mktemp('datos')
+    ruta = generar(FILAS, str(carpeta / 'licitaciones.csv'), semilla=3)
+    extractos = carpeta / 'extractos'
+    extractos.mkdir()
+
+    # El motor arranca sin extractos y los incorpora después, como en el dashboard
+    motor = crear_motor('pandas', ruta, str(extractos))
+    escribir_extracto(ruta, extractos / '2030-01-01.csv')
+    assert motor.actualizar() == 300
+    return ruta, str(extractos), motor
+
+
+@pytest.fixture(scope='session')
+def motor_pandas(dataset):
+    return dataset[2]
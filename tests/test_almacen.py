@@ -0,0 +1,58 @@
+# tests/test_almacen.py
+"""Consultas concurrentes mientras actualizar incorpora extractos"""
+import threading
+
+import pandas as pd
+
+from conftest import escribir_extracto
+from consultas import Consulta, crear_motor
+from generar_datos import generar
+
+
+def test_consultas_durante_actualizar(tmp_path):
+    ruta = generar(2_000, str(tmp_path / 'licitaciones.csv'), semilla=11)
+    (tmp_path / 'extractos').mkdir()
+    motor = crear_motor('pandas', ruta, str(tmp_path / 'extractos'))
+    departamentos = motor.opciones('departamento', Consulta())
+
+    errores = []
+    parar = threading.Event()
+
+    def lector():
+        consulta = Consulta().con_rango_monto()
+        for dim in motor.almacen.cubo.dimensiones:
+            consulta = consulta.filtrar(dim, motor.opciones(dim, Consulta()))
+        while not parar.is_set():
+            try:
+                motor.opciones('departamento', Consulta().filtrar('region', ['Norte']))
+                motor.resumen(consulta)
+                motor.agrupar('departamento', consulta)
+                motor.top_proveedores(consulta, 10)
+                motor.serie_temporal(consulta, 'fecha_adjudicacion', 'M')
+                motor.fuente(consulta).pagina(['nog'], 'monto_adjudicado', False, 0, 10)
+                motor.contar(Consulta().con_busqueda('camino'))
+            except Exception as error:  # El hilo no puede fallar la prueba por sí solo
+                errores.append(error)
+                parar.set()
+
+    hilos = [threading.Thread(target=lector) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        for i in range(10):
+            destino = tmp_path / 'extractos' / f"2030-01-{i + 1:02d}.csv"
+            escribir_extracto(ruta, destino, semilla=i)
+            # NOG desplazados (salvo el primero, que reemplaza filas) y un solo departamento: celdas nuevas en el cubo
+            extracto = pd.read_csv(destino, dtype=str, keep_default_na=False)
+            extracto['nog'] = (extracto['nog'].astype('int64') + i * 10 ** 10).astype(str)
+            extracto['departamento'] = departamentos[i % len(departamentos)]
+            extracto.to_csv(destino, index=False)
+            motor.actualizar()
+            if parar.is_set():
+                break
+    finally:
+        parar.set()
+        for hilo in hilos:
+            hilo.join()
+    assert errores == []
+    assert motor.total() == 2_000 + 100 + 9 * 300
@@ -0,0 +1,205 @@
+# tests/test_consultas.py
+"""Firma de Consulta y paridad entre los motores pandas y DuckDB"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from consultas import BINS_MONTO, Consulta, consulta_celda, crear_motor
+from indices import COLUMNA_MONTO
+
+
+# ============================================
+# FIRMA
+# ============================================
+def test_firma_no_depende_del_orden_de_los_valores():
+    a = Consulta().filtrar('region', ['Norte', 'Central']).filtrar('estatus', ['Adjudicado'])
+    b = Consulta().filtrar('estatus', ['Adjudicado']).filtrar('region', ['Central', 'Norte'])
+    assert a.firma() == b.firma()
+
+
+def test_firma_distingue_filtros():
+    base = Consulta().filtrar('region', ['Norte'])
+    distintas = [
+        base,
+        base.filtrar('region', ['Central']),
+        base.con_rango_monto(),
+        base.con_rango_monto(100, None),
+        base.con_rango_monto(None, 100),
+        base.con_rango_monto(100, 200),
+        base.con_busqueda('camino'),
+        base.con(('numero_ofertas', '==', 1)),
+        base.con_alerta('oferta_unica'),
+    ]
+    assert len({c.firma() for c in distintas}) == len(distintas)
+
+
+def test_firma_conserva_el_orden_del_rango():
+    assert Consulta().con_rango_monto(100, 200).firma() != Consulta().con_rango_monto(200, 100).firma()
+    # Enteros y flotantes iguales filtran lo mismo
+    assert Consulta().con_rango_monto(100, 200).firma() == Consulta().con_rango_monto(100.0, 200.0).firma()
+
+
+def test_firma_ignora_espacios_de_la_busqueda():
+    assert Consulta().con_busqueda('  camino ').firma() == Consulta().con_busqueda('camino').firma()
+
+
+# ============================================
+# PARIDAD PANDAS / DUCKDB
+# ============================================
+@pytest.fixture(scope='module')
+def motor_duckdb(dataset):
+    pytest.importorskip('duckdb')
+    ruta, extractos, _ = dataset
+    motor = crear_motor('duckdb', ruta, extractos)
+    motor.actualizar()
+    return motor
+
+
+def consultas_paridad(motor):
+    departamentos = motor.opciones('departamento', Consulta())
+    return [
+        Consulta(),
+        Consulta().filtrar('departamento', departamentos[:3]).filtrar('estatus', ['Adjudicado']),
+        Consulta().con_rango_monto(5e5, 5e6),
+        Consulta().con_rango_monto(),
+        Consulta().con_busqueda('camino'),
+        Consulta().con_busqueda('´'),  # Se pliega a vacío: ninguna fila
+        Consulta().con(('numero_ofertas', '<=', 1)),
+        Consulta().con_alerta('oferta_unica'),
+    ]
+
+
+def normalizar(df):
+    df = df.reset_index(drop=True).copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) or df[col].dtype == object:
+            df[col] = df[col].astype(str)
+    return df
+
+
+def comparar(a, b):
+    pd.testing.assert_frame_equal(normalizar(a), normalizar(b), check_dtype=False, rtol=1e-9)
+
+
+def test_paridad_conteos(motor_pandas, motor_duckdb):
+    assert motor_duckdb.total() == motor_pandas.total()
+    for consulta in consultas_paridad(motor_pandas):
+        assert motor_duckdb.contar(consulta) == motor_pandas.contar(consulta)
+        assert motor_duckdb.contar_alertas(consulta) == motor_pandas.contar_alertas(consulta)
+        assert motor_duckdb.rango_monto(consulta) == pytest.approx(motor_pandas.rango_monto(consulta))
+
+
+def test_paridad_opciones(motor_pandas, motor_duckdb):
+    for consulta in consultas_paridad(motor_pandas):
+        for columna in ('region', 'departamento', 'tipo_proyecto', 'año_adjudicacion'):
+            esperadas = [str(v) for v in motor_pandas.opciones(columna, consulta)]
+            assert [str(v) for v in motor_duckdb.opciones(columna, consulta)] == esperadas
+
+
+def test_paridad_resumen(motor_pandas, motor_duckdb):
+    for consulta in consultas_paridad(motor_pandas):
+        assert motor_duckdb.resumen(consulta) == pytest.approx(motor_pandas.resumen(consulta), rel=1e-9, nan_ok=True)
+
+
+def test_paridad_agregados(motor_pandas, motor_duckdb):
+    for consulta in consultas_paridad(motor_pandas):
+        comparar(motor_duckdb.agrupar('departamento', consulta), motor_pandas.agrupar('departamento', consulta))
+        comparar(motor_duckdb.top_proveedores(consulta, 10), motor_pandas.top_proveedores(consulta, 10))
+        comparar(motor_duckdb.concentracion(consulta, 'entidad', 4), motor_pandas.concentracion(consulta, 'entidad', 4))
+        comparar(motor_duckdb.serie_temporal(consulta, 'fecha_adjudicacion', 'M'),
+                 motor_pandas.serie_temporal(consulta, 'fecha_adjudicacion', 'M'))
+        comparar(motor_duckdb.bins_ofertas(consulta), motor_pandas.bins_ofertas(consulta))
+
+
+def test_paridad_paginas(motor_pandas, motor_duckdb):
+    columnas = ['nog', 'departamento', COLUMNA_MONTO]
+    for consulta in consultas_paridad(motor_pandas):
+        pandas, duckdb = motor_pandas.fuente(consulta), motor_duckdb.fuente(consulta)
+        assert duckdb.total == pandas.total
+        # Ordenado por NOG (único) las dos páginas tienen las mismas filas en el mismo orden
+        comparar(duckdb.pagina(columnas, 'nog', False, 0, 25), pandas.pagina(columnas, 'nog', False, 0, 25))
+        montos = duckdb.pagina(columnas, COLUMNA_MONTO, True, 0, 25)[COLUMNA_MONTO].to_numpy(dtype=float)
+        assert np.array_equal(montos, pandas.pagina(columnas, COLUMNA_MONTO, True, 0, 25)[COLUMNA_MONTO].to_numpy(dtype=float),
+                              equal_nan=True)
+
+
+# ============================================
+# DENSIDAD OFERTAS × MONTO
+# ============================================
+@pytest.mark.parametrize('nombre', ['pandas', 'duckdb'])
+def test_detalle_de_celda_igual_a_sus_puntos(request, nombre):
+    motor = request.getfixturevalue(f"motor_{nombre}")
+    for consulta in consultas_paridad(motor)[:3]:
+        bins = motor.bins_ofertas(consulta)
+        for celda in bins.itertuples():
+            detalle = consulta_celda(consulta, celda.numero_ofertas, celda.bin_monto, celda.monto_desde, celda.monto_hasta)
+            assert motor.contar(detalle) == celda.Cantidad
+            assert motor.resumen(detalle)['monto_total'] == pytest.approx(celda.monto_adjudicado, rel=1e-9)
+        # Toda licitación con ofertas y monto cae en exactamente una celda
+        validas = consulta.con(('numero_ofertas', '>=', 0), (COLUMNA_MONTO, '>', 0))
+        assert bins['Cantidad'].sum() == motor.contar(validas)
+
+
+def test_ultima_celda_incluye_el_monto_maximo(motor_pandas):
+    consulta = Consulta().con_rango_monto()
+    maximo = motor_pandas.rango_monto(consulta)[1]
+    bins = motor_pandas.bins_ofertas(consulta)
+    ultima = bins[bins['bin_monto'] == BINS_MONTO - 1]
+    assert ultima['monto_hasta'].max() == maximo
+    celdas = [consulta_celda(consulta, c.numero_ofertas, c.bin_monto, c.monto_desde, c.monto_hasta)
+              for c in ultima.itertuples()]
+    assert sum(motor_pandas.contar(c.con((COLUMNA_MONTO, '==', maximo))) for c in celdas) >= 1
+
+
+# ============================================
+# EXTRACTOS EN DUCKDB
+# ============================================
+def test_duckdb_aplica_extractos_y_rechaza_filas(tmp_path):
+    pytest.importorskip('duckdb')
+    from conftest import escribir_extracto
+    from datos import leer_rechazos_extractos
+    from generar_datos import generar
+
+    ruta = generar(2_000, str(tmp_path / 'licitaciones.csv'), semilla=11)
+    extractos = tmp_path / 'extractos'
+    extractos.mkdir()
+    motor = crear_motor('duckdb', ruta, str(extractos))
+    base = motor.datos(Consulta(), ['nog', COLUMNA_MONTO]).set_index('nog')[COLUMNA_MONTO]
+
+    # 200 reemplazos y 100 filas nuevas; 3 reemplazos no cumplen el esquema y
+    # un NOG se repite al final con otro monto (gana la última fila)
+    escribir_extracto(ruta, extractos / '2030-01-01.csv')
+    extracto = pd.read_csv(extractos / '2030-01-01.csv', dtype=str, keep_default_na=False)
+    extracto.loc[0, COLUMNA_MONTO] = 'abc'
+    extracto.loc[1, 'region'] = 'Atlantida'
+    extracto.loc[2, 'fecha_cierre'] = '2024-02-30'
+    repetida = extracto.iloc[[10]].assign(**{COLUMNA_MONTO: '12345.5'})
+    pd.concat([extracto, repetida]).to_csv(extractos / '2030-01-01.csv', index=False)
+
+    assert motor.actualizar() == 297
+    assert motor.actualizar() == 0
+    assert motor.total() == 2_100
+
+    rechazos = leer_rechazos_extractos(str(extractos))
+    assert sorted(rechazos['fila'].unique()) == [1, 2, 3]
+    assert set(rechazos['columna']) == {COLUMNA_MONTO, 'region', 'fecha_cierre'}
+    assert set(rechazos['extracto']) == {'2030-01-01.csv'}
+
+    montos = motor.datos(Consulta(), ['nog', COLUMNA_MONTO]).set_index('nog')[COLUMNA_MONTO]
+    nogs = extracto['nog'].astype(np.int64)
+    assert montos[nogs[0]] == base[nogs[0]]  # La fila rechazada no reemplaza a la original
+    assert montos[nogs[10]] == 12345.5
+
+    # Un segundo extracto solo cuenta sus filas y conserva lo aplicado antes
+    segundo = extracto.iloc[20:25].assign(**{COLUMNA_MONTO: '1.0'})
+    segundo.to_csv(extractos / '2030-01-02.csv', index=False)
+    assert motor.actualizar() == 5
+    montos = motor.datos(Consulta(), ['nog', COLUMNA_MONTO]).set_index('nog')[COLUMNA_MONTO]
+    assert montos[nogs[10]] == 12345.5
+    assert (montos[nogs[20:25]] == 1.0).all()
+
+    # Mismo resultado que el motor pandas cargando todo de una vez
+    pandas = crear_motor('pandas', ruta, str(extractos))
+    assert pandas.total() == motor.total()
+    columnas = ['nog', 'departamento', COLUMNA_MONTO]
+    comparar(motor.datos(Consulta(), columnas).sort_values('nog'), pandas.datos(Consulta(), columnas).sort_values('nog'))
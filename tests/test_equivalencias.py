@@ -0,0 +1,105 @@
+# tests/test_equivalencias.py
+"""El cubo y los índices responden lo mismo que los cálculos por filas, también tras un upsert"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from consultas import Consulta, crear_motor
+from cubo import agrupar_filas, resumen_filas
+from indices import COLUMNA_MONTO
+from proveedores import COLUMNA_PROVEEDOR, concentracion_filas, ranking_filas
+from series import serie_filas
+
+
+def consultas_cubo(motor):
+    """Consultas que se responden con el cubo: todas las dimensiones elegidas y monto informado"""
+    dimensiones = motor.almacen.cubo.dimensiones
+    todas = Consulta().con_rango_monto()
+    mitad = todas
+    for dim in dimensiones:
+        opciones = motor.opciones(dim, Consulta())
+        todas = todas.filtrar(dim, opciones)
+        mitad = mitad.filtrar(dim, opciones[::2])
+    return [todas, mitad]
+
+
+def comparar(a, b):
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False, rtol=1e-9)
+
+
+def test_las_consultas_usan_el_cubo(motor_pandas):
+    for consulta in consultas_cubo(motor_pandas):
+        assert motor_pandas._celdas(consulta) is not None
+
+
+def test_resumen(motor_pandas):
+    for consulta in consultas_cubo(motor_pandas):
+        cubo = motor_pandas.resumen(consulta)
+        filas = resumen_filas(motor_pandas.datos(consulta, [COLUMNA_MONTO, COLUMNA_PROVEEDOR, 'departamento', 'region']))
+        assert cubo == pytest.approx(filas, rel=1e-9, nan_ok=True)
+
+
+@pytest.mark.parametrize('dim', ['departamento', 'region', 'año_adjudicacion'])
+def test_agrupar(motor_pandas, dim):
+    for consulta in consultas_cubo(motor_pandas):
+        filas = agrupar_filas(motor_pandas.datos(consulta, [dim, COLUMNA_MONTO]), dim)
+        comparar(motor_pandas.agrupar(dim, consulta), filas.sort_values(dim))
+
+
+def test_top_proveedores(motor_pandas):
+    for consulta in consultas_cubo(motor_pandas):
+        filas = ranking_filas(motor_pandas.datos(consulta, [COLUMNA_PROVEEDOR, COLUMNA_MONTO]), 10)
+        comparar(motor_pandas.top_proveedores(consulta, 10), filas)
+
+
+@pytest.mark.parametrize('dim', ['entidad', 'departamento'])
+def test_concentracion(motor_pandas, dim):
+    for consulta in consultas_cubo(motor_pandas):
+        filas = concentracion_filas(motor_pandas.datos(consulta, [dim, COLUMNA_PROVEEDOR, COLUMNA_MONTO]), dim, 4)
+        comparar(motor_pandas.concentracion(consulta, dim, 4), filas)
+
+
+@pytest.mark.parametrize('granularidad', ['D', 'W', 'M', 'A'])
+def test_serie_temporal(motor_pandas, granularidad):
+    for consulta in consultas_cubo(motor_pandas):
+        filas = serie_filas(motor_pandas.datos(consulta, ['fecha_adjudicacion', COLUMNA_MONTO]),
+                            'fecha_adjudicacion', granularidad)
+        comparar(motor_pandas.serie_temporal(consulta, 'fecha_adjudicacion', granularidad), filas)
+
+
+def test_upsert_incremental_igual_a_carga_completa(dataset, motor_pandas):
+    ruta, extractos, _ = dataset
+    completo = crear_motor('pandas', ruta, extractos)  # Aplica el extracto antes de indexar
+    assert completo.total() == motor_pandas.total()
+    for consulta in consultas_cubo(completo) + [Consulta().con_busqueda('camino'), Consulta().con_rango_monto(5e5, 2e6)]:
+        assert motor_pandas.contar(consulta) == completo.contar(consulta)
+        assert motor_pandas.resumen(consulta) == pytest.approx(completo.resumen(consulta), rel=1e-9, nan_ok=True)
+        comparar(motor_pandas.agrupar('departamento', consulta), completo.agrupar('departamento', consulta))
+
+
+def test_desviacion_estable_con_montos_grandes(tmp_path):
+    """Montos de 1e9 con dispersión de 1: restar suma²/n de la suma de cuadrados no deja nada"""
+    from conftest import escribir_extracto
+    from generar_datos import generar
+
+    def montos_grandes(ruta, semilla):
+        crudo = pd.read_csv(ruta, dtype=str, keep_default_na=False)
+        informados = crudo['monto_adjudicado'] != ''
+        ruido = np.random.default_rng(semilla).normal(0, 1, informados.sum())
+        crudo.loc[informados, 'monto_adjudicado'] = (1e9 + ruido).round(6).astype(str)
+        crudo.to_csv(ruta, index=False)
+
+    ruta = generar(2_000, str(tmp_path / 'grandes.csv'), semilla=5)
+    montos_grandes(ruta, 0)
+    (tmp_path / 'extractos').mkdir()
+    motor = crear_motor('pandas', ruta, str(tmp_path / 'extractos'))
+
+    # El extracto reemplaza y agrega filas: M2 pasa por retirar y agregar
+    extracto = tmp_path / 'extractos' / '2030-01-01.csv'
+    escribir_extracto(ruta, extracto)
+    montos_grandes(extracto, 1)
+    assert motor.actualizar() == 300
+    for consulta in consultas_cubo(motor):
+        montos = motor.datos(consulta, [COLUMNA_MONTO])[COLUMNA_MONTO].to_numpy(dtype=float)
+        assert motor.resumen(consulta)['monto_desviacion'] == pytest.approx(np.std(montos, ddof=1), rel=1e-6)
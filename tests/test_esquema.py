@@ -0,0 +1,51 @@
+# tests/test_esquema.py
+"""Conversión del CSV según el esquema declarado"""
+import pandas as pd
+import pytest
+
+from esquema import ESQUEMA_POR_NOMBRE, convertir
+
+
+def crudo(**columnas):
+    return pd.DataFrame({'nog': [str(i + 1) for i in range(len(next(iter(columnas.values()))))], **columnas},
+                        dtype=object)
+
+
+def test_dominio_guarda_la_grafia_canonica():
+    df, rechazos = convertir(crudo(departamento=['GUATEMALA', 'Guatemala', 'guatemala', 'Peten', 'petén', None]))
+    assert rechazos.empty
+    assert df['departamento'].tolist()[:5] == ['Guatemala', 'Guatemala', 'Guatemala', 'Petén', 'Petén']
+    assert pd.isna(df['departamento'].iloc[5])
+    assert sorted(df['departamento'].cat.categories) == ['Guatemala', 'Petén']
+
+
+def test_fuera_de_dominio_rechaza_la_fila():
+    df, rechazos = convertir(crudo(region=['Norte', 'Atlántida'], estatus=['adjudicado', 'Adjudicado']))
+    assert df['region'].tolist() == ['Norte']
+    assert df['estatus'].tolist() == ['Adjudicado']
+    assert rechazos[['fila', 'columna', 'valor', 'motivo']].values.tolist() == [[2, 'region', 'Atlántida', 'dominio']]
+
+
+def test_renombres_solo_incluye_grafias_distintas():
+    columna = ESQUEMA_POR_NOMBRE['region']
+    assert columna.renombres(['Norte', 'NORTE', 'peten', 'Atlántida']) == {'NORTE': 'Norte', 'peten': 'Petén'}
+    assert ESQUEMA_POR_NOMBRE['tipo_proyecto'].renombres(['cualquiera']) == {}
+
+
+def test_duckdb_guarda_la_misma_grafia(tmp_path):
+    pytest.importorskip('duckdb')
+    from consultas import Consulta, crear_motor
+    from generar_datos import generar
+
+    ruta = generar(300, str(tmp_path / 'licitaciones.csv'), semilla=2)
+    base = pd.read_csv(ruta, dtype=str, keep_default_na=False)
+    base.loc[:49, 'departamento'] = 'GUATEMALA'
+    base.loc[50:99, 'departamento'] = 'guatemala'
+    base.loc[100:149, 'region'] = 'peten'
+    base.to_csv(ruta, index=False)
+
+    motores = [crear_motor(nombre, ruta, str(tmp_path / 'extractos')) for nombre in ('pandas', 'duckdb')]
+    for columna in ('departamento', 'region'):
+        pandas, duckdb = (m.opciones(columna, Consulta()) for m in motores)
+        assert duckdb == pandas
+        assert not {'GUATEMALA', 'guatemala', 'peten'} & set(pandas)
@@ -0,0 +1,65 @@
+# tests/test_exportar.py
+"""La exportación por bloques reproduce las filas de la consulta y la caché descarta las menos usadas"""
+import gzip
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from consultas import Consulta
+from exportar import MAX_ARCHIVOS_CACHE, abrir_exportacion, bloques, firma_exportacion
+
+
+def leer(extension, contenido):
+    if extension == 'parquet':
+        return pd.read_parquet(io.BytesIO(contenido))
+    if extension == 'csv.gz':
+        contenido = gzip.decompress(contenido)
+    return contenido.decode('utf-8')
+
+
+@pytest.mark.parametrize('extension', ['csv', 'csv.gz', 'parquet'])
+@pytest.mark.parametrize('consulta', [
+    Consulta().filtrar('estatus', ['Adjudicado']).con_rango_monto(),
+    Consulta().con_busqueda('´'),  # Ninguna fila: solo el encabezado / esquema
+], ids=['filtrada', 'vacia'])
+def test_ida_y_vuelta(tmp_path, motor_pandas, extension, consulta):
+    if extension == 'parquet':
+        pytest.importorskip('pyarrow')
+    df, filas = motor_pandas.almacen.df, motor_pandas.filas(consulta)
+    # Bloques chicos: el archivo se arma de varios trozos
+    with abrir_exportacion(lambda: bloques(df, filas, 97), 'v', consulta.firma(), extension, tmp_path) as f:
+        exportado = leer(extension, f.read())
+
+    esperado = df.take(filas).reset_index(drop=True)
+    if extension == 'parquet':
+        pd.testing.assert_frame_equal(exportado, esperado, check_dtype=False, check_categorical=False)
+    else:
+        assert exportado == esperado.to_csv(index=False)
+
+
+def test_cache_reutiliza_y_descarta_la_menos_usada(tmp_path):
+    df = pd.DataFrame({'nog': range(5)})
+    generados = []
+
+    def exportar(firma):
+        def generar():
+            generados.append(firma)
+            return bloques(df, range(len(df)))
+        abrir_exportacion(generar, 'v', firma, 'csv', tmp_path).close()
+
+    rutas = {}
+    for i in range(MAX_ARCHIVOS_CACHE):
+        exportar(f"f{i}")
+        rutas[f"f{i}"] = tmp_path / f"{firma_exportacion('v', f'f{i}', 'csv')}.csv"
+        os.utime(rutas[f"f{i}"], (i, i))  # f0 es el más antiguo, f19 el más reciente
+
+    # Un acierto no vuelve a generar y deja el archivo como el más reciente
+    exportar('f0')
+    assert generados.count('f0') == 1
+
+    exportar('nuevo')
+    assert len(os.listdir(tmp_path)) == MAX_ARCHIVOS_CACHE
+    assert rutas['f0'].exists()
+    assert not rutas['f1'].exists()
@@ -0,0 +1,124 @@
+# tests/test_geometria.py
+"""Simplificación de límites y unión de montos por clave plegada"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geometria import CapaLimites, douglas_peucker, simplificar_geometria, tolerancia_zoom
+from mapas import unir_montos
+
+
+# ============================================
+# DOUGLAS-PEUCKER
+# ============================================
+def circulo(n, radio=1.0, centro=(0.0, 0.0)):
+    angulos = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    puntos = np.column_stack([centro[0] + radio * np.cos(angulos), centro[1] + radio * np.sin(angulos)])
+    return np.vstack([puntos, puntos[:1]])  # Anillo cerrado: el último punto repite el primero
+
+
+def test_conserva_extremos_y_descarta_ruido():
+    x = np.linspace(0, 10, 200)
+    ruido = np.random.default_rng(0).uniform(-0.01, 0.01, len(x))
+    linea = np.column_stack([x, ruido])
+    simplificada = douglas_peucker(linea, 0.05)
+    assert np.array_equal(simplificada, linea[[0, -1]])
+
+    # Un pico por encima de la tolerancia se conserva
+    linea[100, 1] = 1.0
+    simplificada = douglas_peucker(linea, 0.05)
+    assert np.array_equal(simplificada[[0, -1]], linea[[0, -1]])
+    assert any(np.array_equal(p, linea[100]) for p in simplificada)
+
+
+def test_distancia_a_la_simplificada_dentro_de_la_tolerancia():
+    rng = np.random.default_rng(1)
+    linea = np.column_stack([np.linspace(0, 1, 500), np.cumsum(rng.normal(0, 0.01, 500))])
+    tolerancia = 0.02
+    simplificada = douglas_peucker(linea, tolerancia)
+    # Cada punto descartado queda a menos de la tolerancia del tramo que lo reemplaza
+    for a, b in zip(simplificada[:-1], simplificada[1:]):
+        tramo = linea[(linea[:, 0] > a[0]) & (linea[:, 0] < b[0])] - a
+        dx, dy = b - a
+        assert np.all(np.abs(dx * tramo[:, 1] - dy * tramo[:, 0]) / np.hypot(dx, dy) <= tolerancia)
+
+
+def test_anillos_cerrados():
+    tolerancia = tolerancia_zoom(8)
+    exterior, hueco = circulo(400, 0.5), circulo(200, 0.1)
+    isla = circulo(50, tolerancia / 10, centro=(2.0, 2.0))  # Más chica que un píxel
+    geometria = simplificar_geometria(
+        {'type': 'MultiPolygon', 'coordinates': [[exterior.tolist(), hueco.tolist()], [isla.tolist()]]}, tolerancia)
+
+    # La isla se descarta; el polígono sigue con su hueco y los anillos cerrados
+    assert geometria['type'] == 'Polygon'
+    anillos = geometria['coordinates']
+    assert len(anillos) == 2
+    for anillo, original in zip(anillos, [exterior, hueco]):
+        assert 4 <= len(anillo) < len(original)
+        assert anillo[0] == anillo[-1]
+
+
+def test_nunca_se_pierde_una_zona_entera():
+    isla = circulo(20, 1e-6)
+    geometria = simplificar_geometria({'type': 'Polygon', 'coordinates': [isla.tolist()]}, tolerancia_zoom(8))
+    anillo = geometria['coordinates'][0]
+    assert len(anillo) == len(isla)
+    assert anillo[0] == anillo[-1]
+
+
+# ============================================
+# UNIÓN POR CLAVE PLEGADA
+# ============================================
+def escribir_capa(ruta, zonas):
+    features = [
+        {'type': 'Feature', 'properties': propiedades,
+         'geometry': {'type': 'Polygon', 'coordinates': [circulo(40, 0.2, centro).tolist()]}}
+        for propiedades, centro in zonas
+    ]
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    return str(ruta)
+
+
+def test_une_departamentos_por_clave_plegada(tmp_path):
+    ruta = escribir_capa(tmp_path / 'd.geojson', [({'NAME_1': 'Petén'}, (-90, 16.9)),
+                                                  ({'NAME_1': 'Sacatepéquez'}, (-90.7, 14.5))])
+    capa = CapaLimites(ruta, 'departamento')
+    montos = pd.DataFrame({
+        'departamento': ['PETEN', ' Petén', 'Sacatepequez', 'Atlántida'],
+        'Cantidad': [2, 3, 1, 4],
+        'monto_adjudicado': [100.0, 50.0, 10.0, 1.0],
+    })
+    valores, faltantes = unir_montos(capa, montos)
+    # Las dos grafías de Petén se suman en una sola zona
+    assert valores['peten']['cantidad'] == 5
+    assert valores['peten']['monto'] == pytest.approx(150.0)
+    assert valores['sacatepequez']['cantidad'] == 1
+    assert faltantes == ['atlantida']
+
+    coleccion = json.loads(capa.geojson(valores, vacio={'cantidad': 0}))
+    propiedades = {z['properties']['nombre']: z['properties'] for z in coleccion['features']}
+    assert propiedades['Petén']['monto'] == pytest.approx(150.0)
+    assert [z['geometry'] for z in coleccion['features']] == capa.geometrias
+
+
+def test_une_municipios_por_departamento_y_municipio(tmp_path):
+    ruta = escribir_capa(tmp_path / 'm.geojson', [
+        ({'NAME_1': 'Guatemala', 'NAME_2': 'San José'}, (-90.5, 14.6)),
+        ({'NAME_1': 'Petén', 'NAME_2': 'San José'}, (-89.9, 17.0)),
+    ])
+    capa = CapaLimites(ruta, 'municipio')
+    montos = pd.DataFrame({
+        'departamento': ['Peten', 'Guatemala'],
+        'municipio': ['SAN JOSE', 'San  José'],
+        'Cantidad': [1, 2],
+        'monto_adjudicado': [10.0, 20.0],
+    })
+    valores, faltantes = unir_montos(capa, montos)
+    # El mismo municipio en dos departamentos son zonas distintas
+    assert valores['peten|san jose']['monto'] == pytest.approx(10.0)
+    assert valores['guatemala|san jose']['monto'] == pytest.approx(20.0)
+    assert faltantes == []
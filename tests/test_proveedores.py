@@ -0,0 +1,69 @@
+# tests/test_proveedores.py
+"""Top-K de proveedores y HHI contra un groupby de pandas"""
+import pandas as pd
+import pytest
+
+from consultas import Consulta
+from indices import COLUMNA_MONTO
+from proveedores import COLUMNA_PROVEEDOR, DIMENSIONES_CONCENTRACION
+
+
+def consultas_proveedores(motor):
+    """Consultas que responde el cubo y otras que van por filas (rango parcial, búsqueda)"""
+    departamentos = motor.opciones('departamento', Consulta())
+    return [
+        Consulta().con_rango_monto(),
+        Consulta().con_rango_monto().filtrar('departamento', departamentos[:5]),
+        Consulta().con_rango_monto(5e5, 5e6),
+        Consulta().con_busqueda('camino'),
+    ]
+
+
+def con_proveedor(motor, consulta, columnas):
+    return motor.datos(consulta, columnas).dropna(subset=[COLUMNA_PROVEEDOR, COLUMNA_MONTO])
+
+
+def top_pandas(df, k):
+    por_proveedor = (df.groupby(COLUMNA_PROVEEDOR, observed=True)[COLUMNA_MONTO]
+                     .agg(Cantidad='size', monto='sum').reset_index())
+    top = por_proveedor.sort_values(['monto', COLUMNA_PROVEEDOR], ascending=[False, True]).head(k)
+    return pd.DataFrame({
+        COLUMNA_PROVEEDOR: top[COLUMNA_PROVEEDOR].astype(str),
+        'Cantidad': top['Cantidad'],
+        COLUMNA_MONTO: top['monto'],
+        'participacion': top['monto'] / por_proveedor['monto'].sum(),
+    }).reset_index(drop=True)
+
+
+def concentracion_pandas(df, dim, k):
+    pares = df.groupby([dim, COLUMNA_PROVEEDOR], observed=True)[COLUMNA_MONTO].sum().reset_index()
+    pares['participacion'] = pares[COLUMNA_MONTO] / pares.groupby(dim, observed=True)[COLUMNA_MONTO].transform('sum')
+    por_valor = pares.groupby(dim, observed=True)
+    return pd.DataFrame({
+        'Cantidad': df.groupby(dim, observed=True).size(),
+        COLUMNA_MONTO: por_valor[COLUMNA_MONTO].sum(),
+        'proveedores': por_valor.size(),
+        'hhi': por_valor['participacion'].apply(lambda p: (p ** 2).sum() * 10_000),
+        'participacion_top': por_valor['participacion'].apply(lambda p: p.nlargest(k).sum()),
+    }).rename_axis(dim).reset_index().sort_values(dim, ignore_index=True)
+
+
+@pytest.mark.parametrize('k', [1, 10, 10_000])
+def test_top_proveedores(motor_pandas, k):
+    for consulta in consultas_proveedores(motor_pandas):
+        top = motor_pandas.top_proveedores(consulta, k)
+        esperado = top_pandas(con_proveedor(motor_pandas, consulta, [COLUMNA_PROVEEDOR, COLUMNA_MONTO]), k)
+        pd.testing.assert_frame_equal(top.assign(**{COLUMNA_PROVEEDOR: top[COLUMNA_PROVEEDOR].astype(str)}), esperado,
+                                      check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('dim', DIMENSIONES_CONCENTRACION)
+def test_concentracion(motor_pandas, dim):
+    for consulta in consultas_proveedores(motor_pandas):
+        tabla = motor_pandas.concentracion(consulta, dim, 4)
+        esperada = concentracion_pandas(con_proveedor(motor_pandas, consulta, [dim, COLUMNA_PROVEEDOR, COLUMNA_MONTO]),
+                                        dim, 4)
+        tabla = tabla.assign(**{dim: tabla[dim].astype(str)})
+        esperada = esperada.assign(**{dim: esperada[dim].astype(str)})
+        pd.testing.assert_frame_equal(tabla, esperada, check_dtype=False, rtol=1e-9)
+        assert ((tabla['hhi'] > 0) & (tabla['hhi'] <= 10_000 + 1e-6)).all()
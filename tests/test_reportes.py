@@ -0,0 +1,43 @@
+# tests/test_reportes.py
+"""Archivos de los reportes estáticos y nombres de carpeta sin colisiones"""
+import json
+
+import reportes
+from consultas import Consulta
+
+
+class MotorOpciones:
+    """Solo lo que usa combinaciones: las opciones de cada columna"""
+
+    def __init__(self, valores):
+        self.valores = valores
+
+    def opciones(self, columna, consulta):
+        return self.valores
+
+
+def test_nombres_distintos_que_se_pliegan_igual_no_colisionan():
+    trabajos = reportes.combinaciones(MotorOpciones(['Sololá', 'Solola', 'SOLOLÁ ', 'Zacapa', '']), ['departamento'])
+    carpetas = [carpeta for _, _, carpeta in trabajos]
+    assert len(set(carpetas)) == len(carpetas)
+    assert carpetas[3:] == ['zacapa', 'sin-nombre']  # Sin colisión el nombre no cambia
+    assert all(c.startswith('solola-') for c in carpetas[:3])
+    # El sufijo depende solo del valor: es el mismo en cada corrida
+    assert reportes.combinaciones(MotorOpciones(['Solola', 'Sololá']), ['departamento'])[0][2] == carpetas[1]
+
+
+def test_archivos_del_reporte(tmp_path, monkeypatch, motor_pandas):
+    monkeypatch.setattr(reportes, '_motor', motor_pandas)
+    dim, valor, carpeta = reportes.combinaciones(motor_pandas, ['departamento'])[0]
+    _, _, rutas, _ = reportes.generar_reporte(dim, valor, carpeta, str(tmp_path), ['json', 'html'])
+
+    directorio = tmp_path / 'departamento' / carpeta
+    assert sorted(rutas) == sorted([str(directorio / 'datos.json'), str(directorio / 'index.html')])
+    with open(directorio / 'datos.json', encoding='utf-8') as f:
+        datos = json.load(f)
+    consulta = Consulta().filtrar('departamento', [valor]).con_rango_monto()
+    assert datos['valor'] == valor
+    assert datos['resumen']['total'] == motor_pandas.contar(consulta)
+    assert sum(fila['Cantidad'] for fila in datos['tablas']['por_año']) == datos['resumen']['total']
+    html = (directorio / 'index.html').read_text(encoding='utf-8')
+    assert f'src="../../{reportes.ARCHIVO_PLOTLY_JS}"' in html
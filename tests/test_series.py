@@ -0,0 +1,42 @@
+# tests/test_series.py
+"""Media móvil y variación interanual contra resample/rolling de pandas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from consultas import Consulta
+from indices import COLUMNA_MONTO
+from series import GRANULARIDADES
+
+# Granularidad -> frecuencia de resample con el período etiquetado por su inicio
+FRECUENCIAS = {'D': 'D', 'W': 'W-MON', 'M': 'MS', 'A': 'YS'}
+
+
+def serie_pandas(df, columna_fecha, granularidad):
+    """Referencia: resample para la serie densa y rolling/shift para las ventanas"""
+    _, ventana, año = GRANULARIDADES[granularidad]
+    df = df.dropna(subset=[columna_fecha]).set_index(columna_fecha).sort_index()
+    periodos = df[COLUMNA_MONTO].resample(FRECUENCIAS[granularidad], label='left', closed='left')
+    serie = pd.DataFrame({'Cantidad': periodos.size(), COLUMNA_MONTO: periodos.sum()})
+    for columna, nombre in [('Cantidad', 'Cantidad'), (COLUMNA_MONTO, 'monto')]:
+        valores = serie[columna].astype(float)
+        serie[f"{nombre}_media"] = valores.rolling(ventana, min_periods=1).mean()
+        actual = valores.rolling(ventana).sum()
+        anterior = actual.shift(año)
+        serie[f"{nombre}_interanual"] = (actual / anterior - 1).where(anterior > 0)
+    return serie.rename_axis('periodo').reset_index()
+
+
+@pytest.mark.parametrize('granularidad', ['D', 'W', 'M', 'A'])
+@pytest.mark.parametrize('columna_fecha', ['fecha_adjudicacion', 'fecha_publicacion'])
+def test_ventanas_iguales_a_pandas(motor_pandas, granularidad, columna_fecha):
+    departamentos = motor_pandas.opciones('departamento', Consulta())
+    for consulta in [Consulta().con_rango_monto(), Consulta().filtrar('departamento', departamentos[:4])]:
+        serie = motor_pandas.serie_temporal(consulta, columna_fecha, granularidad)
+        esperada = serie_pandas(motor_pandas.datos(consulta, [columna_fecha, COLUMNA_MONTO]), columna_fecha, granularidad)
+        assert len(serie) > 1
+        pd.testing.assert_frame_equal(serie[esperada.columns].reset_index(drop=True), esperada,
+                                      check_dtype=False, check_freq=False, rtol=1e-9)
+        # Hay variaciones interanuales que comparar (salvo con un solo año)
+        if granularidad != 'A':
+            assert np.isfinite(serie['monto_interanual']).any()